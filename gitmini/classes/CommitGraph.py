@@ -0,0 +1,389 @@
+import os
+import re
+import mmap
+import struct
+import hashlib
+import datetime
+from gitmini.classes.LockFile import LockFile
+
+GRAPH_DIRNAME = os.path.join("info", "commit-graphs")
+CHAIN_FILENAME = "commit-graph-chain"
+
+GRAPH_MAGIC = b"GMCG"
+GRAPH_VERSION = 1
+HEADER = struct.Struct(">4sIII")      # magic, version, commit count, commits in the layers below
+FANOUT = struct.Struct(">256I")
+RECORD = struct.Struct(">20sIIIq")    # raw tree sha, first parent, second parent, generation, commit time
+EDGE = struct.Struct(">I")
+SHA_SIZE = 20
+CHECKSUM_SIZE = 20
+
+# Parent slots hold a commit's position in the graph, or one of these
+NO_PARENT = 0xFFFFFFFF
+EXTRA_EDGES = 0x80000000  # second slot: the parents from the second on are listed from this edge index
+LAST_EDGE = 0x80000000    # set on the last edge of a commit
+
+# A new layer is merged into the one below while it holds more than
+# 1/MERGE_FACTOR as many commits, so a chain of n commits has O(log n) layers
+MERGE_FACTOR = 2
+
+_UNIX_TIME_RE = re.compile(r"unix: (\d+)")
+
+
+class GraphCommit:
+    """ What the commit-graph records about one commit. """
+
+    __slots__ = ("sha", "tree", "parents", "generation", "timestamp")
+
+    def __init__(self, sha, tree, parents, generation, timestamp):
+        self.sha = sha
+        self.tree = tree
+        self.parents = parents
+        self.generation = generation  # 1 for a root commit, else 1 + the highest parent generation
+        self.timestamp = timestamp    # seconds since the epoch, 0 if unknown
+
+    @property
+    def parent(self):
+        return self.parents[0] if self.parents else None
+
+
+class CommitGraph:
+    """
+    The commit-graph: the parents, tree, commit time and generation number
+    of each commit, so history can be walked without opening commit objects.
+
+    It is stored as a chain of layer files in objects/info/commit-graphs,
+    listed bottom to top in commit-graph-chain. Each layer is named by its
+    checksum:
+        header    "GMCG", version, commit count, commits in the layers below
+        fanout    256 cumulative counts of commits by first sha byte
+        shas      sorted raw 20-byte commit shas
+        records   tree sha, two parent slots, generation, commit time,
+                  in the same order
+        edges     count, then the parents of commits with more than two
+        checksum  SHA-1 of everything above
+    A commit's position is its index in its layer plus the commits in the
+    layers below; parent slots hold positions, which never point upwards.
+
+    update() appends a layer with the commits that are not in the graph yet
+    and merges it with the layers below while it is more than half their
+    size, so adding one commit rewrites a small file. Commits are immutable,
+    so recorded entries never go stale. Commits that are not in the graph
+    are read from the object store instead.
+    """
+
+    def __init__(self, repo, store):
+        self.store = store
+        self.graph_dir = os.path.join(repo.objects_dir, GRAPH_DIRNAME)
+        self.chain_path = os.path.join(repo.objects_dir, "info", CHAIN_FILENAME)
+        self._layers = None
+
+    @property
+    def layers(self):
+        if self._layers is None:
+            # A concurrent update may delete a layer between reading the chain
+            # and opening it; the chain it wrote by then names the new ones.
+            # The graph only saves work, so without it objects are read.
+            for _ in range(3):
+                try:
+                    self._layers = self._open_layers()
+                    break
+                except FileNotFoundError:
+                    continue
+            else:
+                self._layers = []
+        return self._layers
+
+    def __contains__(self, sha):
+        return self._position(sha) is not None
+
+    def get(self, sha):
+        """ Returns a GraphCommit for 'sha', read from the object store if the graph lacks it; None if it does not exist. """
+        position = self._position(sha)
+        if position is not None:
+            return self._at(position)
+        if not self.store.exists(sha):
+            return None
+        commit = self.store.read_commit(sha)
+        return GraphCommit(sha, commit.tree, list(commit.parents), None, commit_time(commit.timestamp))
+
+    def is_ancestor(self, ancestor, descendant):
+        """
+        True if 'ancestor' is reachable from 'descendant' (or is it). Commits
+        with a lower generation number than 'ancestor' cannot lead to it, so
+        the walk stops there.
+        """
+        target = self.get(ancestor)
+        if target is None:
+            return False
+        floor = target.generation or 0
+        seen = set()
+        stack = [descendant]
+        while stack:
+            sha = stack.pop()
+            if sha == ancestor:
+                return True
+            if sha in seen:
+                continue
+            seen.add(sha)
+            commit = self.get(sha)
+            if commit is None or (commit.generation is not None and commit.generation <= floor):
+                continue
+            stack.extend(commit.parents)
+        return False
+
+    def update(self, tips):
+        """
+        Adds every commit reachable from 'tips' that is not in the graph yet.
+        Concurrent updates are serialized by a lock on the chain file.
+        """
+        os.makedirs(os.path.dirname(self.chain_path), exist_ok=True)
+        with LockFile(self.chain_path) as lock:
+            for layer in self._layers or []:
+                layer.close()
+            self._layers = None  # the chain may have changed while waiting
+            new = {}  # sha → (tree, parents, timestamp)
+            stack = [t for t in tips if t]
+            while stack:
+                sha = stack.pop()
+                if sha in new or sha in self:
+                    continue
+                commit = self.store.read_commit(sha)
+                new[sha] = (commit.tree, list(commit.parents), commit_time(commit.timestamp))
+                stack.extend(p for p in commit.parents if self.store.exists(p))
+            if not new:
+                return 0
+
+            # Merge the new commits with the top layers while those are small
+            layers = list(self.layers)
+            while layers and len(new) * MERGE_FACTOR > layers[-1].count:
+                top = layers.pop()
+                for i in range(top.count):
+                    commit = self._decode(top, i)
+                    new[commit.sha] = (commit.tree, commit.parents, commit.timestamp)
+
+            base = sum(layer.count for layer in layers)
+            name = self._write_layer(new, layers, base)
+
+            kept = [os.path.basename(layer.path) for layer in layers] + [name]
+            lock.write("".join(n + "\n" for n in kept))
+            lock.commit()
+
+        for layer in self.layers:
+            layer.close()
+            if os.path.basename(layer.path) not in kept:
+                os.remove(layer.path)
+        self._layers = None
+        return len(new)
+
+    # Internals
+
+    def _open_layers(self):
+        if not os.path.exists(self.chain_path):
+            return []
+        with open(self.chain_path, "r") as f:
+            names = f.read().split()
+        layers = []
+        try:
+            for name in names:
+                layers.append(_Layer(os.path.join(self.graph_dir, name)))
+        except FileNotFoundError:
+            for layer in layers:
+                layer.close()
+            raise
+        return layers
+
+    def _position(self, sha):
+        try:
+            key = bytes.fromhex(sha)
+        except (TypeError, ValueError):
+            return None
+        if len(key) != SHA_SIZE:
+            return None
+        for layer in self.layers:
+            i = layer.find(key)
+            if i is not None:
+                return layer.base + i
+        return None
+
+    def _at(self, position):
+        for layer in self.layers:
+            if position < layer.base + layer.count:
+                return self._decode(layer, position - layer.base)
+        raise ValueError(f"commit-graph position {position} out of range")
+
+    def _sha_at(self, position):
+        for layer in self.layers:
+            if position < layer.base + layer.count:
+                return layer.sha_at(position - layer.base).hex()
+        raise ValueError(f"commit-graph position {position} out of range")
+
+    def _decode(self, layer, i):
+        raw_tree, first, second, generation, timestamp = layer.record(i)
+        parents = []
+        if first != NO_PARENT:
+            parents.append(self._sha_at(first))
+        if second & EXTRA_EDGES and second != NO_PARENT:
+            edge = second & ~EXTRA_EDGES
+            while True:
+                value = layer.edge(edge)
+                parents.append(self._sha_at(value & ~LAST_EDGE))
+                if value & LAST_EDGE:
+                    break
+                edge += 1
+        elif second != NO_PARENT:
+            parents.append(self._sha_at(second))
+        tree = raw_tree.hex() if raw_tree != bytes(SHA_SIZE) else None
+        return GraphCommit(layer.sha_at(i).hex(), tree, parents, generation, timestamp)
+
+    def _write_layer(self, commits, below, base):
+        # Writes one layer holding 'commits' on top of the layers 'below';
+        # returns its file name
+        order = sorted(commits)
+        positions = {sha: base + i for i, sha in enumerate(order)}
+
+        def position_of(sha):
+            if sha in positions:
+                return positions[sha]
+            for layer in below:
+                i = layer.find(bytes.fromhex(sha))
+                if i is not None:
+                    return layer.base + i
+            return None  # a parent that is not in the repository
+
+        generations = {}
+
+        def generation_of(sha):
+            # Iterative, since histories are far deeper than the recursion limit
+            stack = [sha]
+            while stack:
+                current = stack[-1]
+                if current in generations:
+                    stack.pop()
+                    continue
+                pending = [p for p in commits[current][1] if p in commits and p not in generations]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                best = 0
+                for parent in commits[current][1]:
+                    if parent in generations:
+                        best = max(best, generations[parent])
+                    else:
+                        position = position_of(parent)
+                        if position is not None:
+                            best = max(best, self._generation_at(below, position))
+                generations[current] = best + 1
+                stack.pop()
+            return generations[sha]
+
+        counts = [0] * 256
+        for sha in order:
+            counts[int(sha[:2], 16)] += 1
+        fanout = []
+        total = 0
+        for c in counts:
+            total += c
+            fanout.append(total)
+
+        shas = bytearray()
+        records = bytearray()
+        edges = []
+        for sha in order:
+            tree, parents, timestamp = commits[sha]
+            parent_positions = [p for p in (position_of(p) for p in parents) if p is not None]
+            first = parent_positions[0] if parent_positions else NO_PARENT
+            if len(parent_positions) <= 2:
+                second = parent_positions[1] if len(parent_positions) == 2 else NO_PARENT
+            else:
+                second = EXTRA_EDGES | len(edges)
+                edges.extend(parent_positions[1:-1])
+                edges.append(parent_positions[-1] | LAST_EDGE)
+            shas += bytes.fromhex(sha)
+            records += RECORD.pack(bytes.fromhex(tree) if tree else bytes(SHA_SIZE),
+                                   first, second, generation_of(sha), timestamp or 0)
+
+        data = bytearray(HEADER.pack(GRAPH_MAGIC, GRAPH_VERSION, len(order), base))
+        data += FANOUT.pack(*fanout)
+        data += shas
+        data += records
+        data += EDGE.pack(len(edges))
+        for value in edges:
+            data += EDGE.pack(value)
+        checksum = hashlib.sha1(data).digest()
+        data += checksum
+
+        os.makedirs(self.graph_dir, exist_ok=True)
+        name = f"graph-{checksum.hex()}.graph"
+        tmp_path = os.path.join(self.graph_dir, name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(self.graph_dir, name))
+        return name
+
+    def _generation_at(self, layers, position):
+        for layer in layers:
+            if position < layer.base + layer.count:
+                return layer.record(position - layer.base)[3]
+        return 0
+
+
+class _Layer:
+    """ One memory-mapped commit-graph file. """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.base = HEADER.unpack_from(self._map, 0)
+        if magic != GRAPH_MAGIC or version != GRAPH_VERSION:
+            raise ValueError(f"{path} is not a supported commit-graph file")
+        self._fanout = FANOUT.unpack_from(self._map, HEADER.size)
+        self._shas_at = HEADER.size + FANOUT.size
+        self._records_at = self._shas_at + self.count * SHA_SIZE
+        self._edges_at = self._records_at + self.count * RECORD.size + EDGE.size
+
+    def find(self, key):
+        """ Returns the index of the raw sha 'key' in this layer, or None. """
+        lo = self._fanout[key[0] - 1] if key[0] else 0
+        hi = self._fanout[key[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self.sha_at(mid)
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def sha_at(self, i):
+        at = self._shas_at + i * SHA_SIZE
+        return self._map[at:at + SHA_SIZE]
+
+    def record(self, i):
+        return RECORD.unpack_from(self._map, self._records_at + i * RECORD.size)
+
+    def edge(self, i):
+        return EDGE.unpack_from(self._map, self._edges_at + i * EDGE.size)[0]
+
+    def close(self):
+        self._map.close()
+
+
+def commit_time(timestamp):
+    """ Returns a commit's "timestamp" header as seconds since the epoch, or 0 if it cannot be read. """
+    if not timestamp:
+        return 0
+    match = _UNIX_TIME_RE.search(timestamp)
+    if match:
+        return int(match.group(1))
+    try:
+        return int(float(timestamp))
+    except ValueError:
+        pass
+    try:
+        return int(datetime.datetime.strptime(timestamp.strip()[:19], "%Y-%m-%d %H:%M:%S").timestamp())
+    except ValueError:
+        return 0
@@ -0,0 +1,133 @@
+import os
+import json
+import hashlib
+from gitmini.classes.LockFile import LockFile, LockError
+
+DIR_CACHE_FILENAME = "dircache"
+DIR_CACHE_VERSION = 1
+
+
+class DirCache:
+    """
+    Remembers the non-ignored contents of every directory in the working tree,
+    keyed on the directory's mtime. Adding, removing or renaming an entry
+    changes a directory's mtime, so a directory whose mtime is unchanged can be
+    listed from the cache without reading it or evaluating ignore rules.
+
+    Stored alongside the index in .gitmini/dircache as JSON:
+        {"version": 1, "ignore": <hash of the ignore rules>,
+         "dirs": {<rel_dir>: [<mtime_ns>, [<files>], [<subdirs>]]}}
+    """
+
+    def __init__(self, repo, ignore):
+        self.repo = repo
+        self.ignore = ignore
+        self.path = os.path.join(repo.gitmini_dir, DIR_CACHE_FILENAME)
+        self.rules_hash = hashlib.sha1("\n".join(ignore.rules).encode("utf-8")).hexdigest()
+        self.dirs = {}  # rel_dir ("" for the root) → [mtime_ns, files, subdirs]
+        self.timestamp_ns = 0
+        self.dirty = False
+        self._walked = []  # (root of a walk, dirs seen during it)
+        self.monitor = None  # optional FSMonitor vouching for unchanged directories
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except ValueError:
+                data = {}
+            # Cached listings depend on the ignore rules they were built with
+            if data.get("version") == DIR_CACHE_VERSION and data.get("ignore") == self.rules_hash:
+                self.dirs = data.get("dirs", {})
+                self.timestamp_ns = os.stat(self.path).st_mtime_ns
+
+    def walk(self, rel_dir=""):
+        """
+        Returns the repo-relative paths of all non-ignored files under rel_dir,
+        in the same top-down, sorted order as os.walk with sorted dirs.
+        """
+        files_out = []
+        seen = set()
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            seen.add(current)
+            files, subdirs = self.list_dir(current)
+            prefix = current + os.sep if current else ""
+            files_out.extend(prefix + name for name in files)
+            stack.extend(prefix + name for name in reversed(subdirs))
+        self._walked.append((rel_dir, seen))
+        return files_out
+
+    def list_dir(self, rel_dir):
+        """ Returns (files, subdirs) of a directory, both sorted and ignore-filtered. """
+        cached = self.dirs.get(rel_dir)
+        # Directories the file-system monitor saw no change in need no stat() at all
+        if (cached and cached[0] != -1 and self.monitor is not None
+                and not self.monitor.is_changed(rel_dir)):
+            return cached[1], cached[2]
+
+        abs_dir = os.path.join(self.repo.root, rel_dir)
+        mtime_ns = os.stat(abs_dir).st_mtime_ns
+
+        # A directory changed in the same tick as the cache write may have
+        # changed again without its mtime moving, so it is re-read
+        if cached and cached[0] == mtime_ns and mtime_ns < self.timestamp_ns:
+            return cached[1], cached[2]
+
+        prefix = rel_dir + os.sep if rel_dir else ""
+        files, subdirs = [], []
+        with os.scandir(abs_dir) as it:
+            for entry in it:
+                name = entry.name
+                if entry.is_dir():
+                    # Like os.walk, symlinked directories are not followed
+                    if name == ".gitmini" or entry.is_symlink():
+                        continue
+                    if not self.ignore.match(prefix + name, is_dir=True):
+                        subdirs.append(name)
+                elif not self.ignore.match(prefix + name):
+                    files.append(name)
+        files.sort()
+        subdirs.sort()
+
+        self.dirs[rel_dir] = [mtime_ns, files, subdirs]
+        self.dirty = True
+        return files, subdirs
+
+    def write(self):
+        # Forget directories that no longer exist under the walked roots
+        for root, seen in self._walked:
+            prefix = root + os.sep if root else ""
+            for rel_dir in list(self.dirs):
+                if rel_dir not in seen and (rel_dir == root or rel_dir.startswith(prefix)):
+                    del self.dirs[rel_dir]
+                    self.dirty = True
+        self._walked = []
+
+        if not self.dirty:
+            return
+        # The cache only saves work, so it is not written while another
+        # process is writing it
+        try:
+            lock = LockFile(self.path, timeout=0).acquire()
+        except LockError:
+            return
+        with lock:
+            self._write_file(lock)
+
+            # Racy-timestamp protection, as for the stat cache: directories not
+            # older than the cache file are marked so they are re-read next time
+            self.timestamp_ns = os.fstat(lock.fileno()).st_mtime_ns
+            racy = [d for d, entry in self.dirs.items() if entry[0] >= self.timestamp_ns]
+            if racy:
+                for d in racy:
+                    self.dirs[d][0] = -1
+                self._write_file(lock)
+                self.timestamp_ns = os.fstat(lock.fileno()).st_mtime_ns
+            lock.commit()
+        self.dirty = False
+
+    def _write_file(self, lock):
+        lock.write(json.dumps({"version": DIR_CACHE_VERSION, "ignore": self.rules_hash,
+                               "dirs": self.dirs}, separators=(",", ":")))
@@ -0,0 +1,364 @@
+import os
+import sys
+import json
+import errno
+import socket
+import struct
+import ctypes
+import ctypes.util
+import selectors
+
+from gitmini.classes.IgnoreMatcher import IgnoreMatcher, IGNORE_FILENAME
+from gitmini.classes.LockFile import LockFile, LockError
+from gitmini.utils import read_config
+
+SOCKET_FILENAME = "fsmonitor.sock"
+PID_FILENAME = "fsmonitor.pid"
+LOG_FILENAME = "fsmonitor.log"
+STATE_FILENAME = "fsmonitor-state"
+
+# Past this many distinct changed paths the daemon forgets its history and
+# asks clients for a full scan, which keeps its memory bounded
+MAX_TRACKED_PATHS = 500000
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+              | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class Inotify:
+    """ Minimal ctypes binding for Linux inotify. """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._rm_watch = libc.inotify_rm_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path, mask):
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """ Returns every queued (wd, mask, name) event without blocking. """
+        events = []
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _cookie, length = EVENT_HEADER.unpack_from(buf, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(buf[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                events.append((wd, mask, name))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FSMonitorDaemon:
+    """
+    Watches the working tree with inotify and answers "what changed since
+    token T?" over a Unix socket in .gitmini/.
+
+    Tokens look like "<instance>:<seq>". A token from another daemon instance,
+    or from before a queue overflow, is answered with {"full": true}, meaning
+    the client has to scan the whole tree.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.socket_path = os.path.join(repo.gitmini_dir, SOCKET_FILENAME)
+        self.instance = os.urandom(8).hex()
+        self.seq = 0
+        self.min_seq = 0
+        self.changed = {}   # rel_path → seq of its last change
+        self.subtrees = {}  # rel_dir → seq; everything below it may have changed
+        self.watches = {}   # wd → rel_dir
+        self.ignore = IgnoreMatcher(repo)
+        self.inotify = Inotify()
+        self.running = False
+
+    def serve(self):
+        self.running = True
+        self._watch_tree("")
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server.bind(self.socket_path)
+        server.listen(16)
+
+        selector = selectors.DefaultSelector()
+        selector.register(self.inotify.fd, selectors.EVENT_READ, "inotify")
+        selector.register(server, selectors.EVENT_READ, "socket")
+
+        try:
+            while self.running:
+                for key, _ in selector.select():
+                    if key.data == "inotify":
+                        self._process_events()
+                    else:
+                        conn, _ = server.accept()
+                        with conn:
+                            self._handle_client(conn)
+        finally:
+            selector.close()
+            server.close()
+            self.inotify.close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def _handle_client(self, conn):
+        conn.settimeout(1)
+        try:
+            request = conn.makefile("r").readline().split()
+        except OSError:
+            return
+        op = request[0] if request else ""
+
+        # Events for changes the client made just before asking are already
+        # queued, so drain them to answer with an up-to-date view
+        self._process_events()
+
+        if op == "query":
+            reply = self._query(request[1] if len(request) > 1 else "")
+        elif op == "quit":
+            self.running = False
+            reply = {"status": "stopping"}
+        else:
+            reply = {"status": "ok", "token": self._token(), "watches": len(self.watches)}
+        try:
+            conn.sendall((json.dumps(reply) + "\n").encode("utf-8"))
+        except OSError:
+            pass
+
+    def _query(self, token):
+        instance, _, seq = token.partition(":")
+        reply = {"token": self._token()}
+        if instance != self.instance or not seq.isdigit() or int(seq) < self.min_seq:
+            reply["full"] = True
+            return reply
+        since = int(seq)
+        reply["changed"] = sorted(p for p, s in self.changed.items() if s > since)
+        reply["subtrees"] = sorted(p for p, s in self.subtrees.items() if s > since)
+        return reply
+
+    def _token(self):
+        return f"{self.instance}:{self.seq}"
+
+    def _reset(self):
+        # Invalidates every token handed out so far
+        self.seq += 1
+        self.min_seq = self.seq
+        self.changed.clear()
+        self.subtrees.clear()
+
+    def _watch_tree(self, rel_dir):
+        # Watches rel_dir and every non-ignored directory below it
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            abs_dir = os.path.join(self.repo.root, current)
+            try:
+                wd = self.inotify.add_watch(abs_dir, WATCH_MASK)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    # Out of inotify watches: changes could be missed, so stop
+                    # and let clients fall back to full scans
+                    print("fsmonitor: inotify watch limit reached, exiting", file=sys.stderr)
+                    self.running = False
+                continue
+            self.watches[wd] = current
+            prefix = current + os.sep if current else ""
+            try:
+                entries = list(os.scandir(abs_dir))
+            except OSError:
+                continue
+            for entry in entries:
+                rel = prefix + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name == ".gitmini" or self.ignore.match(rel, is_dir=True):
+                        continue
+                    stack.append(rel)
+
+    def _unwatch_tree(self, rel_dir):
+        prefix = rel_dir + os.sep
+        for wd, path in list(self.watches.items()):
+            if path == rel_dir or path.startswith(prefix):
+                self.inotify.rm_watch(wd)
+                del self.watches[wd]
+
+    def _process_events(self):
+        for wd, mask, name in self.inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                self._reset()
+                continue
+            rel_dir = self.watches.get(wd)
+            if rel_dir is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                if rel_dir == "":
+                    self.running = False  # the working tree itself is gone
+                continue
+
+            rel = os.path.join(rel_dir, name) if rel_dir else name
+            if rel_dir == "" and name == ".gitmini":
+                continue
+            self.seq += 1
+            self.changed[rel] = self.seq
+
+            if mask & (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO):
+                self.changed[rel_dir] = self.seq  # the directory listing changed
+                if mask & IN_ISDIR:
+                    # A whole subtree appeared or vanished under this name
+                    self.subtrees[rel] = self.seq
+                    if mask & IN_MOVED_FROM:
+                        self._unwatch_tree(rel)
+                    elif mask & (IN_CREATE | IN_MOVED_TO) and not self.ignore.match(rel, is_dir=True):
+                        self._watch_tree(rel)
+
+            if rel == IGNORE_FILENAME:
+                # Other paths are ignored now, so start over with fresh watches
+                self.ignore = IgnoreMatcher(self.repo)
+                self._watch_tree("")
+                self._reset()
+
+        if len(self.changed) + len(self.subtrees) > MAX_TRACKED_PATHS:
+            self._reset()
+
+
+class FSMonitor:
+    """
+    Client side of the file-system monitor. Asks the daemon which paths changed
+    since the token saved by the last command, so unchanged files and
+    directories can be trusted without stat() or readdir calls.
+
+    Enabled with 'gitmini config fsmonitor true'. Whenever the daemon is not
+    running, is disabled, or cannot answer incrementally, changed_paths()
+    returns None and the caller falls back to a full scan.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.enabled = bool(read_config(repo).get("fsmonitor")) and sys.platform.startswith("linux")
+        self.state_path = os.path.join(repo.gitmini_dir, STATE_FILENAME)
+        self.new_token = None
+        self.changed = None
+        self.subtrees = None
+
+    def changed_paths(self):
+        """
+        Returns the set of repo-relative paths that may have changed since the
+        last saved token, or None if a full scan is needed. Paths below any
+        directory in self.subtrees are considered changed too (see is_changed).
+        """
+        if not self.enabled:
+            return None
+        state = self._load_state()
+        reply = request(self.repo, "query " + (state.get("token") or "-"))
+        if not reply or "token" not in reply:
+            return None
+        self.new_token = reply["token"]
+        if reply.get("full") or not state.get("token"):
+            return None
+        self.changed = set(reply["changed"]) | set(state.get("pending", []))
+        self.subtrees = set(reply["subtrees"]) | set(state.get("pending_subtrees", []))
+        return self.changed
+
+    def is_changed(self, rel_path):
+        if self.changed is None or rel_path in self.changed:
+            return True
+        parent = os.path.dirname(rel_path)
+        while parent:
+            if parent in self.subtrees:
+                return True
+            parent = os.path.dirname(parent)
+        return "" in self.subtrees
+
+    def save(self, scopes):
+        """
+        Records the token obtained by changed_paths() once the caller has
+        re-checked everything under the given repo-relative directories
+        ("" is the whole tree). Reported changes outside those scopes are kept
+        as pending, so they are re-checked by a later command.
+        """
+        if not self.enabled:
+            return
+        state = {"token": None}
+        if self.new_token and (self.changed is not None or "" in scopes):
+            state["token"] = self.new_token
+            if self.changed is not None:
+                state["pending"] = sorted(p for p in self.changed if not in_scopes(p, scopes))
+                state["pending_subtrees"] = sorted(p for p in self.subtrees if not in_scopes(p, scopes))
+        # Skipped while another process saves; changes are then re-reported
+        try:
+            with LockFile(self.state_path, timeout=0) as lock:
+                lock.write(json.dumps(state))
+                lock.commit()
+        except LockError:
+            pass
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+def request(repo, line, timeout=1.0):
+    """ Sends one request line to the repo's daemon; returns its reply or None. """
+    socket_path = os.path.join(repo.gitmini_dir, SOCKET_FILENAME)
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
+            s.connect(socket_path)
+            s.sendall((line + "\n").encode("utf-8"))
+            reply = s.makefile("r").readline()
+        return json.loads(reply) if reply else None
+    except (OSError, ValueError):
+        return None
+
+
+def in_scopes(rel_path, scopes):
+    """ True if the path is one of the repo-relative scopes or lies below one ("" is the whole tree). """
+    for scope in scopes:
+        if scope == "" or rel_path == scope or rel_path.startswith(scope + os.sep):
+            return True
+    return False
@@ -0,0 +1,106 @@
+import os
+import re
+
+IGNORE_FILENAME = ".gitmini-ignore"
+
+
+class IgnoreMatcher:
+    """
+    Compiles the rules in .gitmini-ignore into a single regex, once.
+
+    Rules follow .gitignore conventions:
+        - blank lines and lines starting with '#' are skipped
+        - 'name' matches a file or directory with that name at any depth
+        - 'dir/' only matches directories
+        - a rule containing '/' (e.g. '/build' or 'docs/*.tmp') is relative
+          to the repository root
+        - '*' and '?' do not cross '/', '**' matches any number of directories
+    Anything under an ignored directory is ignored too, which lets the
+    working-tree walk skip whole subtrees.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.path = os.path.join(repo.root, IGNORE_FILENAME)
+
+        rules = []
+        if os.path.isfile(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                rules = f.read().splitlines()
+        self.rules = [r.strip() for r in rules if r.strip() and not r.strip().startswith("#")]
+
+        file_patterns = []
+        dir_patterns = []
+        for rule in self.rules:
+            pattern = compile_rule(rule)
+            dir_patterns.append(pattern)
+            if not rule.endswith("/"):
+                file_patterns.append(pattern)
+        self._file_re = _combine(file_patterns)
+        self._dir_re = _combine(dir_patterns)
+
+    def match(self, rel_path, is_dir=False):
+        """ True if a rule matches this exact path (its parents are not checked). """
+        regex = self._dir_re if is_dir else self._file_re
+        if regex is None:
+            return False
+        return regex.match(rel_path.replace(os.sep, "/")) is not None
+
+    def should_ignore(self, rel_path, is_dir=False):
+        """ True if the path, or any directory above it, is ignored. """
+        parts = rel_path.replace(os.sep, "/").split("/")
+        for i in range(1, len(parts)):
+            if self.match("/".join(parts[:i]), is_dir=True):
+                return True
+        return self.match(rel_path, is_dir)
+
+
+def compile_rule(rule):
+    """ Returns the regex source (unanchored at the end) for one rule, without its trailing '/'. """
+    pattern = rule.rstrip("/")
+    anchored = pattern.startswith("/") or "/" in pattern
+    body = _translate(pattern.lstrip("/"))
+    if anchored:
+        return body
+    return "(?:.*/)?" + body
+
+
+def _combine(patterns):
+    if not patterns:
+        return None
+    return re.compile("(?:" + "|".join(patterns) + r")\Z")
+
+
+def _translate(pattern):
+    # Glob → regex, where '*' and '?' stay within one path component
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**", i):
+            i += 2
+            if i < n and pattern[i] == "/":
+                out.append("(?:.*/)?")
+                i += 1
+            else:
+                out.append(".*")
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            # A ']' right after '[' or '[!' is part of the class
+            end = pattern.find("]", i + 3 if pattern.startswith("[!", i) else i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
@@ -0,0 +1,457 @@
+import os
+import mmap
+import bisect
+import struct
+import hashlib
+from gitmini.classes.LockFile import LockFile, LOCK_TIMEOUT
+
+INDEX_FILENAME = "index"
+LEGACY_STAT_FILENAME = "index-stat"
+
+INDEX_MAGIC = b"GMIX"
+INDEX_VERSION = 1
+HEADER = struct.Struct(">4sIII")             # magic, version, entry count, restart count
+ENTRY = struct.Struct(">20sqqqQIHH")         # sha, size, mtime_ns, ctime_ns, inode, mode, shared, suffix length
+RESTART = struct.Struct(">I")
+CHECKSUM_SIZE = 20
+
+# Every RESTART_INTERVAL-th entry stores its full path; the ones in between only
+# store what differs from the previous path. Binary search runs over the
+# restart points, then scans at most RESTART_INTERVAL entries.
+RESTART_INTERVAL = 16
+
+# Stat fields of an entry whose stat data must not be trusted
+NO_STAT = (-1, 0, 0, 0, 0)
+
+
+def stat_key(st):
+    # The stat() fields that change whenever a file's content is rewritten
+    return (st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino, st.st_mode)
+
+
+class Index:
+    """
+    The staging area: path → blob hash, plus the stat() data each file had when
+    it was hashed, so unchanged files can be skipped without being read.
+
+    On disk this is a versioned binary file, sorted by path:
+        header   "GMIX", version, entry count, restart count
+        entries  raw 20-byte sha, size, mtime_ns, ctime_ns, inode, mode,
+                 shared prefix length, suffix length, path suffix
+        restarts offsets of the entries that store a full path
+        checksum SHA-1 of everything above
+    The file is memory-mapped. get(), add(), remove() and the stat queries
+    work on it through a binary search, keeping changes aside, so the whole
+    index is only decoded when 'entries' is used. write() re-encodes just
+    the restart blocks that hold changed paths and copies the rest of the
+    file, unless most blocks changed. So entries are changed through add(),
+    remove() or by assigning 'entries', never by editing the dict. Text
+    indexes ("<sha> <path>" lines) are read transparently and rewritten in
+    the binary format on the next write().
+
+    write() replaces the file atomically through index.lock (see LockFile).
+    Commands that change the index pass lock=True, which takes the lock
+    before the index is read, so two of them cannot both start from the
+    same index and lose each other's changes. 'timeout' is how long to wait
+    for that lock (see LockFile).
+    """
+
+    def __init__(self, repo, lock=False, timeout=LOCK_TIMEOUT):
+        self.repo = repo
+        self.path = os.path.join(repo.gitmini_dir, INDEX_FILENAME)
+        self._lock = LockFile(self.path, timeout).acquire() if lock else None
+        self.timestamp_ns = 0  # mtime of the index file when it was last written
+        self._map = None
+        self._count = 0
+        self._restarts = []
+        self._entries = None  # path → sha, parsed on first use
+        self._stats = None    # path → (sha, size, mtime_ns, ctime_ns, inode, mode)
+        # Changes made before the index is parsed (None: removed or forgotten)
+        self._entry_changes = {}  # path → sha
+        self._stat_changes = {}   # path → stat entry
+        self._changed = set()  # paths changed since the file was last read or written
+        self._legacy = False
+        self.stats_changed = False  # stat data was refreshed since loading
+
+        if not os.path.exists(self.path):
+            return
+        self.timestamp_ns = os.stat(self.path).st_mtime_ns
+        self._open()
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._load()
+        return self._entries
+
+    @entries.setter
+    def entries(self, new_entries):
+        # Only the paths that differ count as changed, so write() can still
+        # splice; stat data stays valid for paths whose hash did not change
+        old = self.entries
+        for path in [p for p in old if p not in new_entries]:
+            self.remove(path)
+        for path, sha in new_entries.items():
+            if old.get(path) != sha:
+                self.add(path, sha)
+
+    def add(self, path, sha):
+        if self._parsed:
+            self._entries[path] = sha
+        else:
+            self._entry_changes[path] = sha
+        self._touch(path)
+
+    def remove(self, path):
+        if self._parsed:
+            self._entries.pop(path, None)
+        else:
+            self._entry_changes[path] = None
+        self._touch(path)
+
+    def get(self, path):
+        """ Returns the staged hash of 'path' (or None) without parsing the whole index. """
+        if self._parsed:
+            return self._entries.get(path)
+        if path in self._entry_changes:
+            return self._entry_changes[path]
+        found = self._find(path.encode("utf-8", "surrogateescape"))
+        return found[1][0] if found else None
+
+    # Stat data
+
+    def lookup(self, path, st):
+        """ Returns the hash recorded for 'path' if its stat data still matches, else None. """
+        entry = self._stat(path)
+        if entry is None or entry[1:] != stat_key(st) or entry[2] >= self.timestamp_ns:
+            return None
+        return entry[0]
+
+    def is_fresh(self, path, sha, st):
+        """
+        True if 'path' was last hashed to 'sha' and has not been touched since.
+        Files modified in the same clock tick as the last index write are
+        "racily clean": their stat data cannot be trusted, so they are re-hashed.
+        """
+        return self.lookup(path, st) == sha
+
+    def is_known(self, path, sha):
+        """
+        True if 'path' has a trusted entry for 'sha'. Used without a stat() call
+        when the file-system monitor reports that the file has not been touched.
+        """
+        entry = self._stat(path)
+        return entry is not None and entry[0] == sha and entry[1] != -1 and entry[2] < self.timestamp_ns
+
+    def update_stat(self, path, sha, st):
+        entry = (sha,) + stat_key(st)
+        if self._stat(path) != entry:
+            self._set_stat(path, entry)
+
+    def forget_stat(self, path):
+        if self._stat(path) is not None:
+            self._set_stat(path, None)
+
+    def write(self, timeout=LOCK_TIMEOUT):
+        """ Writes the index, releasing its lock; raises LockError if another process holds it. """
+        lock = self._lock or LockFile(self.path, timeout).acquire()
+        self._lock = None
+        if self._spliceable():
+            if self._stats is None:
+                entry_changes, stat_changes = self._entry_changes, self._stat_changes
+            else:
+                entry_changes = {p: self._entries.get(p) for p in self._changed}
+                stat_changes = {p: self._stats.get(p) for p in self._changed}
+            # Only refreshed entries can be racy: the others are older than
+            # the index they were last written to
+            stats = {p: e for p, e in stat_changes.items() if e is not None}
+            data = self._map[:]
+            body_end = len(data) - CHECKSUM_SIZE
+            if hashlib.sha1(memoryview(data)[:body_end]).digest() != data[body_end:]:
+                lock.rollback()
+                raise ValueError(f"index file {self.path} is corrupt (bad checksum)")
+            encode = lambda: self._splice(data, entry_changes, stat_changes, stats)
+        else:
+            entries = self.entries
+            stats = self._stats
+            encode = lambda: self._encode(entries, stats)
+        self.close()
+
+        try:
+            lock.write(encode())
+
+            # Racy-timestamp protection: an entry whose mtime is not older than
+            # the index itself could be edited again within the same tick
+            # without its stat data changing. Smudge its size so it is
+            # re-hashed next time.
+            self.timestamp_ns = os.fstat(lock.fileno()).st_mtime_ns
+            racy = [p for p, s in stats.items() if s[2] >= self.timestamp_ns and s[1] != -1]
+            if racy:
+                for p in racy:
+                    stats[p] = (stats[p][0], -1) + stats[p][2:]
+                    if self._stats is not None:
+                        self._stats[p] = stats[p]
+                lock.write(encode())
+                self.timestamp_ns = os.fstat(lock.fileno()).st_mtime_ns
+            lock.commit()  # renaming keeps the mtime
+        finally:
+            lock.rollback()
+
+        legacy_stat_path = os.path.join(self.repo.gitmini_dir, LEGACY_STAT_FILENAME)
+        if os.path.exists(legacy_stat_path):
+            os.remove(legacy_stat_path)
+        self._legacy = False
+        self.stats_changed = False
+        self._changed = set()
+        self._entry_changes, self._stat_changes = {}, {}
+        self._open()
+
+    @property
+    def locked(self):
+        return self._lock is not None
+
+    def unlock(self):
+        """ Releases a lock taken with lock=True without writing. """
+        if self._lock is not None:
+            self._lock.rollback()
+            self._lock = None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    # Internals
+
+    @property
+    def _parsed(self):
+        # Whether the whole index is held in memory; a missing or text index
+        # is always parsed
+        if self._stats is None and self._map is None:
+            self._load()
+        return self._stats is not None
+
+    def _open(self):
+        with open(self.path, "rb") as f:
+            if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                self._legacy = True
+                return
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self._count, restart_count = HEADER.unpack_from(self._map, 0)
+        if version != INDEX_VERSION:
+            raise ValueError(f"unsupported index version {version}")
+        restarts_at = len(self._map) - CHECKSUM_SIZE - restart_count * RESTART.size
+        self._restarts = [RESTART.unpack_from(self._map, restarts_at + i * RESTART.size)[0]
+                          for i in range(restart_count)]
+
+    def _stat(self, path):
+        # The stat entry of 'path', looked up in the mapped file until the
+        # index is parsed
+        if self._parsed:
+            return self._stats.get(path)
+        if path in self._stat_changes:
+            return self._stat_changes[path]
+        found = self._find(path.encode("utf-8", "surrogateescape"))
+        return found[1] if found else None
+
+    def _set_stat(self, path, entry):
+        if not self._parsed:
+            self._stat_changes[path] = entry
+        elif entry is None:
+            del self._stats[path]
+        else:
+            self._stats[path] = entry
+        self.stats_changed = True
+        self._touch(path)
+
+    def _touch(self, path):
+        self._changed.add(path)
+
+    def _spliceable(self):
+        # Splicing rewrites one restart block per changed path, so once the
+        # index is parsed it only pays off while few blocks are touched
+        if self._map is None:
+            return False
+        return self._stats is None or len(self._changed) < len(self._restarts) // 2
+
+    def _load(self):
+        if self._stats is not None:
+            return
+        entries, stats = {}, {}
+        self._entries, self._stats = entries, stats
+        if self._legacy:
+            self._load_legacy()
+        elif self._map is not None:
+            data = self._map[:]
+            body_end = len(data) - CHECKSUM_SIZE
+            if hashlib.sha1(memoryview(data)[:body_end]).digest() != data[body_end:]:
+                raise ValueError(f"index file {self.path} is corrupt (bad checksum)")
+            unpack, entry_size = ENTRY.unpack_from, ENTRY.size
+            offset = HEADER.size
+            path = b""
+            for _ in range(self._count):
+                raw_sha, size, mtime, ctime, ino, mode, shared, length = unpack(data, offset)
+                offset += entry_size
+                path = path[:shared] + data[offset:offset + length]
+                offset += length
+                name = path.decode("utf-8", "surrogateescape")
+                sha = raw_sha.hex()
+                entries[name] = sha
+                stats[name] = (sha, size, mtime, ctime, ino, mode)
+        for changes, target in ((self._entry_changes, entries), (self._stat_changes, stats)):
+            for path, value in changes.items():
+                if value is None:
+                    target.pop(path, None)
+                else:
+                    target[path] = value
+        self._entry_changes, self._stat_changes = {}, {}
+
+    def _load_legacy(self):
+        # Text index: "<sha> <path>" per line, with stat data in a sidecar file
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not line:
+                    continue
+                sha, path = line.split(" ", 1)
+                self._entries[path] = sha
+        legacy_stat_path = os.path.join(self.repo.gitmini_dir, LEGACY_STAT_FILENAME)
+        if os.path.exists(legacy_stat_path):
+            with open(legacy_stat_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split(" ", 6)
+                    if len(parts) == 7:
+                        self._stats[parts[6]] = (parts[0],) + tuple(int(p) for p in parts[1:6])
+
+    def _find(self, key):
+        # Binary search over the restart points, then a short linear scan;
+        # returns (offset, stat entry) or None
+        lo, hi = 0, len(self._restarts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _full_path_at(self._map, self._restarts[mid]) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return None
+        if lo < len(self._restarts):
+            end = self._restarts[lo]
+        else:
+            end = len(self._map) - CHECKSUM_SIZE - len(self._restarts) * RESTART.size
+        for offset, path, raw_sha, fields in _scan(self._map, self._restarts[lo - 1], end):
+            if path == key:
+                return offset, (raw_sha.hex(),) + fields
+            if path > key:
+                return None
+        return None
+
+    def _splice(self, data, entry_changes, stat_changes, stats):
+        # Re-encodes the restart blocks of 'data' (the current file) that hold
+        # a changed path and copies the others unchanged
+        starts = [_full_path_at(data, offset) for offset in self._restarts]
+        ends = self._restarts[1:] + [len(data) - CHECKSUM_SIZE - len(self._restarts) * RESTART.size]
+        touched = {}  # block → {key: path}
+        for path in set(entry_changes) | set(stat_changes):
+            key = path.encode("utf-8", "surrogateescape")
+            touched.setdefault(max(bisect.bisect_right(starts, key) - 1, 0), {})[key] = path
+
+        parts = []
+        restarts = []
+        count = self._count
+        offset = HEADER.size
+        for block in range(len(starts)) if starts else touched:
+            if block not in touched:
+                restarts.append(offset)
+                parts.append(data[self._restarts[block]:ends[block]])
+                offset += len(parts[-1])
+                continue
+            rows = {}  # key → (sha, stat fields)
+            if starts:
+                for _offset, key, raw_sha, fields in _scan(data, self._restarts[block], ends[block]):
+                    rows[key] = (raw_sha.hex(), fields)
+            count -= len(rows)
+            for key, path in touched[block].items():
+                old = rows.get(key)
+                sha = entry_changes[path] if path in entry_changes else old and old[0]
+                if sha is None:
+                    rows.pop(key, None)
+                elif path in stat_changes:
+                    stat_data = stats.get(path)
+                    rows[key] = (sha, stat_data[1:] if stat_data and stat_data[0] == sha else NO_STAT)
+                else:
+                    rows[key] = (sha, old[1] if old and old[0] == sha else NO_STAT)
+            encoded, block_restarts, _count = _encode_rows(
+                ((key, sha, fields) for key, (sha, fields) in sorted(rows.items())), offset)
+            restarts.extend(block_restarts)
+            parts.append(encoded)
+            offset += len(encoded)
+            count += len(rows)
+
+        out = bytearray(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, count, len(restarts)))
+        out += b"".join(parts)
+        out += b"".join(RESTART.pack(o) for o in restarts)
+        out += hashlib.sha1(out).digest()
+        return bytes(out)
+
+    def _encode(self, entries, stats):
+        get_stat = stats.get
+
+        def rows():
+            for key, path in sorted((p.encode("utf-8", "surrogateescape"), p) for p in entries):
+                sha = entries[path]
+                stat_data = get_stat(path)
+                yield key, sha, stat_data[1:] if stat_data and stat_data[0] == sha else NO_STAT
+
+        body, restarts, count = _encode_rows(rows(), HEADER.size)
+        data = bytearray(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, count, len(restarts)))
+        data += body
+        data += b"".join(RESTART.pack(offset) for offset in restarts)
+        data += hashlib.sha1(data).digest()
+        return bytes(data)
+
+
+def _encode_rows(rows, offset):
+    # Encodes sorted (key, sha, stat fields) rows that start at 'offset' in
+    # the file; returns the bytes, their restart offsets and the row count.
+    # The highest set bit of the XOR of two paths marks the first byte that
+    # differs, so the shared prefix is found without a Python-level loop.
+    parts = []
+    restarts = []
+    pack, fromhex, from_bytes = ENTRY.pack, bytes.fromhex, int.from_bytes
+    previous = b""
+    count = 0
+    for key, sha, fields in rows:
+        if count % RESTART_INTERVAL:
+            n = min(len(previous), len(key), 0xFFFF)
+            shared = n - ((from_bytes(previous[:n], "big") ^ from_bytes(key[:n], "big")).bit_length() + 7) // 8
+        else:
+            shared = 0
+            restarts.append(offset)
+        suffix = key[shared:]
+        record = pack(fromhex(sha), *fields, shared, len(suffix))
+        parts.append(record)
+        parts.append(suffix)
+        offset += len(record) + len(suffix)
+        previous = key
+        count += 1
+    return b"".join(parts), restarts, count
+
+
+def _scan(data, offset, end):
+    # Yields (offset, path, raw sha, stat fields) for the entries of one
+    # restart block
+    path = b""
+    while offset < end:
+        raw_sha, size, mtime, ctime, ino, mode, shared, length = ENTRY.unpack_from(data, offset)
+        start = offset + ENTRY.size
+        path = path[:shared] + data[start:start + length]
+        yield offset, path, raw_sha, (size, mtime, ctime, ino, mode)
+        offset = start + length
+
+
+def _full_path_at(data, offset):
+    length = ENTRY.unpack_from(data, offset)[7]
+    start = offset + ENTRY.size
+    return data[start:start + length]
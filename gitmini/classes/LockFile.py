@@ -0,0 +1,116 @@
+import os
+import time
+import atexit
+
+LOCK_SUFFIX = ".lock"
+
+# How long a writer waits for another one to release a lock, and the
+# bounds of the exponential backoff between attempts
+LOCK_TIMEOUT = 2.0
+MIN_BACKOFF = 0.005
+MAX_BACKOFF = 0.1
+
+_held = set()  # locks this process holds, removed on exit
+
+
+class LockError(OSError):
+    """ Raised when a lock is still held by another process after the timeout. """
+
+
+class LockFile:
+    """
+    Exclusive write access to one repository file, like git's lockfiles.
+
+    acquire() creates <path>.lock with O_CREAT | O_EXCL, which only one
+    process can do. The new content is written into the lock file and
+    commit() renames it over <path>, so the update is atomic. rollback()
+    deletes it and leaves <path> unchanged. Readers never take the lock:
+    they see either the old file or the new one.
+
+    A writer that finds the lock taken retries with exponential backoff for
+    up to 'timeout' seconds (0: a single attempt), then raises LockError.
+    Locks still held when the process exits are removed.
+
+        with LockFile(path) as lock:
+            lock.write(data)
+            lock.commit()
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.path = path
+        self.lock_path = path + LOCK_SUFFIX
+        self.timeout = timeout
+        self._fd = None
+        self._owner = None
+
+    @property
+    def held(self):
+        return self._fd is not None
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        backoff = MIN_BACKOFF
+        while True:
+            try:
+                self._fd = os.open(self.lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                break
+            except FileExistsError:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LockError(
+                        f"unable to create '{self.lock_path}': another gitmini process seems to be "
+                        f"running; if not, remove the file") from None
+                time.sleep(min(backoff, remaining))
+                backoff = min(backoff * 2, MAX_BACKOFF)
+        self._owner = os.getpid()
+        _held.add(self)
+        return self
+
+    def write(self, data):
+        """ Sets the content the file will have once committed (str or bytes). """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.ftruncate(self._fd, 0)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+
+    def fileno(self):
+        return self._fd
+
+    def commit(self):
+        """ Replaces the file with what was written and releases the lock. """
+        os.close(self._fd)
+        self._fd = None
+        _held.discard(self)
+        os.replace(self.lock_path, self.path)
+
+    def rollback(self):
+        """ Releases the lock without touching the file. """
+        if self._fd is None:
+            return
+        os.close(self._fd)
+        self._fd = None
+        _held.discard(self)
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        if not self.held:
+            self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.rollback()  # no-op once committed
+        return False
+
+
+@atexit.register
+def _remove_held_locks():
+    # Forked workers inherit the set; only the process that took a lock removes it
+    for lock in list(_held):
+        if lock._owner == os.getpid():
+            lock.rollback()
@@ -0,0 +1,856 @@
+import io
+import os
+import bisect
+import re
+import errno
+import zlib
+import struct
+import hashlib
+import tempfile
+from collections import OrderedDict
+
+from gitmini.classes.Pack import Pack, CHUNKED
+from gitmini.classes.LockFile import LockFile
+from gitmini.utils import iter_chunks, iter_cdc_chunks, copy_file, reflink_file, read_config
+
+COMPRESSED_MAGIC = b"GMZ\0"
+SIZE = struct.Struct(">Q")
+HEADER_SIZE = len(COMPRESSED_MAGIC) + SIZE.size
+
+MANIFEST_MAGIC = b"GMC\0"
+MANIFEST_HEADER = struct.Struct(">4sQI")  # magic, blob size, chunk count
+MANIFEST_ENTRY = struct.Struct(">20sI")   # raw chunk sha, chunk size
+
+OBJECT_NAME_RE = re.compile(r"[0-9a-f]{40}\Z")
+
+# Abbreviated hashes: the shortest prefix accepted, and the length printed
+MIN_ABBREV = 4
+DEFAULT_ABBREV = 7
+_HEX_RE = re.compile(r"[0-9a-f]+\Z")
+
+# Object types, as stored in the type sidecar and in pack entries (0 = unknown)
+TYPE_CODES = {"blob": 1, "tree": 2, "commit": 3, "chunk": 4}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+# Sidecar code of a blob stored as a chunk manifest (packs mark these with
+# the CHUNKED entry kind instead), so is_chunked() is a lookup
+CHUNKED_BLOB = 5
+TYPE_NAMES[CHUNKED_BLOB] = "blob"
+TYPE_RECORD = struct.Struct(">20sB")  # raw sha, type code
+TYPES_FILENAME = os.path.join("info", "types")
+
+# What reading a damaged or missing object can raise
+OBJECT_ERRORS = (OSError, ValueError, KeyError, zlib.error, struct.error)
+
+# Parsed commits and trees are cached by weight: one per commit, and one per
+# entry for trees, so a few huge trees cannot crowd out everything else
+PARSED_CACHE_WEIGHT = 1000000
+
+_COMMIT_LINE_RE = re.compile(rb"tree [0-9a-f]{40}(?:\r?\n|\Z)")
+_TREE_LINE_RE = re.compile(rb"[0-9a-f]{40} [^\n]+(?:\n|\Z)")
+
+
+def compression_level(config):
+    """ Returns the zlib level set with 'gitmini config compression', or None if off. """
+    value = config.get("compression")
+    if value is True:
+        return zlib.Z_DEFAULT_COMPRESSION
+    if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+        return min(value, 9)
+    return None
+
+
+def chunk_threshold(config):
+    """ Returns the size set with 'gitmini config chunk_threshold' from which blobs are chunked, or None if off. """
+    value = config.get("chunk_threshold")
+    if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+        return value
+    return None
+
+
+class ObjectStore:
+    """
+    Reads and writes the objects in .gitmini/objects.
+
+    Objects are sharded by the first two hex digits of their hash
+    (objects/ab/cdef...), which keeps every directory small. Objects in the
+    older flat layout (objects/abcdef...) are still found; 'gitmini
+    migrate-objects' moves them into place. Objects consolidated by 'gitmini
+    repack' are read from the packs in objects/pack.
+
+    An object file holds either the object's raw content (the original
+    format) or, when compression is enabled, a compressed copy:
+        "GMZ\\0", uncompressed size (8 bytes, big-endian), zlib stream
+    Compression is opt-in with 'gitmini config compression <1-9|true>'.
+    Readers accept both formats, so objects written before compression was
+    turned on (or off) stay readable. Content that itself starts with this
+    magic (or the manifest magic below) is always stored compressed, which
+    keeps the formats apart.
+
+    Blobs of at least 'gitmini config chunk_threshold' bytes are split into
+    content-defined chunks (see iter_cdc_chunks), each stored as an object of
+    type "chunk", and the blob's file holds a manifest instead of its content:
+        "GMC\\0", blob size (8 bytes), chunk count (4 bytes),
+        then a raw sha and a size (4 bytes) per chunk
+    The blob keeps the hash of its full content. Chunks shared by two
+    versions of a file are stored once, so a small edit to a large file only
+    adds the chunks around it.
+
+    Object files carry no type, so the type (blob, tree or commit) of every
+    object written here is recorded in objects/info/types, an append-only
+    list of (raw sha, type) records; packs store it in each entry. Objects
+    from before types were recorded are classified by their content once,
+    and the result is recorded too.
+    """
+
+    def __init__(self, repo):
+        self.objects_dir = repo.objects_dir
+        self.pack_dir = os.path.join(repo.objects_dir, "pack")
+        config = read_config(repo)
+        self.level = compression_level(config)
+        self.chunk_threshold = chunk_threshold(config)
+        self.types_path = os.path.join(repo.objects_dir, TYPES_FILENAME)
+        self._packs = None
+        self._flat = None  # sorted hashes of objects in the flat layout, listed on first use
+        self._shards = {}  # fan-out directory → sorted names of the objects in it, listed on first use
+        self._types = None  # raw sha → type code, loaded on first use
+        self._parsed = _LRUCache(PARSED_CACHE_WEIGHT)  # sha → CommitRecord | TreeRecord
+
+    def path(self, sha):
+        """ Returns the file a loose object is stored in (its fan-out path if there is none). """
+        return self.loose_path(sha) or self._sharded_path(sha)
+
+    def loose_path(self, sha):
+        """ Returns the file of a loose object, or None if it is packed or missing. """
+        sharded = self._sharded_path(sha)
+        if os.path.exists(sharded):
+            return sharded
+        flat = os.path.join(self.objects_dir, sha)
+        if os.path.isfile(flat):
+            return flat
+        return None
+
+    def exists(self, sha):
+        return self.loose_path(sha) is not None or self._find_pack(sha) is not None
+
+    def find_prefix(self, prefix, limit=None):
+        """
+        Returns the hashes of objects starting with the hex 'prefix' (at least
+        two digits), sorted, at most 'limit' of them. Pack indexes are binary
+        searched; loose objects need only the fan-out directory named by the
+        prefix's first two digits (plus the top directory for the flat layout).
+        Both listings are kept sorted for the lifetime of the store, so
+        repeated lookups, as when abbreviating many hashes, are binary searched.
+        """
+        matches = set()
+        for pack in self.packs:
+            matches.update(pack.find_prefix(prefix, limit))
+        names = self._shard(prefix[:2])
+        rest = prefix[2:]
+        i = bisect.bisect_left(names, rest)
+        while i < len(names) and names[i].startswith(rest):
+            matches.add(prefix[:2] + names[i])
+            i += 1
+        if self._flat is None:
+            # New objects are never written flat, so this listing stays valid
+            with os.scandir(self.objects_dir) as it:
+                self._flat = sorted(e.name for e in it if OBJECT_NAME_RE.match(e.name) and e.is_file())
+        i = bisect.bisect_left(self._flat, prefix)
+        while i < len(self._flat) and self._flat[i].startswith(prefix):
+            matches.add(self._flat[i])
+            i += 1
+        return sorted(matches)[:limit]
+
+    def resolve(self, name, obj_type=None):
+        """
+        Expands a full or abbreviated (at least MIN_ABBREV digits) hash to the
+        object it names; with obj_type, only objects of that type count.
+        Returns None if nothing matches and raises ValueError if the prefix
+        names more than one object.
+        """
+        name = name.lower()
+        if not MIN_ABBREV <= len(name) <= 40 or not _HEX_RE.match(name):
+            return None
+        if len(name) == 40:
+            candidates = [name] if self.exists(name) else []
+        else:
+            candidates = self.find_prefix(name)
+        if obj_type is not None:
+            candidates = [sha for sha in candidates if self.type(sha) == obj_type]
+        if len(candidates) > 1:
+            listed = ", ".join(f"{sha[:len(name) + 4]} ({self.type(sha)})" for sha in candidates[:10])
+            raise ValueError(f"short hash '{name}' is ambiguous; candidates are {listed}")
+        return candidates[0] if candidates else None
+
+    def abbreviate(self, sha, length=DEFAULT_ABBREV):
+        """ Returns the shortest prefix of 'sha', at least 'length' digits long, that names only it. """
+        while length < len(sha) and len(self.find_prefix(sha[:length], limit=2)) > 1:
+            length += 1
+        return sha[:length]
+
+    def is_compressed(self, sha):
+        """ True if the object is a compressed loose object (packed objects are always compressed). """
+        path = self.loose_path(sha)
+        if path is None:
+            return self._find_pack(sha) is not None
+        return _read_head(path) == COMPRESSED_MAGIC
+
+    def size(self, sha):
+        """ Returns the uncompressed size of an object. """
+        path = self.loose_path(sha)
+        if path is None:
+            return self._packed(sha).size(sha)
+        with open(path, "rb") as f:
+            header = f.read(MANIFEST_HEADER.size)
+        if header.startswith(COMPRESSED_MAGIC) and len(header) >= HEADER_SIZE:
+            return SIZE.unpack_from(header, len(COMPRESSED_MAGIC))[0]
+        if header.startswith(MANIFEST_MAGIC) and len(header) == MANIFEST_HEADER.size:
+            return MANIFEST_HEADER.unpack(header)[1]
+        return os.path.getsize(path)
+
+    def read(self, sha):
+        """ Returns an object's (uncompressed) content. """
+        path = self.loose_path(sha)
+        if path is None:
+            pack = self._packed(sha)
+            data = pack.read(sha)
+            if pack.kind(sha) == CHUNKED:
+                return self._join_chunks(data)
+            return data
+        with open(path, "rb") as f:
+            data = f.read()
+        if data.startswith(COMPRESSED_MAGIC):
+            return zlib.decompress(data[HEADER_SIZE:])
+        if data.startswith(MANIFEST_MAGIC):
+            return self._join_chunks(data)
+        return data
+
+    def open(self, sha):
+        """ Returns a binary file object that streams an object's content. """
+        path = self.loose_path(sha)
+        if path is None:
+            pack = self._packed(sha)
+            data = pack.read(sha)
+            if pack.kind(sha) == CHUNKED:
+                return io.BufferedReader(_ChunkedReader(self, parse_manifest(data)))
+            return io.BytesIO(data)
+        f = open(path, "rb")
+        head = f.read(len(COMPRESSED_MAGIC))
+        if head == COMPRESSED_MAGIC:
+            f.seek(HEADER_SIZE)
+            return io.BufferedReader(_DecompressingReader(f))
+        if head == MANIFEST_MAGIC:
+            with f:
+                manifest = head + f.read()
+            return io.BufferedReader(_ChunkedReader(self, parse_manifest(manifest)))
+        f.seek(0)
+        return f
+
+    def manifest(self, sha):
+        """ Returns the manifest of a chunked blob, or None if the object is stored whole. """
+        path = self.loose_path(sha)
+        if path is None:
+            pack = self._packed(sha)
+            return pack.read(sha) if pack.kind(sha) == CHUNKED else None
+        if _read_head(path) != MANIFEST_MAGIC:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def read_commit(self, sha):
+        """ Returns a commit as a CommitRecord, parsing it at most once while cached. """
+        record = self._parsed.get(sha)
+        if record is None:
+            record = CommitRecord.parse(sha, self.read(sha))
+            self._parsed.put(sha, record, 1)
+        return record
+
+    def read_tree(self, sha):
+        """
+        Returns a tree as a TreeRecord, parsing it at most once while cached.
+        Records are shared between callers, so they must not be modified.
+        """
+        record = self._parsed.get(sha)
+        if record is None:
+            record = TreeRecord.parse(sha, self.read(sha))
+            self._parsed.put(sha, record, 1 + len(record.entries))
+        return record
+
+    def flatten_tree(self, sha):
+        """ Returns path → blob sha for every file below a tree, descending into subtrees. """
+        entries = {}
+        stack = [(sha, "")]
+        while stack:
+            tree_hash, prefix = stack.pop()
+            for name, entry_sha in self.read_tree(tree_hash).entries.items():
+                if name.endswith("/"):
+                    stack.append((entry_sha, prefix + name))
+                else:
+                    entries[prefix + name] = entry_sha
+        return entries
+
+    def diff_trees(self, old_sha, new_sha):
+        """
+        Compares two trees (either may be None for an empty tree) and returns
+        (old, new): path → blob sha maps holding only the paths whose blob
+        differs, was removed (old only) or was added (new only). Subtrees
+        with the same hash on both sides are skipped without being read.
+        """
+        old, new = {}, {}
+        stack = [(old_sha, new_sha, "")]
+        while stack:
+            old_tree, new_tree, prefix = stack.pop()
+            if old_tree == new_tree:
+                continue
+            old_entries = self.read_tree(old_tree).entries if old_tree else {}
+            new_entries = self.read_tree(new_tree).entries if new_tree else {}
+            for name in set(old_entries) | set(new_entries):
+                old_entry, new_entry = old_entries.get(name), new_entries.get(name)
+                if old_entry == new_entry:
+                    continue
+                if name.endswith("/"):
+                    stack.append((old_entry, new_entry, prefix + name))
+                    continue
+                if old_entry:
+                    old[prefix + name] = old_entry
+                if new_entry:
+                    new[prefix + name] = new_entry
+        # Flat trees name files by full path rather than by subtree, so the
+        # same unchanged file can show up on both sides
+        for path in [p for p, sha in old.items() if new.get(p) == sha]:
+            del old[path], new[path]
+        return old, new
+
+    def write_tree(self, entries):
+        """
+        Writes the trees for a path → blob sha map, one per directory, and
+        returns the root tree's hash. Directories whose content did not
+        change hash to a tree that already exists, so only the trees along
+        changed paths are written.
+        """
+        root = {}
+        for path, sha in entries.items():
+            node = root
+            *dirs, name = path.split("/")
+            for d in dirs:
+                node = node.setdefault(d + "/", {})
+            node[name] = sha
+        return self._write_tree_node(root)
+
+    def chunks(self, sha):
+        """ Returns the (chunk sha, size) list of a chunked blob, or None. """
+        manifest = self.manifest(sha)
+        return parse_manifest(manifest) if manifest is not None else None
+
+    def is_chunked(self, sha):
+        """ True if the object is a chunked blob, without opening it when its type is recorded or packed. """
+        self._load_types()
+        code = self._types.get(bytes.fromhex(sha)) if OBJECT_NAME_RE.match(sha) else None
+        if code is not None:
+            return code == CHUNKED_BLOB
+        if self.loose_path(sha) is None:
+            pack = self._find_pack(sha)
+            return pack is not None and pack.kind(sha) == CHUNKED
+        return self.type(sha) == "blob" and self.manifest(sha) is not None
+
+    def restore(self, sha, dst_path, link=None):
+        """
+        Writes an object's content to dst_path. With link="reflink" or
+        "hardlink", a raw loose object is cloned or hard-linked into place
+        instead of copied when the file system supports it. Everything else is
+        copied.
+
+        Hard-linked files share the object's inode: they must never be edited
+        in place, only replaced, or the stored object changes with them. They
+        are made read-only, but that does not stop root, so as root hardlink
+        falls back to reflink.
+        """
+        # dst_path may itself be a link into the store from an earlier
+        # checkout, so it is replaced rather than written through
+        if os.path.lexists(dst_path):
+            os.remove(dst_path)
+        if link == "hardlink" and running_as_root():
+            link = "reflink"
+        path = self.loose_path(sha)
+        if path is not None and _read_head(path) not in (COMPRESSED_MAGIC, MANIFEST_MAGIC):
+            if link == "reflink" and reflink_file(path, dst_path):
+                return
+            if link == "hardlink" and _hardlink(path, dst_path):
+                return
+            copy_file(path, dst_path)
+            return
+        with self.open(sha) as src, open(dst_path, "wb") as dst:
+            for chunk in iter_chunks(src):
+                dst.write(chunk)
+
+    @property
+    def packs(self):
+        if self._packs is None:
+            self._packs = []
+            if os.path.isdir(self.pack_dir):
+                for name in sorted(os.listdir(self.pack_dir)):
+                    if name.startswith("pack-") and name.endswith(".idx"):
+                        self._packs.append(Pack(os.path.join(self.pack_dir, name)))
+        return self._packs
+
+    def reload_packs(self):
+        """ Forgets the known packs, so packs written since are picked up. """
+        for pack in self._packs or []:
+            pack.close()
+        self._packs = None
+
+    def loose_objects(self):
+        """ Yields the hash of every loose object, in either layout. """
+        with os.scandir(self.objects_dir) as it:
+            entries = list(it)
+        for entry in entries:
+            if entry.is_file() and OBJECT_NAME_RE.match(entry.name):
+                yield entry.name
+            elif entry.is_dir() and len(entry.name) == 2:
+                with os.scandir(entry.path) as shard:
+                    for obj in shard:
+                        if OBJECT_NAME_RE.match(entry.name + obj.name):
+                            yield entry.name + obj.name
+
+    def remove_loose(self, sha):
+        path = self.loose_path(sha)
+        if path is not None:
+            os.remove(path)
+            names = self._shards.get(sha[:2])
+            if names is not None and path == self._sharded_path(sha):
+                i = bisect.bisect_left(names, sha[2:])
+                if i < len(names) and names[i] == sha[2:]:
+                    del names[i]
+
+    def write(self, data, obj_type=None):
+        """ Stores a bytes object and returns its SHA-1. """
+        return self._store(io.BytesIO(data), obj_type)
+
+    def store_file(self, path, obj_type="blob"):
+        """
+        Streams a file into the store, hashing it on the way, and returns its
+        SHA-1. The object is written to a temp file first and renamed into
+        place, so a half-written object is never visible.
+        """
+        with open(path, "rb") as src:
+            if obj_type == "blob" and self.chunk_threshold and os.fstat(src.fileno()).st_size >= self.chunk_threshold:
+                return self._store_chunked(src)
+            return self._store(src, obj_type)
+
+    def normalize(self, sha, obj_type=None):
+        """
+        Moves an object written by the gitmini_core classes (Tree, Commit),
+        which always write raw objects to the flat layout, to its fan-out path
+        and re-encodes it in this store's format.
+        """
+        flat = os.path.join(self.objects_dir, sha)
+        if not os.path.isfile(flat):
+            return
+        if self.level is None or self.is_compressed(sha):
+            self._install(flat, sha)
+        else:
+            with open(flat, "rb") as src:
+                self._store(src, replace=True)
+            os.remove(flat)
+        if obj_type:
+            self.record_type(sha, obj_type)
+
+    def type(self, sha):
+        """
+        Returns "blob", "tree" or "commit" without reading the object when its
+        type is recorded. Untyped objects are classified by content (see
+        sniff_type) and the result is recorded for next time.
+        """
+        self._load_types()
+        recordable = OBJECT_NAME_RE.match(sha) is not None
+        code = self._types.get(bytes.fromhex(sha)) if recordable else None
+        if code is None:
+            pack = self._find_pack(sha) if self.loose_path(sha) is None else None
+            code = pack.type_code(sha) if pack is not None else 0
+        if code:
+            return TYPE_NAMES[code]
+        with self.open(sha) as f:
+            obj_type = sniff_type(f.readline(4096))
+        if recordable:
+            if obj_type == "blob" and self.manifest(sha) is not None:
+                self._record(sha, CHUNKED_BLOB)
+            else:
+                self.record_type(sha, obj_type)
+        return obj_type
+
+    def record_type(self, sha, obj_type):
+        self._record(sha, TYPE_CODES[obj_type])
+
+    def _record(self, sha, code):
+        raw = bytes.fromhex(sha)
+        if self._types is not None:
+            if self._types.get(raw) == code:
+                return
+            self._types[raw] = code
+        # Each record is one small O_APPEND write, so concurrent writers
+        # (e.g. parallel add workers) never interleave partial records
+        try:
+            fd = os.open(self.types_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(self.types_path), exist_ok=True)
+            fd = os.open(self.types_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, TYPE_RECORD.pack(raw, code))
+        finally:
+            os.close(fd)
+
+    def forget_types(self, shas):
+        """ Drops the sidecar records of objects that are now typed by a pack. """
+        self._load_types()
+        for sha in shas:
+            self._types.pop(bytes.fromhex(sha), None)
+        data = b"".join(TYPE_RECORD.pack(raw, code) for raw, code in self._types.items())
+        os.makedirs(os.path.dirname(self.types_path), exist_ok=True)
+        with LockFile(self.types_path) as lock:
+            lock.write(data)
+            lock.commit()
+
+    def migrate(self):
+        """ Moves every object of the flat layout to its fan-out path; returns how many moved. """
+        with os.scandir(self.objects_dir) as it:
+            flat = [e.name for e in it if e.is_file() and OBJECT_NAME_RE.match(e.name)]
+        for sha in flat:
+            self._install(os.path.join(self.objects_dir, sha), sha)
+        self._flat = []
+        return len(flat)
+
+    def _store(self, src, obj_type=None, replace=False):
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, prefix="tmp_obj_")
+        try:
+            with os.fdopen(fd, "wb") as dst:
+                sha1 = self._encode(src, dst)
+            if self.exists(sha1) and not replace:
+                os.remove(tmp_path)
+            else:
+                self._install(tmp_path, sha1, replace=True)
+                if obj_type:
+                    self.record_type(sha1, obj_type)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return sha1
+
+    def _store_chunked(self, src):
+        # Stores each chunk not already present, then the blob's manifest
+        h = hashlib.sha1()
+        entries = []
+        size = 0
+        for chunk in iter_cdc_chunks(src):
+            h.update(chunk)
+            size += len(chunk)
+            chunk_sha = hashlib.sha1(chunk).hexdigest()
+            if not self.exists(chunk_sha):
+                self._store(io.BytesIO(chunk), "chunk")
+            entries.append(MANIFEST_ENTRY.pack(bytes.fromhex(chunk_sha), len(chunk)))
+        sha1 = h.hexdigest()
+        if self.exists(sha1):
+            return sha1
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, prefix="tmp_obj_")
+        try:
+            with os.fdopen(fd, "wb") as dst:
+                dst.write(MANIFEST_HEADER.pack(MANIFEST_MAGIC, size, len(entries)))
+                dst.write(b"".join(entries))
+            self._install(tmp_path, sha1)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._record(sha1, CHUNKED_BLOB)
+        return sha1
+
+    def _write_tree_node(self, node):
+        lines = []
+        for name in sorted(node):
+            value = node[name]
+            sha = self._write_tree_node(value) if isinstance(value, dict) else value
+            lines.append(f"{sha} {name}\n")
+        data = "".join(lines).encode("utf-8", "surrogateescape")
+        sha1 = hashlib.sha1(data).hexdigest()
+        if not self.exists(sha1):
+            self.write(data, "tree")
+        return sha1
+
+    def _join_chunks(self, manifest):
+        return b"".join(self.read(chunk_sha) for chunk_sha, _ in parse_manifest(manifest))
+
+    def _load_types(self):
+        if self._types is not None:
+            return
+        self._types = {}
+        try:
+            with open(self.types_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # A torn final record (e.g. from a crash) is ignored
+        usable = len(data) - len(data) % TYPE_RECORD.size
+        for raw, code in TYPE_RECORD.iter_unpack(data[:usable]):
+            if code in TYPE_NAMES:
+                self._types[raw] = code
+
+    def _find_pack(self, sha):
+        for pack in self.packs:
+            if sha in pack:
+                return pack
+        return None
+
+    def _packed(self, sha):
+        pack = self._find_pack(sha)
+        if pack is None:
+            raise FileNotFoundError(f"object {sha} not found")
+        return pack
+
+    def _sharded_path(self, sha):
+        return os.path.join(self.objects_dir, sha[:2], sha[2:])
+
+    def _shard(self, prefix):
+        # The sorted object names in fan-out directory 'prefix'; objects this
+        # store installs or removes later are added to or dropped from it
+        names = self._shards.get(prefix)
+        if names is None:
+            try:
+                with os.scandir(os.path.join(self.objects_dir, prefix)) as it:
+                    names = sorted(e.name for e in it if OBJECT_NAME_RE.match(prefix + e.name))
+            except (FileNotFoundError, NotADirectoryError):
+                names = []
+            self._shards[prefix] = names
+        return names
+
+    def _install(self, src_path, sha, replace=False):
+        # Renames a finished file to the object's fan-out path. An object that
+        # is already there has the same content, so it is kept unless replacing.
+        dst_path = self._sharded_path(sha)
+        if os.path.exists(dst_path) and not replace:
+            os.remove(src_path)
+            return
+        try:
+            os.replace(src_path, dst_path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            os.replace(src_path, dst_path)
+        names = self._shards.get(sha[:2])
+        if names is not None:
+            i = bisect.bisect_left(names, sha[2:])
+            if i == len(names) or names[i] != sha[2:]:
+                names.insert(i, sha[2:])
+
+    def _encode(self, src, dst):
+        # Copies src to dst in this store's format; returns the SHA-1 of src
+        head = src.read(len(COMPRESSED_MAGIC))
+        h = hashlib.sha1(head)
+        if self.level is None and head not in (COMPRESSED_MAGIC, MANIFEST_MAGIC):
+            dst.write(head)
+            for chunk in iter_chunks(src):
+                h.update(chunk)
+                dst.write(chunk)
+            return h.hexdigest()
+
+        level = zlib.Z_DEFAULT_COMPRESSION if self.level is None else self.level
+        compressor = zlib.compressobj(level)
+        dst.write(COMPRESSED_MAGIC + SIZE.pack(0))  # size is filled in below
+        size = len(head)
+        dst.write(compressor.compress(head))
+        for chunk in iter_chunks(src):
+            h.update(chunk)
+            size += len(chunk)
+            dst.write(compressor.compress(chunk))
+        dst.write(compressor.flush())
+        dst.seek(len(COMPRESSED_MAGIC))
+        dst.write(SIZE.pack(size))
+        return h.hexdigest()
+
+
+class CommitRecord:
+    """
+    A parsed commit object:
+        tree <sha>
+        parent <sha>      (none for a root commit)
+        timestamp <text>
+        <blank line>
+        <message>
+    """
+
+    __slots__ = ("sha", "tree", "parents", "timestamp", "message")
+
+    def __init__(self, sha, tree, parents, timestamp, message):
+        self.sha = sha
+        self.tree = tree
+        self.parents = parents
+        self.timestamp = timestamp
+        self.message = message
+
+    @property
+    def parent(self):
+        return self.parents[0] if self.parents else None
+
+    @classmethod
+    def parse(cls, sha, data):
+        tree = timestamp = None
+        parents = []
+        header, _, message = data.decode(errors="ignore").partition("\n\n")
+        for line in header.splitlines():
+            if line.startswith("tree "):
+                tree = line[len("tree "):].strip()
+            elif line.startswith("parent "):
+                parents.append(line[len("parent "):].strip())
+            elif line.startswith("timestamp "):
+                timestamp = line[len("timestamp "):]
+        return cls(sha, tree, parents, timestamp, message.strip())
+
+
+class TreeRecord:
+    """
+    A parsed tree object: one "<sha> <name>" line per entry, as name → sha
+    in file order. Trees written by write_tree() hold one directory each;
+    subtree names end with "/". Older trees list every path of the commit
+    in a single flat tree, and are read the same way.
+    """
+
+    __slots__ = ("sha", "entries")
+
+    def __init__(self, sha, entries):
+        self.sha = sha
+        self.entries = entries
+
+    @classmethod
+    def parse(cls, sha, data):
+        entries = {}
+        for line in data.decode("utf-8", "surrogateescape").split("\n"):
+            if line:
+                entry_sha, path = line.split(" ", 1)
+                entries[path] = entry_sha
+        return cls(sha, entries)
+
+
+class _LRUCache:
+    """ A mapping that drops its least recently used items once their total weight exceeds max_weight. """
+
+    def __init__(self, max_weight):
+        self.max_weight = max_weight
+        self.weight = 0
+        self._items = OrderedDict()  # key → (value, weight)
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        self._items.move_to_end(key)
+        return item[0]
+
+    def put(self, key, value, weight):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.weight -= old[1]
+        self._items[key] = (value, weight)
+        self.weight += weight
+        while self.weight > self.max_weight and len(self._items) > 1:
+            _, (_, dropped) = self._items.popitem(last=False)
+            self.weight -= dropped
+
+
+class _DecompressingReader(io.RawIOBase):
+    """ Streams the zlib body of a compressed object without inflating it all at once. """
+
+    def __init__(self, f):
+        self._f = f
+        self._zlib = zlib.decompressobj()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while True:
+            data = self._zlib.unconsumed_tail
+            if not data:
+                if self._zlib.eof:
+                    return 0
+                data = self._f.read(len(b))
+                if not data:
+                    raise zlib.error("compressed object is truncated")
+            out = self._zlib.decompress(data, len(b))
+            if out:
+                b[:len(out)] = out
+                return len(out)
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+class _ChunkedReader(io.RawIOBase):
+    """ Streams a chunked blob by reading its chunks one after another. """
+
+    def __init__(self, store, chunks):
+        self._store = store
+        self._pending = [chunk_sha for chunk_sha, _ in reversed(chunks)]
+        self._current = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while True:
+            if self._current is None:
+                if not self._pending:
+                    return 0
+                self._current = self._store.open(self._pending.pop())
+            n = self._current.readinto(b)
+            if n:
+                return n
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        super().close()
+
+
+def parse_manifest(data):
+    """ Returns the (chunk sha, size) list of a chunked blob's manifest. """
+    magic, _size, count = MANIFEST_HEADER.unpack_from(data, 0)
+    if magic != MANIFEST_MAGIC or len(data) != MANIFEST_HEADER.size + count * MANIFEST_ENTRY.size:
+        raise ValueError("corrupt chunk manifest")
+    return [(raw.hex(), size) for raw, size in MANIFEST_ENTRY.iter_unpack(data[MANIFEST_HEADER.size:])]
+
+
+def running_as_root():
+    """ True for root, which write-protection does not stop (always False without POSIX uids). """
+    return hasattr(os, "geteuid") and os.geteuid() == 0
+
+
+def _hardlink(src_path, dst_path):
+    # Returns False if the file system cannot link the two paths
+    try:
+        if os.stat(src_path).st_mode & 0o222:
+            os.chmod(src_path, 0o444)
+        os.link(src_path, dst_path)
+    except OSError as e:
+        if e.errno in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP):
+            return False
+        raise
+    return True
+
+
+def _read_head(path):
+    with open(path, "rb") as f:
+        return f.read(len(COMPRESSED_MAGIC))
+
+
+def sniff_type(first_line):
+    """
+    Guesses the type of an untyped object from its first line: commits start
+    with "tree <sha>", tree entries are "<sha> <path>", anything else is a blob.
+    """
+    if _COMMIT_LINE_RE.match(first_line):
+        return "commit"
+    if _TREE_LINE_RE.match(first_line):
+        return "tree"
+    return "blob"
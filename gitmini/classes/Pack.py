@@ -0,0 +1,390 @@
+import os
+import re
+import mmap
+import zlib
+import struct
+import hashlib
+import tempfile
+
+PACK_MAGIC = b"GMPK"
+IDX_MAGIC = b"GMPI"
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct(">4sII")  # magic, version, object count
+IDX_HEADER = struct.Struct(">4sI")    # magic, version
+FANOUT = struct.Struct(">256I")
+OFFSET = struct.Struct(">Q")
+SHA_SIZE = 20
+
+# Entry kinds, in the low 4 bits of an entry's first byte. The high 4 bits
+# hold the object's type code (0 if unknown).
+FULL = 0
+DELTA = 1
+CHUNKED = 2  # a chunked blob: the entry holds its manifest, its chunks are separate objects
+
+# Delta opcodes
+INSERT = 0
+COPY = 1
+
+# Only runs at least this long start a copy; shorter ones are cheaper inserted
+MIN_COPY = 16
+
+# Delta chunks end after a newline, or after 4 KiB without one. Boundaries
+# depend on content, so an insertion only shifts the chunk it lands in.
+_CHUNK_RE = re.compile(b"[^\n]{0,4095}\n|[^\n]{1,4096}")
+
+
+class Pack:
+    """
+    A packfile and its index, both memory-mapped.
+
+    pack-<checksum>.pack:
+        header   "GMPK", version, object count
+        entries  type and kind (full, delta or chunked), object size,
+                 compressed length, base sha (deltas only), zlib-compressed
+                 data, delta or chunk manifest
+        trailer  SHA-1 of everything above
+    pack-<checksum>.idx:
+        header   "GMPI", version
+        fanout   256 cumulative counts of objects by first sha byte
+        shas     sorted raw 20-byte shas
+        offsets  entry offset in the pack, in the same order
+        trailer  pack checksum, then SHA-1 of the index
+
+    Looking up a hash narrows the range with the fanout table, then binary
+    searches the sorted hashes: O(log n) without reading the whole index.
+    Deltas refer to their base by hash, and bases always live in the same pack.
+    """
+
+    def __init__(self, idx_path):
+        self.idx_path = idx_path
+        self.pack_path = idx_path[:-len(".idx")] + ".pack"
+        with open(idx_path, "rb") as f:
+            self._idx = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = IDX_HEADER.unpack_from(self._idx, 0)
+        if magic != IDX_MAGIC or version != PACK_VERSION:
+            raise ValueError(f"{idx_path} is not a supported pack index")
+        self._fanout = FANOUT.unpack_from(self._idx, IDX_HEADER.size)
+        self.count = self._fanout[255]
+        self._shas_at = IDX_HEADER.size + FANOUT.size
+        self._offsets_at = self._shas_at + self.count * SHA_SIZE
+        with open(self.pack_path, "rb") as f:
+            self._pack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __contains__(self, sha):
+        return self.find(sha) is not None
+
+    def find(self, sha):
+        """ Returns the offset of an object in the pack, or None. """
+        try:
+            key = bytes.fromhex(sha)
+        except ValueError:
+            return None
+        if len(key) != SHA_SIZE:
+            return None
+        i = self._lower_bound(key)
+        if i < self.count and self._sha_at(i) == key:
+            return OFFSET.unpack_from(self._idx, self._offsets_at + i * OFFSET.size)[0]
+        return None
+
+    def find_prefix(self, prefix, limit=None):
+        """
+        Returns the hashes in the pack that start with the hex 'prefix' (at
+        least two digits), sorted, at most 'limit' of them. A binary search
+        finds the first, the rest follow it in the index.
+        """
+        i = self._lower_bound(bytes.fromhex(prefix + "0" * (len(prefix) % 2)))
+        matches = []
+        while i < self.count and (limit is None or len(matches) < limit):
+            sha = self._sha_at(i).hex()
+            if not sha.startswith(prefix):
+                break
+            matches.append(sha)
+            i += 1
+        return matches
+
+    def shas(self):
+        """ Yields every object hash in the pack, in sorted order. """
+        for i in range(self.count):
+            yield self._sha_at(i).hex()
+
+    def size(self, sha):
+        return self._entry_header(self._offset(sha))[1]
+
+    def type_code(self, sha):
+        return self._pack[self._offset(sha)] >> 4
+
+    def kind(self, sha):
+        return self._pack[self._offset(sha)] & 0x0F
+
+    def read(self, sha):
+        """ Returns an object's content, applying its chain of deltas (a chunked blob's manifest). """
+        deltas = []
+        kind, _size, base, data = self._entry(self._offset(sha))
+        while kind == DELTA:
+            deltas.append(data)
+            kind, _size, base, data = self._entry(self._offset(base))
+        for delta in reversed(deltas):
+            data = apply_delta(data, delta)
+        return data
+
+    def verify(self):
+        """ Checks the checksums of the pack and its index; returns a problem description or None. """
+        idx_end = len(self._idx) - SHA_SIZE
+        if _sha1_of(self._idx, idx_end) != self._idx[idx_end:]:
+            return f"{os.path.basename(self.idx_path)}: index checksum mismatch"
+        pack_end = len(self._pack) - SHA_SIZE
+        digest = self._pack[pack_end:]
+        if _sha1_of(self._pack, pack_end) != digest:
+            return f"{os.path.basename(self.pack_path)}: pack checksum mismatch"
+        if self._idx[idx_end - SHA_SIZE:idx_end] != digest:
+            return f"{os.path.basename(self.idx_path)}: index does not belong to its pack"
+        return None
+
+    def close(self):
+        self._idx.close()
+        self._pack.close()
+
+    def _sha_at(self, i):
+        at = self._shas_at + i * SHA_SIZE
+        return self._idx[at:at + SHA_SIZE]
+
+    def _lower_bound(self, key):
+        # Position of the first sha >= key: the fanout table narrows the
+        # range to shas sharing key's first byte, a binary search does the rest
+        lo = self._fanout[key[0] - 1] if key[0] else 0
+        hi = self._fanout[key[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._sha_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _offset(self, sha):
+        offset = self.find(sha)
+        if offset is None:
+            raise KeyError(f"object {sha} not in {os.path.basename(self.pack_path)}")
+        return offset
+
+    def _entry_header(self, offset):
+        kind = self._pack[offset] & 0x0F
+        size, pos = read_varint(self._pack, offset + 1)
+        length, pos = read_varint(self._pack, pos)
+        base = None
+        if kind == DELTA:
+            base = self._pack[pos:pos + SHA_SIZE].hex()
+            pos += SHA_SIZE
+        return kind, size, base, pos, length
+
+    def _entry(self, offset):
+        kind, size, base, pos, length = self._entry_header(offset)
+        return kind, size, base, zlib.decompress(self._pack[pos:pos + length])
+
+
+class PackWriter:
+    """
+    Streams objects into a new pack. Nothing is visible to readers until
+    finish() renames the pack and then its index into place.
+    """
+
+    def __init__(self, pack_dir, level=zlib.Z_DEFAULT_COMPRESSION):
+        self.pack_dir = pack_dir
+        self.level = level
+        os.makedirs(pack_dir, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=pack_dir, prefix="tmp_pack_")
+        self._f = os.fdopen(fd, "w+b")
+        self._offsets = {}  # sha → offset
+        self._pos = 0
+        self._write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0))  # count is set in finish()
+
+    def add(self, sha, size, data, base=None, type_code=0, chunked=False):
+        """
+        Adds an object: its full content, a delta against 'base' (which must
+        be in this pack), or with chunked=True the manifest of a chunked blob.
+        """
+        if sha in self._offsets:
+            return
+        payload = zlib.compress(data, self.level)
+        if chunked:
+            kind = CHUNKED
+        else:
+            kind = FULL if base is None else DELTA
+        header = bytes([type_code << 4 | kind]) + encode_varint(size) + encode_varint(len(payload))
+        if base is not None:
+            header += bytes.fromhex(base)
+        self._offsets[sha] = self._pos
+        self._write(header)
+        self._write(payload)
+
+    def finish(self):
+        """ Writes the trailer and the index; returns the path of the new index. """
+        # Patch the object count into the header, then checksum the whole file
+        self._f.seek(0)
+        self._f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(self._offsets)))
+        self._f.seek(0)
+        checksum = hashlib.sha1()
+        for chunk in iter(lambda: self._f.read(1024 * 1024), b""):
+            checksum.update(chunk)
+        digest = checksum.digest()
+        self._f.write(digest)
+        self._f.close()
+
+        name = "pack-" + digest.hex()
+        pack_path = os.path.join(self.pack_dir, name + ".pack")
+        idx_path = os.path.join(self.pack_dir, name + ".idx")
+        os.replace(self._tmp_path, pack_path)
+
+        shas = sorted(bytes.fromhex(sha) for sha in self._offsets)
+        counts = [0] * 256
+        for key in shas:
+            counts[key[0]] += 1
+        fanout = []
+        total = 0
+        for c in counts:
+            total += c
+            fanout.append(total)
+        idx = bytearray(IDX_HEADER.pack(IDX_MAGIC, PACK_VERSION))
+        idx += FANOUT.pack(*fanout)
+        for key in shas:
+            idx += key
+        for key in shas:
+            idx += OFFSET.pack(self._offsets[key.hex()])
+        idx += digest
+        idx += hashlib.sha1(idx).digest()
+
+        tmp_idx = idx_path + ".tmp"
+        with open(tmp_idx, "wb") as f:
+            f.write(idx)
+        os.replace(tmp_idx, idx_path)
+        return idx_path
+
+    def abort(self):
+        self._f.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def _write(self, data):
+        self._f.write(data)
+        self._pos += len(data)
+
+
+def delta_index(base):
+    """ Maps each content-defined chunk of 'base' to its first offset; reusable across targets. """
+    index = {}
+    for m in _CHUNK_RE.finditer(base):
+        chunk = m.group()
+        if len(chunk) >= MIN_COPY:
+            index.setdefault(chunk, m.start())
+    return index
+
+
+def create_delta(base, target, index=None):
+    """
+    Encodes 'target' as instructions that rebuild it from 'base':
+        base size, target size (varints), then a list of
+        COPY offset length   — copy a range of base
+        INSERT length data   — insert literal bytes
+    Runs are found by matching content-defined chunks of target against
+    the chunks of base, then extended for as long as they keep matching.
+    """
+    if index is None:
+        index = delta_index(base)
+
+    out = bytearray(encode_varint(len(base)) + encode_varint(len(target)))
+    literal_start = 0
+    copy_start = copy_end = None  # base range of the current copy
+    for m in _CHUNK_RE.finditer(target):
+        chunk = m.group()
+        if copy_start is not None:
+            if base[copy_end:copy_end + len(chunk)] == chunk:
+                copy_end += len(chunk)
+                continue
+            _emit_copy(out, copy_start, copy_end - copy_start)
+            copy_start = None
+            literal_start = m.start()
+
+        offset = index.get(chunk)
+        if offset is not None:
+            _emit_insert(out, target[literal_start:m.start()])
+            copy_start, copy_end = offset, offset + len(chunk)
+
+    if copy_start is not None:
+        _emit_copy(out, copy_start, copy_end - copy_start)
+    else:
+        _emit_insert(out, target[literal_start:])
+    return bytes(out)
+
+
+def apply_delta(base, delta):
+    """ Rebuilds the target of a delta made by create_delta(). """
+    base_size, pos = read_varint(delta, 0)
+    target_size, pos = read_varint(delta, pos)
+    if base_size != len(base):
+        raise ValueError("delta does not apply to this base")
+    out = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        length, pos = read_varint(delta, pos + 1)
+        if op == COPY:
+            offset = length
+            length, pos = read_varint(delta, pos)
+            out += base[offset:offset + length]
+        elif op == INSERT:
+            out += delta[pos:pos + length]
+            pos += length
+        else:
+            raise ValueError(f"bad delta opcode {op}")
+    if len(out) != target_size:
+        raise ValueError("delta produced the wrong size")
+    return bytes(out)
+
+
+def _emit_copy(out, offset, length):
+    out.append(COPY)
+    out += encode_varint(offset)
+    out += encode_varint(length)
+
+
+def _emit_insert(out, data):
+    if data:
+        out.append(INSERT)
+        out += encode_varint(len(data))
+        out += data
+
+
+def _sha1_of(buf, end):
+    # Hashes buf[:end] a piece at a time, so a large mapping is not copied at once
+    h = hashlib.sha1()
+    view = memoryview(buf)
+    try:
+        for start in range(0, end, 1024 * 1024):
+            h.update(view[start:min(start + 1024 * 1024, end)])
+    finally:
+        view.release()
+    return h.digest()
+
+
+def encode_varint(n):
+    # Little-endian base-128, 7 bits per byte, high bit set on all but the last
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def read_varint(buf, pos):
+    """ Decodes a varint at buf[pos]; returns (value, position after it). """
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
@@ -0,0 +1,69 @@
+import os
+from gitmini.classes.LockFile import LockFile
+
+# update() with no expected value overwrites whatever the ref holds
+ANY = object()
+
+
+class RefConflict(ValueError):
+    """ Raised when a ref no longer holds the value an update expected. """
+
+
+class Refs:
+    """
+    Updates HEAD and the refs under .gitmini/refs, in the same formats as
+    gitmini_core's HEAD ("ref: refs/heads/<branch>" or a commit hash).
+
+    Every update takes <ref>.lock, checks the ref's current value, and
+    renames the new value into place (see LockFile). So an update is a
+    compare-and-swap: two processes that both read a branch at X and try
+    to move it cannot both succeed. Readers never wait: they see the old
+    value or the new one.
+    """
+
+    def __init__(self, repo):
+        self.gitmini_dir = repo.gitmini_dir
+
+    def path(self, name):
+        return os.path.join(self.gitmini_dir, *name.split("/"))
+
+    def read(self, name):
+        """ Returns the value of a ref ("HEAD", "refs/heads/main"), or None if it is missing or empty. """
+        try:
+            with open(self.path(name), "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def update(self, name, value, expected=ANY):
+        """
+        Sets ref 'name' to 'value'. With 'expected', the ref must still hold
+        that value (None: the ref must not exist yet) or RefConflict is
+        raised and nothing changes.
+        """
+        with self.lock(name, expected) as lock:
+            lock.write(value)
+            lock.commit()
+
+    def lock(self, name, expected=ANY):
+        """
+        Takes the lock of ref 'name' and checks 'expected' like update(), but
+        leaves writing the new value and commit() to the caller, so other
+        files can be updated while the ref cannot move.
+        """
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock = LockFile(path).acquire()
+        if expected is not ANY:
+            current = self.read(name)
+            if current != expected:
+                lock.rollback()
+                raise RefConflict(f"{name} is at {current or 'nothing'}, expected {expected or 'nothing'}; "
+                                  f"it was updated by another process")
+        return lock
+
+    def update_head(self, commit, expected=ANY):
+        """ Moves the branch HEAD points to (HEAD itself when detached) to 'commit'. """
+        head = self.read("HEAD") or ""
+        name = head[len("ref: "):] if head.startswith("ref: ") else "HEAD"
+        self.update(name, commit, expected)
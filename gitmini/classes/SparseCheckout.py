@@ -0,0 +1,81 @@
+import os
+import re
+from gitmini.classes.IgnoreMatcher import compile_rule
+from gitmini.classes.LockFile import LockFile
+
+SPARSE_FILENAME = "sparse-checkout"
+
+
+class SparseCheckout:
+    """
+    The patterns in .gitmini/sparse-checkout, which limit the working tree
+    to part of the repository. Paths outside them stay in the index (so
+    commits keep the whole tree) but are not written to disk.
+
+    Patterns use the .gitmini-ignore syntax, one per line:
+        - blank lines and lines starting with '#' are skipped
+        - 'src/' or '/docs/api/' includes a directory and everything in it
+        - '!pattern' excludes paths that an earlier pattern included
+    The last pattern that matches a path, or its closest matched parent
+    directory, decides. Without the file (or with no patterns) every path
+    is included.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.path = os.path.join(repo.gitmini_dir, SPARSE_FILENAME)
+
+        lines = []
+        if os.path.isfile(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        self.patterns = [l.strip() for l in lines if l.strip() and not l.strip().startswith("#")]
+
+        self._rules = []  # (include, dir_only, regex)
+        for pattern in self.patterns:
+            include = not pattern.startswith("!")
+            rule = pattern if include else pattern[1:]
+            self._rules.append((include, rule.endswith("/"), re.compile(compile_rule(rule) + r"\Z")))
+        self._dirs = {"": None}  # directory → decision inherited by its contents
+
+    @property
+    def enabled(self):
+        return bool(self._rules)
+
+    def includes(self, rel_path):
+        """ True if the file at 'rel_path' belongs in the working tree. """
+        if not self._rules:
+            return True
+        rel_path = rel_path.replace(os.sep, "/")
+        decision = self._decide(rel_path, is_dir=False)
+        if decision is None:
+            decision = self._dir_decision(rel_path.rpartition("/")[0])
+        return bool(decision)
+
+    def write(self, patterns):
+        """ Replaces the patterns; an empty list disables sparse checkout. """
+        with LockFile(self.path) as lock:
+            if not patterns:
+                # Removed under the lock, so a concurrent write() is not undone
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            lock.write("".join(p + "\n" for p in patterns))
+            lock.commit()
+
+    def _dir_decision(self, rel_dir):
+        # Decisions are cached per directory, so each one is matched only once
+        if rel_dir in self._dirs:
+            return self._dirs[rel_dir]
+        decision = self._decide(rel_dir, is_dir=True)
+        if decision is None:
+            decision = self._dir_decision(rel_dir.rpartition("/")[0])
+        self._dirs[rel_dir] = decision
+        return decision
+
+    def _decide(self, rel_path, is_dir):
+        # The last matching pattern wins; None if none matches
+        for include, dir_only, regex in reversed(self._rules):
+            if (is_dir or not dir_only) and regex.match(rel_path):
+                return include
+        return None
@@ -1,3 +1,4 @@
+import sys
 import argparse
 
 from gitmini.commands.init import handle_init
@@ -10,6 +11,15 @@ from gitmini.commands.login import handle_login
 from gitmini.commands.remote.add import handle_remote_add
 from gitmini.commands.remote.branch import handle_remote_branch
 from gitmini.commands.push import handle_push
+from gitmini.commands.config import handle_config
+from gitmini.commands.fsmonitor import handle_fsmonitor
+from gitmini.commands.status import handle_status
+from gitmini.commands.migrate_objects import handle_migrate_objects
+from gitmini.commands.repack import handle_repack
+from gitmini.commands.fsck import handle_fsck
+from gitmini.commands.sparse_checkout import handle_sparse_checkout
+from gitmini.classes.LockFile import LockError
+from gitmini.classes.Refs import RefConflict
 
 def main():
 
@@ -28,6 +38,8 @@ def main():
     # add
     add_p = subparsers.add_parser('add', help='Add files to staging area')
     add_p.add_argument('targets', nargs='*', help='Files or dirs to add')
+    add_p.add_argument('-j', '--jobs', type=int, default=None,
+                       help='Number of parallel hashing workers (default: CPU count)')
     add_p.set_defaults(func=handle_add)
 
     # commit
@@ -35,19 +47,42 @@ def main():
     commit_p.add_argument('-m', '--message', help='Commit message', required=False)
     commit_p.set_defaults(func=handle_commit)
 
+    # status
+    status_p = subparsers.add_parser('status', help='Show staged, unstaged and untracked changes')
+    status_p.add_argument('--porcelain', action='store_true',
+                          help='Machine-readable "XY path" output')
+    status_p.set_defaults(func=handle_status)
+
     # log
     log_p = subparsers.add_parser('log', help='Show commit history')
+    log_p.add_argument('--oneline', action='store_true',
+                       help='Show each commit as its abbreviated hash and summary line')
     log_p.set_defaults(func=handle_log)
 
     # checkout
     co_p = subparsers.add_parser('checkout',
                                  help='Switch to branch or commit',
                                  description='Restore working tree to branch tip or specific commit')
-    co_p.add_argument('target', help='Branch name or commit hash')
+    co_p.add_argument('target', help='Branch name or commit hash (at least 4 digits of it)')
     co_p.add_argument('--force', action='store_true',
                       help='Discard uncommitted changes and force checkout')
+    co_p.add_argument('--link', choices=['copy', 'reflink', 'hardlink'], default='copy',
+                      help='Clone (reflink) or hard-link files from uncompressed objects instead of copying; '
+                           'hard-linked files are read-only and must never be edited in place. As root, '
+                           'hardlink falls back to reflink. Falls back to copying where unsupported')
+    co_p.add_argument('-j', '--jobs', type=int, default=None,
+                      help='Number of parallel file writers (default: CPU count)')
     co_p.set_defaults(func=handle_checkout)
 
+    # sparse-checkout
+    sparse_p = subparsers.add_parser('sparse-checkout',
+                                     help='Limit the working tree to paths matching patterns',
+                                     description='Manage the include/exclude patterns in .gitmini/sparse-checkout '
+                                                 '(.gitmini-ignore syntax, "!pattern" excludes)')
+    sparse_p.add_argument('action', choices=['list', 'set', 'add', 'disable'])
+    sparse_p.add_argument('patterns', nargs='*', help='Patterns for set and add, e.g. services/billing/')
+    sparse_p.set_defaults(func=handle_sparse_checkout)
+
     # branch
     br_p = subparsers.add_parser('branch',
                                  help='List or create branches',
@@ -79,5 +114,42 @@ def main():
     push_p.add_argument('branch', nargs='?', help='[<local-branch>:]<remote-branch> (if omitted, sends data from current local branch to remote branch equivelant.)')
     push_p.set_defaults(func=handle_push)
 
+    # config
+    config_p = subparsers.add_parser('config', help='Get or set a repository setting')
+    config_p.add_argument('key', help='Setting name, e.g. fsmonitor, compression or chunk_threshold')
+    config_p.add_argument('value', nargs='?', help='New value (omit to print the current one)')
+    config_p.set_defaults(func=handle_config)
+
+    # fsmonitor
+    fsm_p = subparsers.add_parser('fsmonitor',
+                                  help='Control the file-system monitor daemon (Linux)',
+                                  description='Run an inotify daemon that tells commands which files changed')
+    fsm_p.add_argument('action', choices=['start', 'stop', 'status', 'run'])
+    fsm_p.set_defaults(func=handle_fsmonitor)
+
+    # migrate-objects
+    migrate_p = subparsers.add_parser('migrate-objects',
+                                      help='Move objects from the flat layout into fan-out directories')
+    migrate_p.set_defaults(func=handle_migrate_objects)
+
+    # repack
+    repack_p = subparsers.add_parser('repack', help='Pack loose objects into a delta-compressed packfile')
+    repack_p.add_argument('--window', type=int, default=10,
+                          help='Number of preceding objects to try as delta bases (default: 10)')
+    repack_p.add_argument('--depth', type=int, default=50,
+                          help='Maximum delta chain length (default: 50)')
+    repack_p.set_defaults(func=handle_repack)
+
+    # fsck
+    fsck_p = subparsers.add_parser('fsck', help='Verify the integrity and connectivity of the object store')
+    fsck_p.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Number of parallel verification workers (default: CPU count)')
+    fsck_p.set_defaults(func=handle_fsck)
+
     args = parser.parse_args()
-    args.func(args)
+    try:
+        args.func(args)
+    except (LockError, RefConflict) as e:
+        # Another gitmini process is updating the same files
+        print(f"fatal: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -1,20 +1,37 @@
 import os
 import sys
+import stat
+from concurrent.futures import ProcessPoolExecutor
 from gitmini_core.utils import find_gitmini_root
 from gitmini_core.classes.Repo import Repo
-from gitmini_core.classes.Blob import Blob
-from gitmini_core.classes.Index import Index
-from gitmini_core.classes.Ignore import Ignore
+from gitmini.classes.Index import Index
+from gitmini.classes.IgnoreMatcher import IgnoreMatcher
+from gitmini.classes.DirCache import DirCache
+from gitmini.classes.FSMonitor import FSMonitor, in_scopes
+from gitmini.classes.ObjectStore import ObjectStore
+from gitmini.classes.SparseCheckout import SparseCheckout
+
+# Below this many files, starting worker processes costs more than it saves
+PARALLEL_THRESHOLD = 64
 
 def handle_add(args):
     """
     Stages newly added, changed, or deleted files.
     Just like git, can be used with <file>, <dir>, or "."
+    Paths outside the sparse-checkout patterns are left alone.
     """
     repo_root = find_gitmini_root()
     repo = Repo(repo_root)
-    ignore = Ignore(repo)
-    index = Index(repo)
+    ignore = IgnoreMatcher(repo)
+    dir_cache = DirCache(repo, ignore)
+    index = Index(repo, lock=True)
+    sparse = SparseCheckout(repo)
+
+    # With a running fsmonitor daemon, paths it saw no change in are trusted
+    # without stat() calls; otherwise everything is checked
+    monitor = FSMonitor(repo)
+    monitor.changed_paths()
+    dir_cache.monitor = monitor
 
     targets = args.targets
     if not targets:
@@ -23,6 +40,7 @@ def handle_add(args):
 
     # Add all changed files with 'gitmini add .'
     to_stage = []
+    scopes = []  # repo-relative targets that were fully re-checked
     for t in targets:
         abs_t = os.path.abspath(t if os.path.isabs(t) else os.path.join(os.getcwd(), t))
 
@@ -31,64 +49,118 @@ def handle_add(args):
             continue
 
         if os.path.isdir(abs_t):
-            for root, dirs, files in os.walk(abs_t):
-                if ".gitmini" in dirs:
-                    dirs.remove(".gitmini")
-                for fname in files:
-                    abs_file = os.path.join(root, fname)
-                    if not is_within_repo(repo_root, abs_file):
-                        continue
-                    rel = os.path.relpath(abs_file, repo_root)
-                    if rel.startswith(".gitmini" + os.sep) or rel == ".gitmini":
-                        continue
-                    if ignore.should_ignore(rel):
-                        continue
-                    to_stage.append(rel)
+            rel_t = os.path.relpath(abs_t, repo_root)
+            if rel_t.startswith(".gitmini" + os.sep) or rel_t == ".gitmini":
+                continue
+            if rel_t != "." and ignore.should_ignore(rel_t, is_dir=True):
+                continue
+            # Ignored directories are pruned; unchanged directories come from the cache
+            rel_t = "" if rel_t == "." else rel_t
+            to_stage.extend(p for p in dir_cache.walk(rel_t) if sparse.includes(p))
+            scopes.append(rel_t)
         elif os.path.isfile(abs_t):
             rel = os.path.relpath(abs_t, repo_root)
             if rel.startswith(".gitmini" + os.sep) or rel == ".gitmini":
                 continue
             if ignore.should_ignore(rel):
                 continue
+            if not sparse.includes(rel):
+                print(f"warning: '{t}' is outside the sparse-checkout patterns, not added", file=sys.stderr)
+                continue
             to_stage.append(rel)
+            scopes.append(rel)
         else:
             print(f"warning: pathspec '{t}' did not match any files", file=sys.stderr)
 
     changed = False
 
-    # Stage new or modified files
-    for rel_path in to_stage:
+    # Find new or modified files; unchanged stat data means unchanged content,
+    # so those files are skipped without being read
+    pending = []
+    for rel_path in dict.fromkeys(to_stage):
+        staged_sha = index.get(rel_path)
+        if staged_sha and not monitor.is_changed(rel_path) and index.is_known(rel_path, staged_sha):
+            continue
+
         abs_path = os.path.join(repo_root, rel_path)
-        if not os.path.isfile(abs_path):
+        try:
+            st = os.stat(abs_path)
+        except OSError:
+            continue
+        if not stat.S_ISREG(st.st_mode):
             continue
 
-        blob = Blob(repo, rel_path)
-        sha1 = blob.sha1
+        if staged_sha and index.is_fresh(rel_path, staged_sha, st):
+            continue
+        pending.append((rel_path, staged_sha, st))
+
+    # Hash and store blobs across the worker pool, then stage them in walk order
+    jobs = getattr(args, "jobs", None) or os.cpu_count() or 1
+    paths = [rel_path for rel_path, _, _ in pending]
+    hashes = hash_and_store_files(repo_root, ObjectStore(repo), paths, jobs)
+
+    for (rel_path, staged_sha, st), sha1 in zip(pending, hashes):
+        index.update_stat(rel_path, sha1, st)
 
-        if index.entries.get(rel_path) == sha1:
+        if staged_sha == sha1:
             continue
 
-        blob.write()
         index.add(rel_path, sha1)
         print(f"added: {rel_path}")  # prints staged files
         changed = True
 
-    # Detect deletions (files in index that no longer exist on disk)
-    tracked_paths = set(index.entries.keys())
-    existing_paths = set(to_stage)
-
-    for tracked_path in tracked_paths:
+    # Detect deletions (files in index that no longer exist on disk). Every
+    # tracked path in scope is checked: trusted stat data only proves a file
+    # is unchanged while it still exists. Files outside the sparse-checkout
+    # patterns are missing on purpose.
+    for tracked_path in sorted(index.entries):
+        if not in_scopes(tracked_path, scopes) or not sparse.includes(tracked_path):
+            continue
         full_path = os.path.join(repo_root, tracked_path)
         if not os.path.isfile(full_path):
-            del index.entries[tracked_path]
+            index.remove(tracked_path)
+            index.forget_stat(tracked_path)
             print(f"deleted: {tracked_path}")  # prints deleted files
             changed = True
 
     if not changed:
+        if index.stats_changed:
+            index.write()
+        dir_cache.write()
+        monitor.save(scopes)
         print("nothing to add")
         sys.exit(0)
 
     index.write()
+    dir_cache.write()
+    monitor.save(scopes)
+
+
+def hash_and_store_files(repo_root, store, paths, jobs):
+    """
+    Stores a blob for each repo-relative path, reading every file once;
+    objects that already exist are not rewritten. Returns the hashes in
+    input order. Large batches are spread across 'jobs' worker processes.
+    """
+    if jobs <= 1 or len(paths) < PARALLEL_THRESHOLD:
+        _init_worker(repo_root, store)
+        return [_hash_and_store(rel_path) for rel_path in paths]
+
+    chunksize = max(1, len(paths) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(repo_root, store)) as pool:
+        return list(pool.map(_hash_and_store, paths, chunksize=chunksize))
+
+
+_worker_state = None
+
+def _init_worker(repo_root, store):
+    global _worker_state
+    _worker_state = (repo_root, store)
+
+def _hash_and_store(rel_path):
+    repo_root, store = _worker_state
+    return store.store_file(os.path.join(repo_root, rel_path))
 
 
 # Patch to ensure users cannot add files outside the repository
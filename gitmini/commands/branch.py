@@ -4,6 +4,7 @@ import sys
 from gitmini_core.utils import find_gitmini_root
 from gitmini_core.classes.Repo import Repo
 from gitmini_core.classes.HEAD import HEAD
+from gitmini.classes.Refs import Refs, RefConflict
 
 def handle_branch(args):
     """
@@ -22,8 +23,11 @@ def handle_branch(args):
             print(f"fatal: branch '{new_branch}' already exists")
             sys.exit(1)
         commit_hash = HEAD(repo).get_commit()
-        with open(branch_file, "w") as f:
-            f.write(commit_hash)
+        try:
+            Refs(repo).update(f"refs/heads/{new_branch}", commit_hash, expected=None)
+        except RefConflict:
+            print(f"fatal: branch '{new_branch}' already exists")
+            sys.exit(1)
         print(f"successfully created new branch '{new_branch}'")
     else:
         # List branches
@@ -1,19 +1,37 @@
 import os
 import sys
+import stat
+from concurrent.futures import ThreadPoolExecutor
 
 from gitmini_core.utils import find_gitmini_root
 from gitmini_core.classes.Repo import Repo
 from gitmini_core.classes.HEAD import HEAD
-from gitmini_core.classes.Index import Index
+from gitmini.classes.Index import Index
+from gitmini.classes.ObjectStore import ObjectStore, OBJECT_ERRORS, running_as_root
+from gitmini.classes.SparseCheckout import SparseCheckout
+from gitmini.classes.Refs import Refs
+from gitmini.classes.FSMonitor import FSMonitor
+from gitmini.utils import hash_file
+
+# Below this many files, starting worker threads costs more than it saves
+PARALLEL_THRESHOLD = 64
 
 def handle_checkout(args):
     """
     Switch to a branch or a specific commit.
-    --force will discard any staged/uncommitted changes.
+    --force will discard any staged/uncommitted changes. Without it, checkout
+    is refused if it would overwrite local changes.
+    --link reflink|hardlink shares file data with the object store instead of copying it.
+    Hard-linked files must never be edited in place; as root, where their
+    read-only mode protects nothing, hardlink falls back to reflink.
+    --jobs N restores files with N worker threads.
+    With sparse-checkout patterns, only the paths they include are written.
+    HEAD and the index are only updated once every file was written.
     """
     repo_root = find_gitmini_root()
     repo = Repo(repo_root)
     head = HEAD(repo)
+    store = ObjectStore(repo)
     target = args.target
 
     # Resolve branch command
@@ -23,89 +41,208 @@ def handle_checkout(args):
         new_commit = open(branch_file, "r").read().strip()
         is_branch = True
     else:
-        # Pull commit hash
-        obj_file = os.path.join(repo.objects_dir, target)
-        if os.path.exists(obj_file):
-            new_commit = target
-            is_branch = False
-        else:
+        # Full or abbreviated commit hash
+        try:
+            new_commit = store.resolve(target, "commit")
+        except ValueError as e:
+            print(f"fatal: {e}", file=sys.stderr)
+            sys.exit(1)
+        if new_commit is None:
             print(f"fatal: branch or commit '{target}' not found", file=sys.stderr)
             sys.exit(1)
+        is_branch = False
 
-    # Checkout is not allowed unless project is fully committed, or --force is used
-    index = Index(repo)
+    index = Index(repo, lock=True)
+    refs = Refs(repo)
+    head_value = refs.read("HEAD")
     current_commit = head.get_commit()
-    curr_tree = get_tree_hash(repo, current_commit)
-    curr_tree_map = read_tree(repo, curr_tree)  # path → sha
+    curr_tree = store.read_commit(current_commit).tree if current_commit else None
+    sparse = SparseCheckout(repo)
 
-    if not args.force and index.entries != curr_tree_map:
-        print("error: cannot switch branches with uncommitted changes")
-        sys.exit(1)
+    # Only files that differ between the two trees are touched, so unchanged
+    # files keep their mtimes and build tools do not see them as modified
+    new_tree = store.read_commit(new_commit).tree
+    removed, to_write = store.diff_trees(curr_tree, new_tree)
 
-    # Load new tree for cleanup comparison
-    new_tree = get_tree_hash(repo, new_commit)
-    new_raw = read_tree(repo, new_tree)
+    # With a running fsmonitor daemon, files it saw no change in are trusted
+    # without a stat() call. The token is not saved: checkout does not
+    # re-check the whole tree, so the reported changes stay pending.
+    monitor = FSMonitor(repo)
+    monitor.changed_paths()
 
-    clean_working_dir(repo, curr_tree_map, new_raw)
-
-    # Update HEAD
-    if is_branch:
-        head.set_ref(target)
+    if args.force:
+        new_raw = store.flatten_tree(new_tree) if new_tree else {}
     else:
-        head.set_commit(new_commit)
-        print(f"Note: checking out '{new_commit[:7]}'")
-        print("You are in 'detached HEAD' state. Any commits you make will be orphaned unless you create a branch.")
+        # Checkout is refused if it would overwrite local changes; changes to
+        # files it does not touch are carried over to the new branch
+        conflicts = local_changes(repo, index, monitor, removed, to_write, sparse)
+        if conflicts:
+            print("error: your local changes to the following files would be overwritten by checkout:")
+            for path in conflicts:
+                print(f"\t{path}")
+            print("Please commit your changes, or use --force to discard them.")
+            sys.exit(1)
+        new_raw = dict(index.entries)
+        for path in removed:
+            new_raw.pop(path, None)
+        new_raw.update(to_write)
+    to_write = sparse_view(to_write, sparse)
 
-    # Load file contents from the new commit's tree
-    for path, sha in new_raw.items():
-        src = os.path.join(repo.objects_dir, sha)
-        dst = os.path.join(repo.root, path)
-        if not os.path.exists(src):
+    if args.force:
+        # Also reset files whose staged or working copy no longer matches
+        for path, sha in sparse_view(new_raw, sparse).items():
+            if path not in to_write and not is_clean(repo, index, monitor, path, sha):
+                to_write[path] = sha
+
+    # Every object must be there before the working tree is touched
+    items = sorted(to_write.items())
+    for path, sha in items:
+        if not store.exists(sha):
             print(f"fatal: object file for {path} ({sha}) not found", file=sys.stderr)
             sys.exit(1)
-        os.makedirs(os.path.dirname(dst), exist_ok=True)
-        with open(src, "rb") as sf, open(dst, "wb") as df:
-            df.write(sf.read())
 
-    # Refresh index to match the new tree
-    new_index = Index(repo)
-    new_index.entries = dict(new_raw)
-    new_index.write()
+    clean_working_dir(repo, [p for p in removed if p not in new_raw])
+
+    # Write the files that changed, remembering the stat data of restored
+    # files so the next 'add' does not re-hash them
+    jobs = args.jobs or os.cpu_count() or 1
+    if args.link == "hardlink" and running_as_root():
+        print("warning: not hard-linking files as root, which could write through them into the "
+              "object store; using --link reflink", file=sys.stderr)
+    stats, failures = restore_files(repo, store, items, jobs, args.link)
+    if failures:
+        for path, error in failures:
+            print(f"error: unable to write {path}: {error}", file=sys.stderr)
+        print("fatal: checkout failed; HEAD and the index were left unchanged", file=sys.stderr)
+        sys.exit(1)
+
+    # HEAD is locked and checked first, so if another process moved it
+    # meanwhile neither HEAD nor the index is updated
+    with refs.lock("HEAD", expected=head_value) as head_lock:
+        index.entries = new_raw
+        for path, sha in items:
+            index.update_stat(path, sha, stats[path])
+        index.write()
+        head_lock.write(f"ref: refs/heads/{target}" if is_branch else new_commit)
+        head_lock.commit()
+
+    if not is_branch:
+        print(f"Note: checking out '{new_commit[:7]}'")
+        print("You are in 'detached HEAD' state. Any commits you make will be orphaned unless you create a branch.")
 
     if is_branch:
         print(f"checked out to branch '{target}'")
 
-def get_tree_hash(repo, commit_hash):
-    # Extracts the tree hash from a commit object
-    commit_path = os.path.join(repo.objects_dir, commit_hash)
-    with open(commit_path, "rb") as f:
-        for line in f.read().decode(errors="ignore").splitlines():
-            if line.startswith("tree "):
-                return line.split(" ", 1)[1].strip()
-    return None
-
-def read_tree(repo, tree_hash):
-    # Loads a tree object and returns key-value pairs of paths and hashes
-    tree_path = os.path.join(repo.objects_dir, tree_hash)
-    with open(tree_path, "rb") as f:
-        lines = f.read().decode(errors="ignore").splitlines()
-    entries = {}
-    for line in lines:
-        if not line:
+def local_changes(repo, index, monitor, removed, to_write, sparse):
+    """
+    Returns the sorted paths among those checkout will remove or write that
+    have staged or unstaged changes, or that are untracked files in the
+    way. Files the fsmonitor saw no change in are trusted as they are;
+    otherwise cached stat data answers for unmodified files with one stat()
+    call each. Only files whose stat data changed are re-hashed.
+    """
+    conflicts = []
+    for path in sorted(set(removed) | set(to_write)):
+        if not sparse.includes(path):
+            continue
+        expected = removed.get(path)  # the current commit's blob, or None
+        if index.get(path) != expected:
+            conflicts.append(path)  # staged change
+            continue
+        if expected is not None and not monitor.is_changed(path) and index.is_known(path, expected):
+            continue
+        abs_path = os.path.join(repo.root, path)
+        try:
+            st = os.lstat(abs_path)
+        except OSError:
+            if expected is not None and path in to_write:
+                conflicts.append(path)  # deleted here, changed by the checkout
             continue
-        sha, path = line.split(" ", 1)
-        entries[path] = sha
-    return entries
-
-def clean_working_dir(repo, old_tree_map, new_tree_map):
-    # Delete files tracked in old_tree_map that are not in new_tree_map
-    for path in old_tree_map:
-        if path not in new_tree_map:
-            abs_path = os.path.join(repo.root, path)
-            if os.path.exists(abs_path):
-                os.remove(abs_path)
-                # Recursively remove empty parent directories up to repo root
-                parent = os.path.dirname(abs_path)
-                while parent != repo.root and os.path.isdir(parent) and not os.listdir(parent):
-                    os.rmdir(parent)
-                    parent = os.path.dirname(parent)
+        if expected is None:
+            # Untracked file in the way; a directory whose files are all
+            # removed by the checkout goes away before 'path' is written
+            if not (stat.S_ISDIR(st.st_mode) and only_removed_files(repo, path, removed)):
+                conflicts.append(path)
+        elif not stat.S_ISREG(st.st_mode):
+            conflicts.append(path)
+        elif not index.is_fresh(path, expected, st) and hash_file(abs_path) != expected:
+            conflicts.append(path)
+    return conflicts
+
+def only_removed_files(repo, path, removed):
+    # True if every file below the directory 'path' is one the checkout
+    # removes (those are checked for local changes on their own)
+    for dirpath, dirnames, filenames in os.walk(os.path.join(repo.root, path)):
+        links = [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]
+        for name in filenames + links:
+            if os.path.relpath(os.path.join(dirpath, name), repo.root) not in removed:
+                return False
+    return True
+
+def sparse_view(entries, sparse):
+    # The entries that belong in the working tree
+    if not sparse.enabled:
+        return dict(entries)
+    return {path: sha for path, sha in entries.items() if sparse.includes(path)}
+
+def restore_files(repo, store, items, jobs, link=None):
+    """
+    Writes each (path, sha) item to the working tree, spreading large batches
+    across 'jobs' threads (restoring is mostly waiting on I/O, and the kernel
+    copies and zlib release the GIL). Returns (stats, failures): path →
+    os.stat_result of every written file, and (path, error) for each file
+    that could not be written, sorted by path.
+    """
+    # Create every directory first, so workers never race on a shared parent
+    blocked = {}  # directory → why it could not be created
+    for parent in sorted({os.path.dirname(os.path.join(repo.root, path)) for path, _ in items}):
+        try:
+            os.makedirs(parent, exist_ok=True)
+        except OSError as e:
+            blocked[parent] = e
+    store.packs  # opened once here rather than concurrently by the workers
+
+    def restore(item):
+        path, sha = item
+        dst = os.path.join(repo.root, path)
+        if os.path.dirname(dst) in blocked:
+            return path, None, blocked[os.path.dirname(dst)]
+        try:
+            store.restore(sha, dst, link=link)
+            return path, os.stat(dst), None
+        except OBJECT_ERRORS as e:
+            return path, None, e
+
+    if jobs <= 1 or len(items) < PARALLEL_THRESHOLD:
+        results = [restore(item) for item in items]
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(restore, items))
+
+    stats = {path: st for path, st, error in results if error is None}
+    failures = sorted((path, error) for path, _, error in results if error is not None)
+    return stats, failures
+
+def is_clean(repo, index, monitor, path, sha):
+    # True if 'path' is staged as 'sha' and its working copy is unmodified
+    if index.get(path) != sha:
+        return False
+    if not monitor.is_changed(path) and index.is_known(path, sha):
+        return True
+    try:
+        st = os.stat(os.path.join(repo.root, path))
+    except OSError:
+        return False
+    return index.is_fresh(path, sha, st) or hash_file(os.path.join(repo.root, path)) == sha
+
+def clean_working_dir(repo, paths):
+    # Delete the given tracked files
+    for path in paths:
+        abs_path = os.path.join(repo.root, path)
+        if os.path.exists(abs_path):
+            os.remove(abs_path)
+            # Recursively remove empty parent directories up to repo root
+            parent = os.path.dirname(abs_path)
+            while parent != repo.root and os.path.isdir(parent) and not os.listdir(parent):
+                os.rmdir(parent)
+                parent = os.path.dirname(parent)
@@ -1,11 +1,12 @@
-import os
 import sys
 from gitmini_core.utils import find_gitmini_root
 from gitmini_core.classes.Repo import Repo
-from gitmini_core.classes.Index import Index
-from gitmini_core.classes.Tree import Tree
+from gitmini.classes.Index import Index
 from gitmini_core.classes.Commit import Commit
 from gitmini_core.classes.HEAD import HEAD
+from gitmini.classes.ObjectStore import ObjectStore
+from gitmini.classes.CommitGraph import CommitGraph
+from gitmini.classes.Refs import Refs
 
 def handle_commit(args):
     """
@@ -13,8 +14,9 @@ def handle_commit(args):
     """
     repo_root = find_gitmini_root()
     repo = Repo(repo_root)
-    index = Index(repo)
+    index = Index(repo, lock=True)
     head = HEAD(repo)
+    store = ObjectStore(repo)
 
     # Do not allow commits in detached HEAD state
     # TODO: change this. Research how git handles this.
@@ -23,24 +25,17 @@ def handle_commit(args):
         print("Run: gitmini branch <name> to create a branch first.")
         sys.exit(1)
 
-    # Build tree from index
-    tree = Tree(repo, index.entries)
-    tree_hash = tree.write()
+    # Build one tree per directory from the index; unchanged ones are reused
+    tree_hash = store.write_tree(index.entries)
 
     # Find parent commit
     parent_hash = head.get_commit()
     parent_tree = None
-    if parent_hash:
-        obj_path = os.path.join(repo.gitmini_dir, "objects", parent_hash)
-        if os.path.exists(obj_path):
-            with open(obj_path, "rb") as f:
-                for line in f.read().decode(errors="ignore").splitlines():
-                    if line.startswith("tree "):
-                        parent_tree = line.split(" ", 1)[1].strip()
-                        break
+    if parent_hash and store.exists(parent_hash):
+        parent_tree = store.read_commit(parent_hash).tree
 
     # Compare for new changes
-    if parent_tree and parent_tree == tree_hash:
+    if parent_tree and same_tree(store, parent_tree, tree_hash, index.entries):
         print("nothing to commit")
         sys.exit(1)
 
@@ -49,22 +44,32 @@ def handle_commit(args):
     # Write commit
     commit = Commit(repo, tree_hash, parent_hash, message)
     commit_hash = commit.write()
+    store.normalize(commit_hash, "commit")
 
-    # Update branch pointer
-    head.update(commit_hash)
+    # Update branch pointer, unless another commit moved it meanwhile
+    Refs(repo).update_head(commit_hash, expected=parent_hash)
 
-    # Reset index to match this commit's tree
-    new_entries = {}
-    tree_path = os.path.join(repo.objects_dir, tree_hash)
-    with open(tree_path, "rb") as tf:
-        for line in tf.read().decode(errors="ignore").splitlines():
-            if not line:
-                continue
-            sha, path = line.split(" ", 1)
-            new_entries[path] = sha
-
-    index.entries = new_entries
+    # The tree was built from the index, so the index already matches it
     index.write()
 
-    path = os.path.join(repo.gitmini_dir, "objects", commit_hash)
-    print(f"Commit object written to: {path}")
+    # Record the commit in the commit-graph (the first time, with its history).
+    # The graph is only a cache (readers fall back to the commit objects), so
+    # a busy or unwritable graph (LockError is an OSError) does not fail the commit
+    try:
+        CommitGraph(repo, store).update([commit_hash])
+    except OSError:
+        pass
+
+    print(f"Commit object written to: {store.path(commit_hash)}")
+
+
+def same_tree(store, parent_tree, tree_hash, entries):
+    """ True if the parent commit's tree holds exactly the index 'entries' built into 'tree_hash'. """
+    if parent_tree == tree_hash:
+        return True
+    # Legacy flat trees name files by full path, so they never hash like the
+    # per-directory tree built from the same index
+    names = store.read_tree(parent_tree).entries
+    if any("/" in name and not name.endswith("/") for name in names):
+        return store.flatten_tree(parent_tree) == entries
+    return False
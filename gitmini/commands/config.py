@@ -0,0 +1,32 @@
+import sys
+from gitmini_core.utils import find_gitmini_root
+from gitmini_core.classes.Repo import Repo
+from gitmini.utils import read_config, update_config
+
+def handle_config(args):
+    """
+    Reads or sets a repository setting in .gitmini/config.json.
+    'true'/'false' and whole numbers are stored as booleans and integers.
+    """
+    repo_root = find_gitmini_root()
+    repo = Repo(repo_root)
+    config = read_config(repo)
+
+    if args.value is None:
+        if args.key not in config:
+            sys.exit(1)
+        value = config[args.key]
+        print(str(value).lower() if isinstance(value, bool) else value)
+        return
+
+    value = parse_value(args.value)
+    update_config(repo, lambda config: config.update({args.key: value}))
+
+
+def parse_value(value):
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    try:
+        return int(value)
+    except ValueError:
+        return value
@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from gitmini_core.utils import find_gitmini_root
+from gitmini_core.classes.Repo import Repo
+from gitmini_core.classes.HEAD import HEAD
+from gitmini.classes.ObjectStore import ObjectStore, OBJECT_ERRORS
+from gitmini.utils import iter_chunks
+
+# Below this many objects, starting worker processes costs more than it saves
+PARALLEL_THRESHOLD = 256
+
+def handle_fsck(args):
+    """
+    Verifies the object store: every object is re-hashed (across a pool of
+    worker processes), pack checksums are checked, and every commit, tree,
+    blob and chunk reachable from HEAD, refs/heads and the remote branches
+    must exist. Reports missing, corrupt and dangling objects; exits with 1
+    if anything is missing or corrupt.
+    """
+    repo_root = find_gitmini_root()
+    repo = Repo(repo_root)
+    store = ObjectStore(repo)
+    problems = 0
+
+    for pack in store.packs:
+        error = pack.verify()
+        if error:
+            print(f"error: {error}")
+            problems += 1
+
+    shas = set(store.loose_objects())
+    for pack in store.packs:
+        shas.update(pack.shas())
+
+    jobs = args.jobs or os.cpu_count() or 1
+    progress = Progress("Checking objects", len(shas)) if sys.stderr.isatty() else None
+    for sha, error in verify_objects(repo_root, sorted(shas), jobs, progress):
+        if error:
+            print(f"corrupt object {sha}: {error}")
+            problems += 1
+
+    reachable, missing = walk_reachable(store, ref_tips(repo, store))
+    for obj_type, sha in missing:
+        print(f"missing {obj_type} {sha}")
+    problems += len(missing)
+
+    for obj_type, sha in dangling_objects(store, shas - reachable):
+        print(f"dangling {obj_type} {sha}")
+
+    if problems:
+        sys.exit(1)
+
+
+def verify_objects(repo_root, shas, jobs, progress=None):
+    """ Yields (sha, error or None) for each object, re-hashing them across 'jobs' worker processes. """
+    if jobs <= 1 or len(shas) < PARALLEL_THRESHOLD:
+        _init_worker(repo_root)
+        results = map(_verify, shas)
+        pool = None
+    else:
+        chunksize = max(1, len(shas) // (jobs * 16))
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(repo_root,))
+        results = pool.map(_verify, shas, chunksize=chunksize)
+    try:
+        for sha, error in zip(shas, results):
+            if progress:
+                progress.update()
+            yield sha, error
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if progress:
+            progress.done()
+
+
+def ref_tips(repo, store):
+    """ Returns the commits named by HEAD, refs/heads and remote_branches.json. """
+    tips = [HEAD(repo).get_commit()]
+    heads_dir = os.path.join(repo.gitmini_dir, "refs", "heads")
+    if os.path.isdir(heads_dir):
+        for name in sorted(os.listdir(heads_dir)):
+            with open(os.path.join(heads_dir, name), "r") as f:
+                tips.append(f.read().strip())
+    remote_branches_path = os.path.join(repo.gitmini_dir, "refs", "remote_branches.json")
+    if os.path.exists(remote_branches_path):
+        with open(remote_branches_path, "r") as f:
+            remote_tips = list(json.load(f).values())
+        # Remote commits pushed from elsewhere are never fetched, so only
+        # those that exist here can be checked
+        tips.extend(t for t in remote_tips if t and store.exists(t))
+    return [t for t in dict.fromkeys(tips) if t]
+
+
+def walk_reachable(store, tips):
+    """ Returns (reachable shas, [(type, sha) of referenced objects that do not exist]). """
+    reachable = set()
+    missing = []
+    stack = [("commit", sha) for sha in tips]
+    while stack:
+        obj_type, sha = stack.pop()
+        if sha in reachable:
+            continue
+        reachable.add(sha)
+        if not store.exists(sha):
+            missing.append((obj_type, sha))
+            continue
+        try:
+            if obj_type == "commit":
+                commit = store.read_commit(sha)
+                if commit.tree:
+                    stack.append(("tree", commit.tree))
+                stack.extend(("commit", parent) for parent in commit.parents)
+            elif obj_type == "tree":
+                for name, entry_sha in store.read_tree(sha).entries.items():
+                    stack.append(("tree" if name.endswith("/") else "blob", entry_sha))
+            elif obj_type == "blob":
+                stack.extend(("chunk", chunk_sha) for chunk_sha, _ in store.chunks(sha) or ())
+        except OBJECT_ERRORS:
+            continue  # unreadable; already reported as corrupt
+    return reachable, missing
+
+
+def dangling_objects(store, unreachable):
+    """ Returns (type, sha) for unreachable objects that no other unreachable object refers to. """
+    referenced = set()
+    types = {}
+    for sha in unreachable:
+        try:
+            types[sha] = store.type(sha)
+            if types[sha] == "commit":
+                commit = store.read_commit(sha)
+                referenced.add(commit.tree)
+                referenced.update(commit.parents)
+            elif types[sha] == "tree":
+                referenced.update(store.read_tree(sha).entries.values())
+            elif types[sha] == "blob":
+                referenced.update(chunk_sha for chunk_sha, _ in store.chunks(sha) or ())
+        except OBJECT_ERRORS:
+            continue
+    return [(types[sha], sha) for sha in sorted(types) if sha not in referenced]
+
+
+class Progress:
+    """ Prints "<title>: NN% (done/total)" to stderr, rewriting one line. """
+
+    def __init__(self, title, total):
+        self.title = title
+        self.total = total
+        self.count = 0
+        self._shown = -1
+
+    def update(self):
+        self.count += 1
+        percent = self.count * 100 // self.total if self.total else 100
+        if percent != self._shown:
+            self._shown = percent
+            print(f"\r{self.title}: {percent}% ({self.count}/{self.total})", end="", file=sys.stderr, flush=True)
+
+    def done(self):
+        print(f"\r{self.title}: 100% ({self.count}/{self.total}), done.", file=sys.stderr, flush=True)
+
+
+_worker_store = None
+
+def _init_worker(repo_root):
+    global _worker_store
+    _worker_store = ObjectStore(Repo(repo_root))
+
+def _verify(sha):
+    # Re-hashes an object's content; returns what is wrong with it, or None
+    h = hashlib.sha1()
+    size = 0
+    try:
+        with _worker_store.open(sha) as f:
+            for chunk in iter_chunks(f):
+                h.update(chunk)
+                size += len(chunk)
+        expected_size = _worker_store.size(sha)
+    except OBJECT_ERRORS as e:
+        return str(e) or type(e).__name__
+    if h.hexdigest() != sha:
+        return f"content hashes to {h.hexdigest()}"
+    if size != expected_size:
+        return f"size is {size}, expected {expected_size}"
+    return None
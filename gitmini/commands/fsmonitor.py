@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import subprocess
+from gitmini_core.utils import find_gitmini_root
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.FSMonitor import FSMonitor, FSMonitorDaemon, request, LOG_FILENAME, PID_FILENAME
+
+def handle_fsmonitor(args):
+    """
+    Starts, stops or reports on the file-system monitor daemon of this repo.
+    Commands only consult it when 'gitmini config fsmonitor true' is set.
+    """
+    repo_root = find_gitmini_root()
+    repo = Repo(repo_root)
+    pid_path = os.path.join(repo.gitmini_dir, PID_FILENAME)
+
+    if not sys.platform.startswith("linux"):
+        print("fatal: fsmonitor requires Linux (inotify)", file=sys.stderr)
+        sys.exit(1)
+
+    if args.action == "run":
+        # Foreground mode, used by 'start' to launch the daemon
+        FSMonitorDaemon(repo).serve()
+        return
+
+    if args.action == "start":
+        if request(repo, "status"):
+            print("fsmonitor is already running")
+            return
+        with open(os.path.join(repo.gitmini_dir, LOG_FILENAME), "a") as log:
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "gitmini", "fsmonitor", "run"],
+                cwd=repo_root,
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=log,
+                start_new_session=True,
+            )
+        with open(pid_path, "w") as f:
+            f.write(str(proc.pid))
+
+        # Wait for the daemon to finish setting up its watches
+        deadline = time.time() + 30
+        while not request(repo, "status"):
+            if proc.poll() is not None or time.time() > deadline:
+                print(f"fatal: fsmonitor failed to start, see {LOG_FILENAME}", file=sys.stderr)
+                sys.exit(1)
+            time.sleep(0.05)
+        print(f"fsmonitor started (pid {proc.pid})")
+        if not FSMonitor(repo).enabled:
+            print("hint: run 'gitmini config fsmonitor true' to let commands use it")
+
+    elif args.action == "stop":
+        if not request(repo, "quit"):
+            print("fsmonitor is not running")
+        else:
+            print("fsmonitor stopped")
+        if os.path.exists(pid_path):
+            os.remove(pid_path)
+
+    else:
+        reply = request(repo, "status")
+        if not reply:
+            print("fsmonitor is not running")
+        else:
+            print(f"fsmonitor is running, watching {reply['watches']} directories")
@@ -1,13 +1,19 @@
-import os
 from gitmini_core.utils import find_gitmini_root
 from gitmini_core.classes.Repo import Repo
 from gitmini_core.classes.HEAD import HEAD
+from gitmini.classes.ObjectStore import ObjectStore
+from gitmini.classes.CommitGraph import CommitGraph
 
 def handle_log(args):
-    """ Show commit history for the current branch. """
+    """
+    Show commit history for the current branch.
+    --oneline prints one line per commit: its abbreviated hash and summary.
+    """
     repo_root = find_gitmini_root()
     repo = Repo(repo_root)
     head = HEAD(repo)
+    store = ObjectStore(repo)
+    graph = CommitGraph(repo, store)
 
     commit_hash = head.get_commit()
 
@@ -15,39 +21,28 @@ def handle_log(args):
         print("fatal: branch has no commits yet")
         return
 
+    # The commit-graph gives the parents; the date and message are only in
+    # the commit objects, which are opened just to print them
     while commit_hash:
-        obj_path = os.path.join(repo.objects_dir, commit_hash)
-        if not os.path.exists(obj_path):
+        node = graph.get(commit_hash)
+        if node is None:
             print(f"error: commit object {commit_hash} not found")
             break
 
-        with open(obj_path, "rb") as f:
-            lines = f.read().decode(errors="ignore").splitlines()
+        commit = store.read_commit(commit_hash)
 
-        tree = parent = timestamp = message = ""
-        reading_msg = False
-        msg_lines = []
-
-        for line in lines:
-            if line.startswith("tree "):
-                tree = line.split(" ", 1)[1]
-            elif line.startswith("parent "):
-                parent = line.split(" ", 1)[1]
-            elif line.startswith("timestamp "):
-                timestamp = line[len("timestamp "):]
-            elif line.strip() == "":
-                reading_msg = True
-            elif reading_msg:
-                msg_lines.append(line)
-
-        message = "\n".join(msg_lines).strip()
+        if args.oneline:
+            summary = commit.message.splitlines()[0] if commit.message else ""
+            print(f"{store.abbreviate(commit_hash)} {summary}")
+            commit_hash = node.parent
+            continue
 
         print("")
         print(f"commit {commit_hash}")
-        if timestamp:
-            print(f"Date:   {timestamp}")
-        if message:
-            print(f"\n    {message}")
+        if commit.timestamp:
+            print(f"Date:   {commit.timestamp}")
+        if commit.message:
+            print(f"\n    {commit.message}")
         print()
 
-        commit_hash = parent if parent else None
+        commit_hash = node.parent
@@ -1,12 +1,12 @@
 import os
 import sys
-import json
 import time
 import httpx
 import webbrowser
 from gitmini_core.utils import find_gitmini_root
 from gitmini_core.classes.Repo import Repo
 from gitmini.api_config import API_URL
+from gitmini.utils import update_config
 
 CONFIG_FILENAME = "config.json"
 
@@ -51,10 +51,8 @@ def handle_login(args):
                 status_data = status_resp.json()
                 username = status_data["username"]
                 api_key = status_data["api_key"]
-                # Save config with RAW api key
-                config = {"username": username, "api_key": api_key}
-                with open(config_path, "w") as f:
-                    json.dump(config, f, indent=2)
+                # Save config with RAW api key, keeping any other settings
+                update_config(repo, lambda config: config.update({"username": username, "api_key": api_key}))
                 print(f"[SUCCESS] Logged in as {username}.")
                 return
         except Exception:
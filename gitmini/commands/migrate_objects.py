@@ -0,0 +1,16 @@
+from gitmini_core.utils import find_gitmini_root
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.ObjectStore import ObjectStore
+
+def handle_migrate_objects(args):
+    """
+    Moves objects stored in the old flat layout (objects/<sha>) into fan-out
+    subdirectories (objects/<sha[:2]>/<sha[2:]>). Safe to run more than once.
+    """
+    repo_root = find_gitmini_root()
+    repo = Repo(repo_root)
+    moved = ObjectStore(repo).migrate()
+    if moved:
+        print(f"migrated {moved} object(s) to fan-out directories")
+    else:
+        print("nothing to migrate")
@@ -1,11 +1,17 @@
+import io
 import os
 import sys
 import json
+import time
 import hashlib
+import tempfile
 import httpx
 from gitmini.api_config import API_URL
 from gitmini_core.utils import find_gitmini_root
 from gitmini_core.classes.Repo import Repo
+from gitmini.classes.ObjectStore import ObjectStore
+from gitmini.classes.CommitGraph import CommitGraph
+from gitmini.classes.LockFile import LockFile
 
 CONFIG_FILENAME = "config.json"
 HEAD_FILENAME = "HEAD"
@@ -100,63 +106,78 @@ def handle_push(args):
 
     # Package new_objects.tar.gz
     import tarfile
-    objects_dir = os.path.join(repo.gitmini_dir, "objects")
-    tar_path = os.path.join(repo.gitmini_dir, "new_objects.tar.gz")
+    store = ObjectStore(repo)
     to_send = set()
     visited_commits = set()
     visited_trees = set()
 
+    # History is walked through the commit-graph, without opening commits
+    graph = CommitGraph(repo, store)
+
+    # The remote tip must be an ancestor of what is pushed; the server would
+    # reject anything else after the upload, so check before packing
+    if last_known_remote_commit and store.exists(last_known_remote_commit) \
+            and not graph.is_ancestor(last_known_remote_commit, new_commit):
+        print("fatal: Non-fast-forward push rejected. Remote branch has diverged.", file=sys.stderr)
+        sys.exit(1)
+
+    # The remote has everything reachable from its tip, so identical subtrees
+    # and blobs at the same path can be skipped without being walked
+    remote_tree = None
+    if last_known_remote_commit and store.exists(last_known_remote_commit):
+        remote_tree = graph.get(last_known_remote_commit).tree
+
     def walk_commit(commit_hash):
-        if commit_hash in visited_commits:
-            return
-        visited_commits.add(commit_hash)
-        commit_path = os.path.join(objects_dir, commit_hash)
-        if not os.path.exists(commit_path):
-            print(f"fatal: commit object {commit_hash} not found.", file=sys.stderr)
-            sys.exit(1)
-        with open(commit_path, "rb") as f:
-            lines = f.read().decode(errors="ignore").splitlines()
-        tree = None
-        parent = None
-        for line in lines:
-            if line.startswith("tree "):
-                tree = line.split(" ", 1)[1].strip()
-            elif line.startswith("parent "):
-                parent = line.split(" ", 1)[1].strip()
-        to_send.add(commit_hash)
-        if tree:
-            walk_tree(tree)
-        # Stop if we reach the last known remote commit
-        if parent and parent != last_known_remote_commit:
-            walk_commit(parent)
-        # If parent is None, this is the root commit (include it, stop)
-
-    def walk_tree(tree_hash):
-        if tree_hash in visited_trees:
+        # Follows first parents back to (not including) the last known remote
+        # commit, or to the root commit
+        while commit_hash and commit_hash not in visited_commits:
+            visited_commits.add(commit_hash)
+            commit = graph.get(commit_hash)
+            if commit is None:
+                print(f"fatal: commit object {commit_hash} not found.", file=sys.stderr)
+                sys.exit(1)
+            to_send.add(commit_hash)
+            if commit.tree:
+                walk_tree(commit.tree, remote_tree)
+            commit_hash = commit.parent
+            if commit_hash == last_known_remote_commit:
+                break
+
+    def walk_tree(tree_hash, remote_hash=None):
+        # remote_hash is the tree at the same path in the remote tip, if any
+        if tree_hash in visited_trees or tree_hash == remote_hash:
             return
         visited_trees.add(tree_hash)
-        tree_path = os.path.join(objects_dir, tree_hash)
-        if not os.path.exists(tree_path):
+        if not store.exists(tree_hash):
             print(f"fatal: tree object {tree_hash} not found.", file=sys.stderr)
             sys.exit(1)
-        with open(tree_path, "rb") as f:
-            lines = f.read().decode(errors="ignore").splitlines()
         to_send.add(tree_hash)
-        for line in lines:
-            if not line:
+        remote_entries = {}
+        if remote_hash and store.exists(remote_hash):
+            remote_entries = store.read_tree(remote_hash).entries
+        for name, sha in store.read_tree(tree_hash).entries.items():
+            if remote_entries.get(name) == sha:
                 continue
-            sha, path = line.split(" ", 1)
-            obj_path = os.path.join(objects_dir, sha)
-            if not os.path.exists(obj_path):
+            if not store.exists(sha):
                 print(f"fatal: object {sha} referenced in tree {tree_hash} not found.", file=sys.stderr)
                 sys.exit(1)
-            # Heuristic: if file is a tree object, recurse; else, it's a blob
-            with open(obj_path, "rb") as obj_f:
-                first_line = obj_f.readline().decode(errors="ignore")
-            if first_line.startswith("tree "):
-                walk_tree(sha)
+            # Object types are recorded, so blobs are classified without being opened
+            if store.type(sha) == "tree":
+                walk_tree(sha, remote_entries.get(name))
             else:
                 to_send.add(sha)
+                if store.is_chunked(sha):
+                    send_chunks(sha, remote_entries.get(name))
+
+    def send_chunks(blob_hash, remote_hash=None):
+        # A chunked blob only needs the chunks that the remote's version of
+        # the same file does not already have
+        remote_chunks = set()
+        if remote_hash and store.exists(remote_hash) and store.is_chunked(remote_hash):
+            remote_chunks = {chunk_sha for chunk_sha, _size in store.chunks(remote_hash)}
+        for chunk_sha, _size in store.chunks(blob_hash):
+            if chunk_sha not in remote_chunks:
+                to_send.add(chunk_sha)
 
     # Walk the commit graph
     if not last_known_remote_commit:
@@ -170,55 +191,75 @@ def handle_push(args):
             walk_commit(commit_hash)
         walk_until(new_commit)
 
-    # Package objects into tarball
-    with tarfile.open(tar_path, "w:gz") as tar:
-        for obj_hash in to_send:
-            obj_path = os.path.join(objects_dir, obj_hash)
-            tar.add(obj_path, arcname=obj_hash)
-    
-    # The payload is now ready.
-    # DEBG TOOL: Print payload for manual inspection
-    # print("DEBUG PAYLOAD:", payload)
-
-    # Send API request with tarball and fields as multipart/form-data
+    # Each push packs into its own file, so concurrent pushes don't
+    # overwrite each other's archive
+    fd, tar_path = tempfile.mkstemp(prefix="new_objects.", suffix=".tar.gz", dir=repo.gitmini_dir)
+    os.close(fd)
     try:
-        with open(tar_path, "rb") as tarfile_obj:
-            files = {
-                "user": (None, username),
-                "api_key": (None, hashed_api_key),
-                "repo": (None, repo_name),
-                "branch": (None, remote_branch),
-                "last_known_remote_commit": (None, last_known_remote_commit),
-                "new_commit": (None, new_commit),
-                "objects": ("new_objects.tar.gz", tarfile_obj, "application/gzip"),
-            }
-            resp = httpx.post(f"{API_URL}/api/remote/push", files=files, timeout=10)
+        # Package objects into tarball. The remote expects raw objects, so
+        # compressed and packed ones are streamed out uncompressed. Chunked blobs
+        # are sent as their manifest, next to the chunks the remote lacks.
+        with tarfile.open(tar_path, "w:gz") as tar:
+            for obj_hash in to_send:
+                info = tarfile.TarInfo(obj_hash)
+                info.mtime = int(time.time())
+                manifest = store.manifest(obj_hash)
+                if manifest is not None:
+                    info.size = len(manifest)
+                    tar.addfile(info, io.BytesIO(manifest))
+                    continue
+                info.size = store.size(obj_hash)
+                with store.open(obj_hash) as obj_f:
+                    tar.addfile(info, obj_f)
+
+        # The payload is now ready.
+        # DEBG TOOL: Print payload for manual inspection
+        # print("DEBUG PAYLOAD:", payload)
+
+        # Send API request with tarball and fields as multipart/form-data
         try:
-            data = resp.json()
-        except Exception:
-            data = None
-        if resp.status_code == 200:
-            if data and data.get("status") == "ok":
-                print(f"[SUCCESS] {data.get('message', 'Push successful.')}")
-                # Update remote_branches.json with most_recent_remote_branch_commit
-                mrrbc = data.get("most_recent_remote_branch_commit")
-                if mrrbc:
-                    remote_branches_path = os.path.join(repo.gitmini_dir, "refs", "remote_branches.json")
-                    with open(remote_branches_path, "r") as f:
-                        remote_branches = json.load(f)
-                    remote_branches[remote_branch] = mrrbc
-                    with open(remote_branches_path, "w") as f:
-                        json.dump(remote_branches, f, indent=2)
+            with open(tar_path, "rb") as tarfile_obj:
+                files = {
+                    "user": (None, username),
+                    "api_key": (None, hashed_api_key),
+                    "repo": (None, repo_name),
+                    "branch": (None, remote_branch),
+                    "last_known_remote_commit": (None, last_known_remote_commit),
+                    "new_commit": (None, new_commit),
+                    "objects": ("new_objects.tar.gz", tarfile_obj, "application/gzip"),
+                }
+                resp = httpx.post(f"{API_URL}/api/remote/push", files=files, timeout=10)
+            try:
+                data = resp.json()
+            except Exception:
+                data = None
+            if resp.status_code == 200:
+                if data and data.get("status") == "ok":
+                    print(f"[SUCCESS] {data.get('message', 'Push successful.')}")
+                    # Update remote_branches.json with most_recent_remote_branch_commit
+                    mrrbc = data.get("most_recent_remote_branch_commit")
+                    if mrrbc:
+                        # Re-read under the lock, so concurrent pushes of other
+                        # branches are not lost
+                        remote_branches_path = os.path.join(repo.gitmini_dir, "refs", "remote_branches.json")
+                        with LockFile(remote_branches_path) as lock:
+                            with open(remote_branches_path, "r") as f:
+                                remote_branches = json.load(f)
+                            remote_branches[remote_branch] = mrrbc
+                            lock.write(json.dumps(remote_branches, indent=2))
+                            lock.commit()
+                else:
+                    print(f"fatal: {data.get('message', 'Unknown error') if data else 'Unknown error'}", file=sys.stderr)
+                    sys.exit(1)
             else:
-                print(f"fatal: {data.get('message', 'Unknown error') if data else 'Unknown error'}", file=sys.stderr)
+                # Try to print error message from JSON
+                if data and 'message' in data:
+                    print(f"fatal: {data['message']}", file=sys.stderr)
+                else:
+                    print(f"fatal: Failed to connect to remote: HTTP {resp.status_code}", file=sys.stderr)
                 sys.exit(1)
-        else:
-            # Try to print error message from JSON
-            if data and 'message' in data:
-                print(f"fatal: {data['message']}", file=sys.stderr)
-            else:
-                print(f"fatal: Failed to connect to remote: HTTP {resp.status_code}", file=sys.stderr)
+        except Exception as e:
+            print(f"fatal: Failed to connect to remote: {e}", file=sys.stderr)
             sys.exit(1)
-    except Exception as e:
-        print(f"fatal: Failed to connect to remote: {e}", file=sys.stderr)
-        sys.exit(1)
+    finally:
+        os.remove(tar_path)
@@ -6,6 +6,8 @@ import httpx
 from gitmini.api_config import API_URL
 from gitmini_core.utils import find_gitmini_root
 from gitmini_core.classes.Repo import Repo
+from gitmini.classes.LockFile import LockFile
+from gitmini.utils import update_config
 
 CONFIG_FILENAME = "config.json"
 REMOTE_BRANCHES_FILENAME = "remote_branches.json"
@@ -55,15 +57,14 @@ def handle_remote_add(args):
     # Handle response
     if data.get("status") == "ok":
         # Add repo to config.json
-        config["repo"] = repo_name
-        with open(config_path, "w") as f:
-            json.dump(config, f, indent=2)
-            
+        update_config(repo, lambda config: config.update({"repo": repo_name}))
+
         # Write branches to remote_branches.json
         branches = data.get("branches", {})
         os.makedirs(refs_dir, exist_ok=True)
-        with open(remote_branches_path, "w") as f:
-            json.dump(branches, f, indent=2)
+        with LockFile(remote_branches_path) as lock:
+            lock.write(json.dumps(branches, indent=2))
+            lock.commit()
         print(f"[SUCCESS] Connected to remote '{repo_name}'. Branches saved.")
     else:
         print(f"fatal: {data.get('message', 'Unknown error')}", file=sys.stderr)
@@ -0,0 +1,128 @@
+import os
+import zlib
+from collections import deque
+from gitmini_core.utils import find_gitmini_root
+from gitmini_core.classes.Repo import Repo
+from gitmini_core.classes.HEAD import HEAD
+from gitmini.classes.ObjectStore import ObjectStore, TYPE_CODES
+from gitmini.classes.Pack import PackWriter, create_delta, delta_index
+from gitmini.classes.CommitGraph import CommitGraph
+
+# Objects smaller than this are not worth delta-encoding
+MIN_DELTA_SIZE = 64
+
+def handle_repack(args):
+    """
+    Consolidates all loose objects and existing packs into a single pack,
+    delta-encoding objects against similar ones, then removes what was packed.
+    """
+    repo_root = find_gitmini_root()
+    repo = Repo(repo_root)
+    store = ObjectStore(repo)
+
+    shas = set(store.loose_objects())
+    for pack in store.packs:
+        shas.update(pack.shas())
+    if not shas:
+        print("nothing to pack")
+        return
+
+    # Like git, try deltas between objects of the same type stored at the
+    # same path, largest first, so later (usually larger) versions serve as bases
+    hints = path_hints(repo, store)
+    types = {sha: store.type(sha) for sha in shas}
+    order = sorted(shas, key=lambda s: (types[s], hints.get(s, ""), -store.size(s), s))
+
+    level = zlib.Z_DEFAULT_COMPRESSION if store.level is None else store.level
+    writer = PackWriter(store.pack_dir, level)
+    try:
+        deltas = pack_objects(store, writer, order, types, args.window, args.depth)
+        idx_path = writer.finish()
+    except BaseException:
+        writer.abort()
+        raise
+
+    # The new pack holds everything, so older packs and loose copies can go.
+    # Indexes are removed before their packs, so no index is left without one.
+    old_packs = [(p.idx_path, p.pack_path) for p in store.packs if p.idx_path != idx_path]
+    store.reload_packs()
+    for old_idx, old_pack in old_packs:
+        os.remove(old_idx)
+        os.remove(old_pack)
+    for sha in shas:
+        store.remove_loose(sha)
+    store.forget_types(shas)  # the pack records their types now
+
+    print(f"packed {len(order)} objects ({deltas} deltas) into {os.path.basename(idx_path)[:-len('.idx')]}")
+
+
+def pack_objects(store, writer, order, types, window_size, max_depth):
+    """
+    Writes objects in 'order' to the pack, each as a delta against the best
+    of the previous window_size objects when that saves at least half its
+    size. Delta chains are at most max_depth long. Returns the delta count.
+    """
+    window = deque(maxlen=max(window_size, 0))  # (sha, data, depth, delta index)
+    deltas = 0
+    for sha in order:
+        type_code = TYPE_CODES[types[sha]]
+        manifest = store.manifest(sha)
+        if manifest is not None:
+            # A chunked blob is packed as its manifest; its chunks are objects of their own
+            writer.add(sha, store.size(sha), manifest, type_code=type_code, chunked=True)
+            continue
+        data = store.read(sha)
+        best = None
+        if len(data) >= MIN_DELTA_SIZE:
+            for base_sha, base_data, base_depth, index in window:
+                if types[base_sha] != types[sha] or base_depth >= max_depth or len(base_data) > 2 * len(data) or len(data) > 2 * len(base_data):
+                    continue
+                delta = create_delta(base_data, data, index)
+                if best is None or len(delta) < len(best[1]):
+                    best = (base_sha, delta, base_depth + 1)
+
+        if best is not None and len(best[1]) < len(data) // 2:
+            writer.add(sha, len(data), best[1], base=best[0], type_code=type_code)
+            depth = best[2]
+            deltas += 1
+        else:
+            writer.add(sha, len(data), data, type_code=type_code)
+            depth = 0
+        if window.maxlen:
+            window.append((sha, data, depth, delta_index(data)))
+    return deltas
+
+
+def path_hints(repo, store):
+    """ Maps blob and tree hashes to a path they were committed at, walking every branch. """
+    heads_dir = os.path.join(repo.gitmini_dir, "refs", "heads")
+    tips = [HEAD(repo).get_commit()]
+    if os.path.isdir(heads_dir):
+        for name in os.listdir(heads_dir):
+            with open(os.path.join(heads_dir, name), "r") as f:
+                tips.append(f.read().strip())
+
+    graph = CommitGraph(repo, store)
+    hints = {}
+    seen = set()
+    stack = [t for t in tips if t]
+    while stack:
+        commit_hash = stack.pop()
+        if commit_hash in seen:
+            continue
+        seen.add(commit_hash)
+        commit = graph.get(commit_hash)
+        if commit is None:
+            continue
+        stack.extend(commit.parents)
+        trees = [(commit.tree, "")]
+        while trees:
+            tree_hash, prefix = trees.pop()
+            if not tree_hash or tree_hash in seen or not store.exists(tree_hash):
+                continue
+            seen.add(tree_hash)
+            for name, sha in store.read_tree(tree_hash).entries.items():
+                hints.setdefault(sha, prefix + name)
+                if name.endswith("/"):
+                    trees.append((sha, prefix + name))
+    return hints
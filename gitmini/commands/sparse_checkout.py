@@ -0,0 +1,77 @@
+import os
+import sys
+from gitmini_core.utils import find_gitmini_root
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.Index import Index
+from gitmini.classes.ObjectStore import ObjectStore
+from gitmini.classes.SparseCheckout import SparseCheckout
+from gitmini.classes.FSMonitor import FSMonitor
+from gitmini.commands.checkout import restore_files, is_clean, clean_working_dir
+
+def handle_sparse_checkout(args):
+    """
+    Lists, sets, extends or disables the sparse-checkout patterns, then
+    updates the working tree to match: files that became included are
+    written and files that became excluded are removed. Modified files are
+    kept. The index and HEAD are not changed.
+    """
+    repo_root = find_gitmini_root()
+    repo = Repo(repo_root)
+    old = SparseCheckout(repo)
+
+    if args.action == "list":
+        for pattern in old.patterns:
+            print(pattern)
+        return
+    if args.action in ("set", "add") and not args.patterns:
+        print(f"fatal: 'sparse-checkout {args.action}' needs at least one pattern", file=sys.stderr)
+        sys.exit(1)
+
+    if args.action == "set":
+        patterns = args.patterns
+    elif args.action == "add":
+        patterns = old.patterns + [p for p in args.patterns if p not in old.patterns]
+    else:
+        patterns = []
+    # The index lock keeps a concurrent checkout from running in between
+    index = Index(repo, lock=True)
+    old.write(patterns)
+    new = SparseCheckout(repo)
+
+    store = ObjectStore(repo)
+    monitor = FSMonitor(repo)
+    monitor.changed_paths()
+    to_write = []
+    to_remove = []
+    for path, sha in sorted(index.entries.items()):
+        was, now = old.includes(path), new.includes(path)
+        if now and not was:
+            if not os.path.lexists(os.path.join(repo.root, path)):
+                to_write.append((path, sha))
+        elif was and not now and os.path.lexists(os.path.join(repo.root, path)):
+            if is_clean(repo, index, monitor, path, sha):
+                to_remove.append(path)
+            else:
+                print(f"warning: not removing '{path}', it has local changes", file=sys.stderr)
+
+    for path, sha in to_write:
+        if not store.exists(sha):
+            print(f"fatal: object file for {path} ({sha}) not found", file=sys.stderr)
+            sys.exit(1)
+
+    clean_working_dir(repo, to_remove)
+    stats, failures = restore_files(repo, store, to_write, os.cpu_count() or 1)
+    for path, error in failures:
+        print(f"error: unable to write {path}: {error}", file=sys.stderr)
+
+    for path, sha in to_write:
+        if path in stats:
+            index.update_stat(path, sha, stats[path])
+    for path in to_remove:
+        index.forget_stat(path)
+    if index.stats_changed:
+        index.write()
+
+    print(f"sparse checkout: {len(stats)} files written, {len(to_remove)} removed")
+    if failures:
+        sys.exit(1)
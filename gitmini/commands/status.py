@@ -0,0 +1,145 @@
+import os
+import stat
+from gitmini_core.utils import find_gitmini_root
+from gitmini_core.classes.Repo import Repo
+from gitmini_core.classes.HEAD import HEAD
+from gitmini.classes.Index import Index
+from gitmini.classes.IgnoreMatcher import IgnoreMatcher
+from gitmini.classes.DirCache import DirCache
+from gitmini.classes.FSMonitor import FSMonitor
+from gitmini.classes.ObjectStore import ObjectStore
+from gitmini.classes.SparseCheckout import SparseCheckout
+from gitmini.classes.LockFile import LockError
+from gitmini.utils import hash_file
+
+def handle_status(args):
+    """
+    Shows staged changes (HEAD vs index), unstaged changes (index vs working
+    tree) and untracked files, without modifying the index.
+    """
+    repo_root = find_gitmini_root()
+    repo = Repo(repo_root)
+    head = HEAD(repo)
+    # The refresh below writes back what was read here, so the index is read
+    # under its lock. Status never waits for another writer: if the index is
+    # locked, it is read as it is and the refresh is skipped.
+    try:
+        index = Index(repo, lock=True, timeout=0)
+    except LockError:
+        index = Index(repo)
+    ignore = IgnoreMatcher(repo)
+    dir_cache = DirCache(repo, ignore)
+    monitor = FSMonitor(repo)
+    monitor.changed_paths()
+    dir_cache.monitor = monitor
+
+    # HEAD vs index
+    commit_hash = head.get_commit()
+    head_map = {}
+    if commit_hash:
+        store = ObjectStore(repo)
+        head_map = store.flatten_tree(store.read_commit(commit_hash).tree)
+    staged = diff_maps(head_map, index.entries)
+
+    # Index vs working tree; files outside the sparse-checkout patterns are
+    # not on disk on purpose
+    sparse = SparseCheckout(repo)
+    unstaged = {}
+    for path, sha in index.entries.items():
+        if not sparse.includes(path):
+            continue
+        state = worktree_state(repo, index, monitor, path, sha)
+        if state:
+            unstaged[path] = state
+
+    # Working tree files the index does not know about
+    untracked = [p for p in dir_cache.walk("") if p not in index.entries]
+
+    # Refreshing cached stat data makes the next command faster; staged
+    # entries are left as they are. The fsmonitor token only moves past the
+    # reported changes once the refresh is saved; otherwise they stay pending.
+    refreshed = index.locked or not index.stats_changed
+    if index.stats_changed and index.locked:
+        index.write()
+    else:
+        index.unlock()
+    dir_cache.write()
+    monitor.save([""] if refreshed else [])
+
+    if args.porcelain:
+        print_porcelain(staged, unstaged, untracked)
+    else:
+        print_long(head, staged, unstaged, untracked)
+
+
+def diff_maps(old_map, new_map):
+    """ Returns path → 'A' | 'M' | 'D' for every path that differs. """
+    changes = {}
+    for path, sha in new_map.items():
+        old_sha = old_map.get(path)
+        if old_sha is None:
+            changes[path] = "A"
+        elif old_sha != sha:
+            changes[path] = "M"
+    for path in old_map:
+        if path not in new_map:
+            changes[path] = "D"
+    return changes
+
+
+def worktree_state(repo, index, monitor, path, sha):
+    """
+    Returns None if the working-tree file matches 'sha', 'M' if it was modified
+    and 'D' if it is gone. Files are only hashed when their stat data changed.
+    """
+    if not monitor.is_changed(path) and index.is_known(path, sha):
+        return None
+    try:
+        st = os.stat(os.path.join(repo.root, path))
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
+        # The monitor will not report the path again, so its stat data must
+        # not vouch for it any more
+        index.forget_stat(path)
+        return "D"
+    current = index.lookup(path, st)
+    if current is None:
+        current = hash_file(os.path.join(repo.root, path))
+        index.update_stat(path, current, st)
+    return None if current == sha else "M"
+
+
+def print_porcelain(staged, unstaged, untracked):
+    # Stable, machine-readable "XY path" lines (X = staged, Y = unstaged)
+    for path in sorted(set(staged) | set(unstaged)):
+        print(f"{staged.get(path, ' ')}{unstaged.get(path, ' ')} {path}")
+    for path in sorted(untracked):
+        print(f"?? {path}")
+
+
+def print_long(head, staged, unstaged, untracked):
+    labels = {"A": "new file:", "M": "modified:", "D": "deleted:"}
+
+    if head.is_detached():
+        print(f"HEAD detached at {(head.get_commit() or '')[:7]}")
+    else:
+        print(f"On branch {head.get_ref().split('/')[-1]}")
+
+    if staged:
+        print("\nChanges to be committed:")
+        for path in sorted(staged):
+            print(f"\t{labels[staged[path]]:<12}{path}")
+    if unstaged:
+        print("\nChanges not staged for commit:")
+        for path in sorted(unstaged):
+            print(f"\t{labels[unstaged[path]]:<12}{path}")
+    if untracked:
+        print("\nUntracked files:")
+        for path in sorted(untracked):
+            print(f"\t{path}")
+
+    if not (staged or unstaged or untracked):
+        print("nothing to commit, working tree clean")
+    elif not staged:
+        print("\nno changes added to commit (use \"gitmini add\")")
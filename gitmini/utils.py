@@ -0,0 +1,173 @@
+import os
+import json
+import errno
+import hashlib
+from gitmini.classes.LockFile import LockFile
+
+CONFIG_FILENAME = "config.json"
+
+# Files are streamed in chunks of this size, so memory use stays bounded
+# no matter how large the file is
+CHUNK_SIZE = 1024 * 1024
+
+
+def iter_chunks(f, chunk_size=None):
+    chunk_size = chunk_size or CHUNK_SIZE
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+# Content-defined chunking: a cut is made where a rolling 16-bit hash of the
+# last 16 bytes equals a fixed pattern. Each byte contributes one bit
+# (CDC_BITS[byte]), so the hash of a window is just the window translated
+# through CDC_BITS, and finding cut points is a bytes.find() for the pattern.
+# Cuts depend only on nearby content, so an edit only changes the chunks
+# around it. Chunks average 64 KiB and stay within [16 KiB, 256 KiB].
+CDC_MIN_SIZE = 16 * 1024
+CDC_MAX_SIZE = 256 * 1024
+CDC_BITS = bytes(hashlib.sha256(b"gitmini-cdc" + bytes([i])).digest()[0] & 1 for i in range(256))
+CDC_PATTERN = bytes((0xB5E3 >> i) & 1 for i in range(16))
+
+
+def iter_cdc_chunks(f):
+    """ Splits a binary file object into content-defined chunks. """
+    buf = bits = b""
+    eof = False
+    while not eof:
+        data = f.read(CHUNK_SIZE)
+        eof = not data
+        buf += data
+        bits += data.translate(CDC_BITS)
+        start = 0
+        while len(buf) - start >= CDC_MIN_SIZE:
+            at = bits.find(CDC_PATTERN, start + CDC_MIN_SIZE - len(CDC_PATTERN), start + CDC_MAX_SIZE)
+            if at != -1:
+                cut = at + len(CDC_PATTERN)
+            elif len(buf) - start >= CDC_MAX_SIZE:
+                cut = start + CDC_MAX_SIZE
+            else:
+                break
+            yield buf[start:cut]
+            start = cut
+        buf, bits = buf[start:], bits[start:]
+    if buf:
+        yield buf
+
+
+def hash_file(path):
+    """ Returns the SHA-1 of a file's content without loading it into memory. """
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter_chunks(f):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def copy_file(src_path, dst_path):
+    """
+    Copies a file inside the kernel when possible (copy_file_range, then
+    sendfile), so the data never passes through Python; whatever the kernel
+    could not copy is streamed in fixed-size chunks.
+    """
+    with open(src_path, "rb") as sf, open(dst_path, "wb") as df:
+        copied = _kernel_copy(sf.fileno(), df.fileno(), os.fstat(sf.fileno()).st_size)
+        sf.seek(copied)
+        df.seek(copied)
+        for chunk in iter_chunks(sf):
+            df.write(chunk)
+
+
+# ioctl that makes a file a copy-on-write clone of another (linux/fs.h)
+FICLONE = 0x40049409
+
+
+def reflink_file(src_path, dst_path):
+    """
+    Makes dst_path a copy-on-write clone of src_path, sharing its blocks
+    until either file is written (btrfs, XFS, bcachefs, ...). Returns False
+    if the file system cannot clone.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(src_path, "rb") as sf, open(dst_path, "wb") as df:
+        try:
+            fcntl.ioctl(df.fileno(), FICLONE, sf.fileno())
+        except OSError as e:
+            if e.errno in _UNSUPPORTED_COPY or e.errno == errno.ENOTTY:
+                return False
+            raise
+    return True
+
+
+# Kernel copies are issued in pieces of at most this size (sendfile() stops
+# short of 2 GiB per call anyway)
+KERNEL_COPY_MAX = 1024 * 1024 * 1024
+
+# Errors meaning a copy method does not work for these files (e.g. another
+# file system, or a kernel without copy_file_range) rather than a failed copy
+_UNSUPPORTED_COPY = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+
+
+def _kernel_copy(src_fd, dst_fd, size):
+    # Copies from the start of src_fd to the start of dst_fd; returns how many bytes were copied
+    methods = []
+    if hasattr(os, "copy_file_range"):
+        methods.append(lambda offset, count: os.copy_file_range(src_fd, dst_fd, count, offset, offset))
+    if hasattr(os, "sendfile"):
+        def sendfile(offset, count):
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            return os.sendfile(dst_fd, src_fd, offset, count)
+        methods.append(sendfile)
+
+    offset = 0
+    for method in methods:
+        try:
+            while offset < size:
+                n = method(offset, min(size - offset, KERNEL_COPY_MAX))
+                if not n:
+                    return offset  # the file shrank
+                offset += n
+            return offset
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_COPY:
+                raise
+    return offset
+
+
+def read_config(repo):
+    """ Returns the settings in .gitmini/config.json ({} if there are none). """
+    config_path = os.path.join(repo.gitmini_dir, CONFIG_FILENAME)
+    if not os.path.exists(config_path):
+        return {}
+    try:
+        with open(config_path, "r") as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def write_config(repo, config):
+    config_path = os.path.join(repo.gitmini_dir, CONFIG_FILENAME)
+    with LockFile(config_path) as lock:
+        lock.write(json.dumps(config, indent=2))
+        lock.commit()
+
+
+def update_config(repo, update):
+    """
+    Calls update(config), which changes the settings in place, and writes
+    them back. The lock is held from reading to writing, so a concurrent
+    update of another setting is not lost. Returns the new settings.
+    """
+    config_path = os.path.join(repo.gitmini_dir, CONFIG_FILENAME)
+    with LockFile(config_path) as lock:
+        config = read_config(repo)
+        update(config)
+        lock.write(json.dumps(config, indent=2))
+        lock.commit()
+    return config
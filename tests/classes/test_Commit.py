@@ -6,6 +6,7 @@ from gitmini_core.classes.HEAD import HEAD
 from gitmini_core.classes.Index import Index
 from gitmini_core.classes.Tree import Tree
 from gitmini_core.utils import compute_sha1
+from gitmini.classes.ObjectStore import ObjectStore
 from tests.test_helpers import GitMiniTestCase
 
 
@@ -27,11 +28,12 @@ class TestCommit(GitMiniTestCase):
         commit_hash = head.get_commit()
 
         self.assertIsNotNone(commit_hash)
-        obj_path = os.path.join(self.repo.objects_dir, commit_hash)
-        self.assertTrue(os.path.exists(obj_path))
+        store = ObjectStore(self.repo)
+        self.assertEqual(store.path(commit_hash),
+                         os.path.join(self.repo.objects_dir, commit_hash[:2], commit_hash[2:]))
+        self.assertTrue(store.exists(commit_hash))
 
-        with open(obj_path, "rb") as f:
-            contents = f.read().decode()
+        contents = store.read(commit_hash).decode()
         self.assertIn("tree", contents)
         self.assertIn("timestamp", contents)
         self.assertIn("Commit test", contents)
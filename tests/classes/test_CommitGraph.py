@@ -0,0 +1,98 @@
+import io
+import os
+import contextlib
+
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.ObjectStore import ObjectStore
+from gitmini.classes.CommitGraph import CommitGraph, commit_time
+from tests.test_helpers import GitMiniTestCase
+
+
+class TestCommitGraph(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            Repo.init(self.repo_dir)
+        self.repo = Repo(self.repo_dir)
+        self.store = ObjectStore(self.repo)
+        self.tree = self.store.write_tree({"file.txt": self.store.write(b"content", "blob")})
+
+    def commit(self, message, *parents, unix=1700000000):
+        lines = [f"tree {self.tree}"] + [f"parent {p}" for p in parents]
+        lines.append(f"timestamp 2023-11-14 22:13:20 (unix: {unix})")
+        return self.store.write(("\n".join(lines) + "\n\n" + message).encode(), "commit")
+
+    def test_records_parents_tree_and_generation(self):
+        """ Every commit reachable from the tips is recorded, merges included. """
+        root = self.commit("root")
+        a = self.commit("a", root)
+        b = self.commit("b", root)
+        c = self.commit("c", root)
+        merge = self.commit("octopus", a, b, c, unix=1700000100)
+
+        graph = CommitGraph(self.repo, self.store)
+        self.assertEqual(graph.update([merge]), 5)
+        graph = CommitGraph(self.repo, self.store)
+        entry = graph.get(merge)
+        self.assertEqual(entry.parents, [a, b, c])
+        self.assertEqual(entry.tree, self.tree)
+        self.assertEqual(entry.generation, 3)
+        self.assertEqual(entry.timestamp, 1700000100)
+        self.assertEqual(graph.get(root).parents, [])
+        self.assertEqual(graph.get(root).generation, 1)
+
+    def test_commits_are_read_from_the_graph(self):
+        """ Recorded commits are answered without their objects. """
+        root = self.commit("root")
+        child = self.commit("child", root)
+        CommitGraph(self.repo, self.store).update([child])
+        os.remove(self.store.path(root))
+        os.remove(self.store.path(child))
+        graph = CommitGraph(self.repo, ObjectStore(self.repo))
+        self.assertEqual(graph.get(child).parent, root)
+        self.assertTrue(graph.is_ancestor(root, child))
+
+    def test_incremental_layers_are_merged(self):
+        """ One layer per update, merged so the chain stays logarithmic in length. """
+        graph = CommitGraph(self.repo, self.store)
+        history = [self.commit("0")]
+        graph.update(history[-1:])
+        for i in range(1, 40):
+            history.append(self.commit(str(i), history[-1]))
+            graph.update(history[-1:])
+            self.assertLessEqual(len(graph.layers), 6)
+
+        graph = CommitGraph(self.repo, self.store)
+        counts = [layer.count for layer in graph.layers]
+        self.assertEqual(sum(counts), 40)
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertEqual(len(os.listdir(graph.graph_dir)), len(counts))
+        for i, sha in enumerate(history):
+            self.assertEqual(graph.get(sha).generation, i + 1)
+            self.assertEqual(graph.get(sha).parent, history[i - 1] if i else None)
+
+    def test_is_ancestor(self):
+        root = self.commit("root")
+        left = self.commit("left", root)
+        right = self.commit("right", root)
+        CommitGraph(self.repo, self.store).update([left, right])
+        graph = CommitGraph(self.repo, self.store)
+        self.assertTrue(graph.is_ancestor(root, left))
+        self.assertTrue(graph.is_ancestor(left, left))
+        self.assertFalse(graph.is_ancestor(left, right))
+        self.assertFalse(graph.is_ancestor(left, root))
+
+    def test_commits_outside_the_graph_fall_back_to_objects(self):
+        root = self.commit("root")
+        graph = CommitGraph(self.repo, self.store)
+        self.assertEqual(graph.get(root).tree, self.tree)
+        self.assertIsNone(graph.get(root).generation)
+        self.assertIsNone(graph.get("0" * 40))
+
+    def test_commit_time(self):
+        self.assertEqual(commit_time("2023-11-14 22:13:20 (unix: 1700000000)"), 1700000000)
+        self.assertEqual(commit_time("1700000000"), 1700000000)
+        self.assertEqual(commit_time(None), 0)
+        self.assertEqual(commit_time("sometime"), 0)
@@ -0,0 +1,75 @@
+import os
+import io
+import time
+import contextlib
+from unittest import mock
+
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.DirCache import DirCache
+from gitmini.classes.IgnoreMatcher import IgnoreMatcher
+from tests.test_helpers import GitMiniTestCase
+
+
+class TestDirCache(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            Repo.init(self.repo_dir)
+        self.repo = Repo(self.repo_dir)
+
+        with open(".gitmini-ignore", "w") as f:
+            f.write("build/\n*.log\n")
+        for path in ["a.txt", "b.log", os.path.join("sub", "c.txt"), os.path.join("build", "x.txt")]:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w") as f:
+                f.write("x")
+
+    def _age_directories(self):
+        # Move directory mtimes safely behind the next cache write
+        old_ns = time.time_ns() - 10**10
+        for root, dirs, files in os.walk(self.repo_dir):
+            os.utime(root, ns=(old_ns, old_ns))
+
+    def _cache(self):
+        return DirCache(self.repo, IgnoreMatcher(self.repo))
+
+    def test_walk_skips_ignored_entries(self):
+        """ Ignored files, ignored directories and .gitmini/ are not listed. """
+        files = self._cache().walk()
+        self.assertEqual(files, [".gitmini-ignore", "a.txt", os.path.join("sub", "c.txt")])
+
+    def test_unchanged_directories_are_not_read(self):
+        """ A directory with an unchanged mtime is served from the cache. """
+        self._age_directories()
+        cache = self._cache()
+        expected = cache.walk()
+        cache.write()
+
+        cache = self._cache()
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            self.assertEqual(cache.walk(), expected)
+        scandir.assert_not_called()
+
+    def test_new_file_is_found(self):
+        """ Adding a file changes its directory's mtime, so it is re-read. """
+        self._age_directories()
+        cache = self._cache()
+        cache.walk()
+        cache.write()
+
+        with open(os.path.join("sub", "new.txt"), "w") as f:
+            f.write("new")
+        self.assertIn(os.path.join("sub", "new.txt"), self._cache().walk())
+
+    def test_changed_ignore_rules_invalidate_cache(self):
+        """ Listings built with different ignore rules are discarded. """
+        self._age_directories()
+        cache = self._cache()
+        cache.walk()
+        cache.write()
+
+        with open(".gitmini-ignore", "w") as f:
+            f.write("*.log\n")
+        self.assertIn(os.path.join("build", "x.txt"), self._cache().walk())
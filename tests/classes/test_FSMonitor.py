@@ -0,0 +1,162 @@
+import os
+import io
+import sys
+import time
+import shutil
+import unittest
+import threading
+import contextlib
+
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.Index import Index
+from gitmini.classes.FSMonitor import FSMonitor, FSMonitorDaemon, request
+from gitmini.utils import read_config, write_config
+from tests.test_helpers import GitMiniTestCase
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "fsmonitor needs inotify")
+class TestFSMonitor(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            Repo.init(self.repo_dir)
+        self.repo = Repo(self.repo_dir)
+        config = read_config(self.repo)
+        config["fsmonitor"] = True
+        write_config(self.repo, config)
+
+        os.makedirs(os.path.join("sub", "deep"))
+        with open("a.txt", "w") as f:
+            f.write("a")
+
+        self.daemon = FSMonitorDaemon(self.repo)
+        self.thread = threading.Thread(target=self.daemon.serve, daemon=True)
+        self.thread.start()
+        deadline = time.time() + 5
+        while not request(self.repo, "status") and time.time() < deadline:
+            time.sleep(0.01)
+
+    def tearDown(self):
+        request(self.repo, "quit")
+        self.thread.join(5)
+        super().tearDown()
+
+    def _query(self, scopes=("",)):
+        monitor = FSMonitor(self.repo)
+        changed = monitor.changed_paths()
+        monitor.save(list(scopes))
+        return monitor, changed
+
+    def test_first_query_needs_full_scan(self):
+        """ Without a saved token the client must scan everything. """
+        monitor, changed = self._query()
+        self.assertIsNone(changed)
+        self.assertTrue(monitor.is_changed("a.txt"))
+
+    def test_reports_changed_files(self):
+        """ Modified and created files are reported, untouched ones are not. """
+        self._query()
+        with open("a.txt", "w") as f:
+            f.write("changed")
+        with open(os.path.join("sub", "b.txt"), "w") as f:
+            f.write("b")
+
+        monitor, changed = self._query()
+        self.assertIn("a.txt", changed)
+        self.assertIn(os.path.join("sub", "b.txt"), changed)
+        self.assertIn("sub", changed)  # its listing changed
+
+        monitor, changed = self._query()
+        self.assertEqual(changed, set())
+        self.assertFalse(monitor.is_changed("a.txt"))
+
+    def test_changes_outside_scope_stay_pending(self):
+        """ Changes a command did not re-check are reported again next time. """
+        self._query()
+        with open("a.txt", "w") as f:
+            f.write("changed")
+
+        self._query(scopes=["sub"])
+        monitor, changed = self._query()
+        self.assertIn("a.txt", changed)
+
+    def test_moved_directory_marks_subtree(self):
+        """ Everything below a moved directory counts as changed. """
+        self._query()
+        shutil.move("sub", "moved")
+
+        monitor, changed = self._query()
+        self.assertTrue(monitor.is_changed(os.path.join("sub", "deep", "x.txt")))
+        self.assertTrue(monitor.is_changed(os.path.join("moved", "deep", "x.txt")))
+
+    def test_disabled_by_config(self):
+        """ With the config flag off the daemon is never asked. """
+        config = read_config(self.repo)
+        config["fsmonitor"] = False
+        write_config(self.repo, config)
+        self._query()
+        monitor, changed = self._query()
+        self.assertIsNone(changed)
+
+    def test_add_stages_deletions_status_reported(self):
+        """ Files 'status' already reported deleted are still staged as deleted by 'add'. """
+        with open(os.path.join("sub", "b.txt"), "w") as f:
+            f.write("b")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["status", "--porcelain"])
+
+        os.remove("a.txt")
+        shutil.move("sub", "moved")
+        status = self.run_gitmini(["status", "--porcelain"]).stdout
+        self.assertIn("a.txt", status)
+        self.run_gitmini(["add", "."])
+
+        self.assertEqual(sorted(Index(self.repo).entries), [os.path.join("moved", "b.txt")])
+
+    def test_status_keeps_changes_pending_while_index_locked(self):
+        """ Status cannot save a refresh while the index is locked, so it must not advance the token. """
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["status", "--porcelain"])
+
+        with open("a.txt", "w") as f:
+            f.write("changed")
+        lock_path = os.path.join(self.repo.gitmini_dir, "index.lock")
+        open(lock_path, "w").close()
+        self.assertIn("AM a.txt", self.run_gitmini(["status", "--porcelain"]).stdout)
+        os.remove(lock_path)
+
+        self.assertIn("AM a.txt", self.run_gitmini(["status", "--porcelain"]).stdout)
+
+    def test_checkout_trusts_unchanged_files(self):
+        """ Checkout skips the stat() of files the monitor saw no change in, but still refuses reported changes. """
+        from unittest import mock
+        from gitmini.classes.SparseCheckout import SparseCheckout
+        from gitmini.commands import checkout
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "one"])
+        self.run_gitmini(["branch", "topic"])
+        with open("a.txt", "w") as f:
+            f.write("two")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "two"])
+        time.sleep(0.01)
+        self.run_gitmini(["status", "--porcelain"])
+
+        index = Index(self.repo)
+        sha = index.get("a.txt")
+        monitor = FSMonitor(self.repo)
+        self.assertEqual(monitor.changed_paths(), set())
+        with mock.patch("gitmini.commands.checkout.os.lstat") as lstat:
+            conflicts = checkout.local_changes(self.repo, index, monitor, {"a.txt": sha}, {"a.txt": "0" * 40},
+                                               SparseCheckout(self.repo))
+        self.assertEqual(conflicts, [])
+        lstat.assert_not_called()
+
+        with open("a.txt", "w") as f:
+            f.write("mine")
+        result = self.run_gitmini(["checkout", "topic"])
+        self.assertIn("would be overwritten", result.stdout)
+        with open("a.txt") as f:
+            self.assertEqual(f.read(), "mine")
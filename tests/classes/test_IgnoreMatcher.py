@@ -0,0 +1,57 @@
+import os
+import io
+import contextlib
+
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.IgnoreMatcher import IgnoreMatcher
+from tests.test_helpers import GitMiniTestCase
+
+
+class TestIgnoreMatcher(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            Repo.init(self.repo_dir)
+        self.repo = Repo(self.repo_dir)
+
+    def _matcher(self, rules):
+        with open(".gitmini-ignore", "w") as f:
+            f.write(rules)
+        return IgnoreMatcher(self.repo)
+
+    def test_name_rules_match_at_any_depth(self):
+        """ Rules without a '/' match by name anywhere in the tree. """
+        ignore = self._matcher("ignored.txt\n*.log\n")
+        self.assertTrue(ignore.should_ignore("ignored.txt"))
+        self.assertTrue(ignore.should_ignore(os.path.join("sub", "ignored.txt")))
+        self.assertTrue(ignore.should_ignore(os.path.join("a", "b", "debug.log")))
+        self.assertFalse(ignore.should_ignore("include.txt"))
+
+    def test_directory_rules(self):
+        """ 'dir/' only matches directories, and everything below them. """
+        ignore = self._matcher("node_modules/\n")
+        self.assertTrue(ignore.match("node_modules", is_dir=True))
+        self.assertFalse(ignore.match("node_modules"))
+        self.assertTrue(ignore.should_ignore(os.path.join("node_modules", "pkg", "index.js")))
+
+    def test_rules_with_slash_are_anchored(self):
+        """ '/build' and 'docs/*.tmp' only match relative to the repo root. """
+        ignore = self._matcher("/build\ndocs/*.tmp\n")
+        self.assertTrue(ignore.match("build", is_dir=True))
+        self.assertFalse(ignore.match(os.path.join("src", "build"), is_dir=True))
+        self.assertTrue(ignore.match(os.path.join("docs", "a.tmp")))
+        self.assertFalse(ignore.match(os.path.join("docs", "sub", "a.tmp")))
+
+    def test_double_star_crosses_directories(self):
+        """ '**' matches any number of directories. """
+        ignore = self._matcher("docs/**/*.tmp\n")
+        self.assertTrue(ignore.match(os.path.join("docs", "a.tmp")))
+        self.assertTrue(ignore.match(os.path.join("docs", "a", "b", "c.tmp")))
+
+    def test_comments_and_blank_lines_are_skipped(self):
+        """ Comments and blank lines are not rules. """
+        ignore = self._matcher("# a comment\n\n")
+        self.assertEqual(ignore.rules, [])
+        self.assertFalse(ignore.should_ignore("# a comment"))
@@ -1,9 +1,11 @@
 import os
 import io
+import time
 import contextlib
 
 from gitmini_core.classes.Repo import Repo
 from gitmini_core.classes.Index import Index
+from gitmini.classes.Index import Index as BinaryIndex
 from tests.test_helpers import GitMiniTestCase, GITMINI_DIR
 
 
@@ -44,3 +46,183 @@ class TestIndex(GitMiniTestCase):
         index = Index(repo)
         self.assertEqual(index.entries.get("one.txt"), "aaa111")
         self.assertEqual(index.entries.get("two.txt"), "bbb222")
+
+
+class TestBinaryIndex(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            Repo.init(self.repo_dir)
+        self.repo = Repo(self.repo_dir)
+
+    def test_roundtrip(self):
+        """ Entries written in the binary format are read back unchanged. """
+        index = BinaryIndex(self.repo)
+        for i in range(100):
+            index.add(os.path.join("dir", f"file{i:03}.txt"), f"{i:040x}")
+        index.write()
+
+        with open(os.path.join(GITMINI_DIR, "index"), "rb") as f:
+            self.assertEqual(f.read(4), b"GMIX")
+        loaded = BinaryIndex(self.repo)
+        self.assertEqual(loaded.entries, index.entries)
+
+    def test_get_uses_binary_search(self):
+        """ get() finds entries (and misses) without parsing the whole index. """
+        index = BinaryIndex(self.repo)
+        for i in range(100):
+            index.add(f"f{i:03}", f"{i:040x}")
+        index.write()
+
+        loaded = BinaryIndex(self.repo)
+        self.assertEqual(loaded.get("f000"), f"{0:040x}")
+        self.assertEqual(loaded.get("f057"), f"{57:040x}")
+        self.assertEqual(loaded.get("f099"), f"{99:040x}")
+        self.assertIsNone(loaded.get("f100"))
+        self.assertIsNone(loaded.get("a"))
+        self.assertIsNone(loaded._entries)  # nothing was parsed
+
+    def test_migrates_text_index(self):
+        """ A text index and its stat sidecar are read and rewritten as binary. """
+        with open("one.txt", "w") as f:
+            f.write("1")
+        sha = "a" * 40
+        st = os.stat("one.txt")
+        with open(os.path.join(GITMINI_DIR, "index"), "w") as f:
+            f.write(f"{sha} one.txt\n")
+        with open(os.path.join(GITMINI_DIR, "index-stat"), "w") as f:
+            f.write(f"{sha} {st.st_size} {st.st_mtime_ns} {st.st_ctime_ns} {st.st_ino} {st.st_mode} one.txt\n")
+
+        index = BinaryIndex(self.repo)
+        self.assertEqual(index.get("one.txt"), sha)
+        self.assertEqual(index.lookup("one.txt", st), sha)
+        index.write()
+
+        self.assertFalse(os.path.exists(os.path.join(GITMINI_DIR, "index-stat")))
+        self.assertEqual(BinaryIndex(self.repo).entries, {"one.txt": sha})
+
+    def test_fresh_after_write(self):
+        """ Stat data is stored with the entry and trusted once written. """
+        with open("a.txt", "w") as f:
+            f.write("A")
+        os.utime("a.txt", ns=(0, 0))
+        st = os.stat("a.txt")
+
+        index = BinaryIndex(self.repo)
+        index.add("a.txt", "1" * 40)
+        index.update_stat("a.txt", "1" * 40, st)
+        index.write()
+
+        loaded = BinaryIndex(self.repo)
+        self.assertTrue(loaded.is_fresh("a.txt", "1" * 40, st))
+        self.assertFalse(loaded.is_fresh("a.txt", "2" * 40, st))
+        self.assertTrue(loaded.is_known("a.txt", "1" * 40))
+
+    def test_modified_file_is_not_fresh(self):
+        with open("a.txt", "w") as f:
+            f.write("A")
+        os.utime("a.txt", ns=(0, 0))
+        index = BinaryIndex(self.repo)
+        index.add("a.txt", "1" * 40)
+        index.update_stat("a.txt", "1" * 40, os.stat("a.txt"))
+        index.write()
+
+        with open("a.txt", "w") as f:
+            f.write("AB")
+        self.assertFalse(BinaryIndex(self.repo).is_fresh("a.txt", "1" * 40, os.stat("a.txt")))
+
+    def test_racy_entries_are_smudged(self):
+        """ A file not older than the index cannot be trusted by its stat data. """
+        with open("a.txt", "w") as f:
+            f.write("A")
+        future = time.time_ns() + 10**10
+        os.utime("a.txt", ns=(future, future))
+        st = os.stat("a.txt")
+
+        index = BinaryIndex(self.repo)
+        index.add("a.txt", "1" * 40)
+        index.update_stat("a.txt", "1" * 40, st)
+        index.write()
+
+        loaded = BinaryIndex(self.repo)
+        self.assertFalse(loaded.is_fresh("a.txt", "1" * 40, st))
+        self.assertFalse(loaded.is_known("a.txt", "1" * 40))
+
+    def test_stat_data_dropped_when_hash_changes(self):
+        """ Replacing an entry's hash invalidates its stat data. """
+        with open("a.txt", "w") as f:
+            f.write("A")
+        os.utime("a.txt", ns=(0, 0))
+        st = os.stat("a.txt")
+
+        index = BinaryIndex(self.repo)
+        index.add("a.txt", "1" * 40)
+        index.update_stat("a.txt", "1" * 40, st)
+        index.add("a.txt", "2" * 40)
+        index.write()
+
+        self.assertIsNone(BinaryIndex(self.repo).lookup("a.txt", st))
+
+    def test_corrupt_index_is_rejected(self):
+        index = BinaryIndex(self.repo)
+        index.add("a.txt", "1" * 40)
+        index.write()
+        with open(os.path.join(GITMINI_DIR, "index"), "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0xFF]))
+
+        with self.assertRaises(ValueError):
+            BinaryIndex(self.repo).entries
+
+    def test_stat_queries_do_not_parse(self):
+        """ Stat lookups and refreshes go through the binary search and are written without parsing. """
+        with open("a.txt", "w") as f:
+            f.write("A")
+        os.utime("a.txt", ns=(0, 0))
+        st = os.stat("a.txt")
+        index = BinaryIndex(self.repo)
+        for i in range(100):
+            index.add(f"f{i:03}", f"{i:040x}")
+        index.add("a.txt", "1" * 40)
+        index.write()
+
+        loaded = BinaryIndex(self.repo)
+        self.assertIsNone(loaded.lookup("a.txt", st))
+        loaded.update_stat("a.txt", "1" * 40, st)
+        self.assertTrue(loaded.is_fresh("a.txt", "1" * 40, st))
+        loaded.write()
+        self.assertIsNone(loaded._entries)
+
+        loaded = BinaryIndex(self.repo)
+        self.assertTrue(loaded.is_known("a.txt", "1" * 40))
+        self.assertIsNone(loaded._entries)
+        self.assertEqual(len(loaded.entries), 101)
+
+    def test_write_splices_changed_blocks(self):
+        """ Entries added and removed before the index is parsed are written with the rest intact. """
+        index = BinaryIndex(self.repo)
+        expected = {}
+        for i in range(200):
+            index.add(f"dir{i % 3}/f{i:03}", f"{i:040x}")
+            expected[f"dir{i % 3}/f{i:03}"] = f"{i:040x}"
+        index.write()
+
+        loaded = BinaryIndex(self.repo)
+        for path in ("dir0/f000", "dir1/f100", "dir1/f199"):
+            loaded.remove(path)
+            del expected[path]
+        for path in ("a", "dir1/f100x", "zzz"):
+            loaded.add(path, "f" * 40)
+            expected[path] = "f" * 40
+        self.assertEqual(loaded.get("zzz"), "f" * 40)
+        self.assertIsNone(loaded.get("dir0/f000"))
+        loaded.write()
+        self.assertIsNone(loaded._entries)
+
+        reloaded = BinaryIndex(self.repo)
+        self.assertEqual(reloaded.get("dir1/f100x"), "f" * 40)
+        self.assertEqual(reloaded.entries, expected)
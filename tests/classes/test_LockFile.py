@@ -0,0 +1,90 @@
+import io
+import os
+import time
+import contextlib
+
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.LockFile import LockFile, LockError
+from gitmini.classes.Refs import Refs, RefConflict
+from tests.test_helpers import GitMiniTestCase
+
+
+class TestLockFile(GitMiniTestCase):
+
+    def test_commit_replaces_file(self):
+        with open("data.txt", "w") as f:
+            f.write("old")
+        with LockFile("data.txt") as lock:
+            lock.write("first draft")
+            lock.write("new")
+            with open("data.txt") as f:
+                self.assertEqual(f.read(), "old")  # readers see the old file until commit
+            lock.commit()
+        with open("data.txt") as f:
+            self.assertEqual(f.read(), "new")
+        self.assertFalse(os.path.exists("data.txt.lock"))
+
+    def test_rollback_on_error(self):
+        with open("data.txt", "w") as f:
+            f.write("old")
+        with self.assertRaises(RuntimeError):
+            with LockFile("data.txt") as lock:
+                lock.write("new")
+                raise RuntimeError
+        with open("data.txt") as f:
+            self.assertEqual(f.read(), "old")
+        self.assertFalse(os.path.exists("data.txt.lock"))
+
+    def test_second_writer_times_out(self):
+        """ A held lock makes other writers retry, then fail, without touching the file. """
+        with LockFile("data.txt"):
+            start = time.monotonic()
+            with self.assertRaises(LockError):
+                LockFile("data.txt", timeout=0.2).acquire()
+            self.assertGreaterEqual(time.monotonic() - start, 0.2)
+            with self.assertRaises(LockError):
+                LockFile("data.txt", timeout=0).acquire()
+        LockFile("data.txt", timeout=0).acquire().rollback()
+
+
+class TestRefs(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            Repo.init(self.repo_dir)
+        self.refs = Refs(Repo(self.repo_dir))
+
+    def test_compare_and_swap(self):
+        """ An update only succeeds while the ref holds the expected value. """
+        self.refs.update("refs/heads/topic", "a" * 40, expected=None)
+        with self.assertRaises(RefConflict):
+            self.refs.update("refs/heads/topic", "b" * 40, expected=None)
+        self.refs.update("refs/heads/topic", "b" * 40, expected="a" * 40)
+        with self.assertRaises(RefConflict):
+            self.refs.update("refs/heads/topic", "c" * 40, expected="a" * 40)
+        self.assertEqual(self.refs.read("refs/heads/topic"), "b" * 40)
+
+    def test_update_head_moves_the_current_branch(self):
+        self.refs.update("HEAD", "ref: refs/heads/topic")
+        self.refs.update_head("a" * 40, expected=None)
+        self.assertEqual(self.refs.read("refs/heads/topic"), "a" * 40)
+        self.refs.update("HEAD", "b" * 40)
+        self.refs.update_head("c" * 40, expected="b" * 40)
+        self.assertEqual(self.refs.read("HEAD"), "c" * 40)
+        self.assertEqual(self.refs.read("refs/heads/topic"), "a" * 40)
+
+    def test_lock_holds_the_ref_until_commit(self):
+        """ A ref lock checks the expected value up front and blocks other updates until committed. """
+        self.refs.update("refs/heads/topic", "a" * 40)
+        with self.assertRaises(RefConflict):
+            self.refs.lock("refs/heads/topic", expected="b" * 40)
+        self.assertFalse(os.path.exists(self.refs.path("refs/heads/topic") + ".lock"))
+
+        with self.refs.lock("refs/heads/topic", expected="a" * 40) as lock:
+            with self.assertRaises(LockError):
+                LockFile(self.refs.path("refs/heads/topic"), timeout=0).acquire()
+            lock.write("b" * 40)
+            lock.commit()
+        self.assertEqual(self.refs.read("refs/heads/topic"), "b" * 40)
@@ -0,0 +1,408 @@
+import os
+import io
+import zlib
+import random
+import contextlib
+from unittest import mock
+
+from gitmini_core.classes.Repo import Repo
+from gitmini_core.utils import compute_sha1
+from gitmini import utils
+from gitmini.classes.ObjectStore import (ObjectStore, COMPRESSED_MAGIC, MANIFEST_MAGIC, TYPE_CODES,
+                                         compression_level, chunk_threshold)
+from gitmini.utils import write_config
+from tests.test_helpers import GitMiniTestCase
+
+
+class TestObjectStore(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            Repo.init(self.repo_dir)
+        self.repo = Repo(self.repo_dir)
+        # Force several chunks per object
+        self._chunk_size = utils.CHUNK_SIZE
+        utils.CHUNK_SIZE = 7
+        self.content = b"streamed in many small chunks" * 10
+        with open("big.bin", "wb") as f:
+            f.write(self.content)
+
+    def tearDown(self):
+        utils.CHUNK_SIZE = self._chunk_size
+        super().tearDown()
+
+    def compressed_store(self, level=6):
+        write_config(self.repo, {"compression": level})
+        return ObjectStore(self.repo)
+
+    def test_store_file_writes_raw_object(self):
+        """ Without compression, objects/<sha1> holds the content as is and no temp files are left. """
+        store = ObjectStore(self.repo)
+        sha1 = store.store_file("big.bin")
+        self.assertEqual(sha1, compute_sha1(self.content))
+        self.assertEqual([n for n in os.listdir(self.repo.objects_dir) if n.startswith("tmp_obj_")], [])
+        with open(store.path(sha1), "rb") as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_compressed_roundtrip(self):
+        """ Compressed objects are smaller on disk and read back transparently. """
+        store = self.compressed_store()
+        sha1 = store.store_file("big.bin")
+        self.assertEqual(sha1, compute_sha1(self.content))
+        self.assertTrue(store.is_compressed(sha1))
+        self.assertLess(os.path.getsize(store.path(sha1)), len(self.content))
+        self.assertEqual(store.read(sha1), self.content)
+        self.assertEqual(store.size(sha1), len(self.content))
+        with store.open(sha1) as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_restore(self):
+        store = self.compressed_store()
+        sha1 = store.store_file("big.bin")
+        store.restore(sha1, "restored.bin")
+        with open("restored.bin", "rb") as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_raw_objects_stay_readable(self):
+        """ Objects written before compression was enabled are still read as is. """
+        sha1 = ObjectStore(self.repo).write(b"old object")
+        store = self.compressed_store()
+        self.assertFalse(store.is_compressed(sha1))
+        self.assertEqual(store.read(sha1), b"old object")
+
+    def test_normalize_compresses_raw_object(self):
+        """ Objects written raw by the core classes can be re-encoded in place. """
+        data = b"tree content\n" * 20
+        sha1 = compute_sha1(data)
+        with open(os.path.join(self.repo.objects_dir, sha1), "wb") as f:
+            f.write(data)
+        store = self.compressed_store()
+        store.normalize(sha1)
+        self.assertFalse(os.path.exists(os.path.join(self.repo.objects_dir, sha1)))
+        self.assertTrue(store.is_compressed(sha1))
+        self.assertEqual(store.read(sha1), data)
+
+    def test_content_starting_with_magic_is_compressed(self):
+        """ Raw objects never start with the magic, so the formats cannot be confused. """
+        store = ObjectStore(self.repo)
+        data = COMPRESSED_MAGIC + b"looks compressed"
+        sha1 = store.write(data)
+        self.assertTrue(store.is_compressed(sha1))
+        self.assertEqual(store.read(sha1), data)
+
+    def test_compression_level(self):
+        self.assertIsNone(compression_level({}))
+        self.assertIsNone(compression_level({"compression": False}))
+        self.assertIsNone(compression_level({"compression": 0}))
+        self.assertEqual(compression_level({"compression": True}), zlib.Z_DEFAULT_COMPRESSION)
+        self.assertEqual(compression_level({"compression": 3}), 3)
+        self.assertEqual(compression_level({"compression": 42}), 9)
+
+    def test_objects_are_sharded(self):
+        """ New objects go to objects/<sha[:2]>/<sha[2:]>. """
+        store = ObjectStore(self.repo)
+        sha1 = store.write(b"sharded")
+        self.assertEqual(store.path(sha1), os.path.join(self.repo.objects_dir, sha1[:2], sha1[2:]))
+        self.assertTrue(os.path.isfile(store.path(sha1)))
+
+    def test_flat_objects_are_found_and_migrated(self):
+        """ Objects of the old flat layout stay readable until they are migrated. """
+        sha1 = compute_sha1(b"flat")
+        with open(os.path.join(self.repo.objects_dir, sha1), "wb") as f:
+            f.write(b"flat")
+        store = ObjectStore(self.repo)
+        self.assertTrue(store.exists(sha1))
+        self.assertEqual(store.read(sha1), b"flat")
+
+        self.assertEqual(store.migrate(), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.repo.objects_dir, sha1)))
+        self.assertEqual(store.read(sha1), b"flat")
+        self.assertEqual(store.migrate(), 0)
+
+    def test_normalize_moves_core_objects(self):
+        """ Raw flat objects written by the core classes are moved into place. """
+        sha1 = compute_sha1(b"core tree")
+        with open(os.path.join(self.repo.objects_dir, sha1), "wb") as f:
+            f.write(b"core tree")
+        store = ObjectStore(self.repo)
+        store.normalize(sha1)
+        self.assertEqual(os.listdir(self.repo.objects_dir), [sha1[:2]])
+        self.assertEqual(store.read(sha1), b"core tree")
+
+    def test_packed_objects_are_readable(self):
+        """ Objects only present in a pack are found by every reader. """
+        from gitmini.classes.Pack import PackWriter
+        store = ObjectStore(self.repo)
+        sha1 = compute_sha1(self.content)
+        writer = PackWriter(store.pack_dir)
+        writer.add(sha1, len(self.content), self.content)
+        writer.finish()
+
+        store = ObjectStore(self.repo)
+        self.assertIsNone(store.loose_path(sha1))
+        self.assertTrue(store.exists(sha1))
+        self.assertEqual(store.read(sha1), self.content)
+        self.assertEqual(store.size(sha1), len(self.content))
+        with store.open(sha1) as f:
+            self.assertEqual(f.read(), self.content)
+        store.restore(sha1, "restored.bin")
+        with open("restored.bin", "rb") as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_types_are_recorded(self):
+        """ Types given on write are answered without reading the object. """
+        store = ObjectStore(self.repo)
+        blob = store.store_file("big.bin")
+        tree = store.write(b"tree abc looks like a commit but is a tree\n", "tree")
+        self.assertEqual(store.type(blob), "blob")
+        self.assertEqual(store.type(tree), "tree")
+
+        os.remove(store.path(tree))  # the recorded type needs no object content
+        self.assertEqual(ObjectStore(self.repo).type(tree), "tree")
+
+    def test_untyped_objects_are_sniffed(self):
+        """ Objects written without a type are classified by content once. """
+        store = ObjectStore(self.repo)
+        commit = store.write(b"tree " + b"a" * 40 + b"\n\nmessage")
+        tree = store.write(b"b" * 40 + b" file.txt\n")
+        blob = store.write(b"tree house plans\n")
+        self.assertEqual(store.type(commit), "commit")
+        self.assertEqual(store.type(tree), "tree")
+        self.assertEqual(store.type(blob), "blob")
+        self.assertTrue(os.path.exists(store.types_path))
+        self.assertEqual(ObjectStore(self.repo).type(blob), "blob")
+
+    def test_pack_entries_carry_types(self):
+        from gitmini.classes.Pack import PackWriter
+        from gitmini.classes.ObjectStore import TYPE_CODES
+        store = ObjectStore(self.repo)
+        data = b"b" * 40 + b" file.txt\n"
+        writer = PackWriter(store.pack_dir)
+        writer.add(compute_sha1(data), len(data), data, type_code=TYPE_CODES["tree"])
+        writer.finish()
+        self.assertEqual(ObjectStore(self.repo).type(compute_sha1(data)), "tree")
+
+    def test_resolve_abbreviated_hashes(self):
+        """ Unique prefixes expand; ambiguous ones raise; packed and loose objects both count. """
+        from gitmini.classes.Pack import PackWriter
+        # Two contents whose hashes share their first four digits
+        seen = {}
+        i = 0
+        while True:
+            data = b"object %d" % i
+            sha = compute_sha1(data)
+            if sha[:4] in seen:
+                break
+            seen[sha[:4]] = data
+            i += 1
+        other = seen[sha[:4]]
+
+        store = ObjectStore(self.repo)
+        store.write(data, "blob")
+        writer = PackWriter(store.pack_dir)
+        writer.add(compute_sha1(other), len(other), other, type_code=TYPE_CODES["commit"])
+        writer.finish()
+
+        store = ObjectStore(self.repo)
+        self.assertEqual(store.resolve(sha[:12].upper()), sha)
+        self.assertEqual(store.resolve(sha), sha)
+        with self.assertRaises(ValueError):
+            store.resolve(sha[:4])
+        self.assertEqual(store.resolve(sha[:4], "commit"), compute_sha1(other))
+        self.assertIsNone(store.resolve(sha[:3]))
+        self.assertIsNone(store.resolve("zzzzzzz"))
+        self.assertGreater(len(store.abbreviate(sha, 4)), 4)
+
+    def test_shard_listings_are_cached(self):
+        """ Each fan-out directory is listed once per store; objects it writes or removes later are still seen. """
+        store = ObjectStore(self.repo)
+        shas = [store.write(b"object %d" % i, "blob") for i in range(50)]
+        with mock.patch("gitmini.classes.ObjectStore.os.scandir", wraps=os.scandir) as scandir:
+            for sha in shas:
+                self.assertEqual(store.abbreviate(sha), sha[:7])
+                self.assertEqual(store.resolve(sha[:7]), sha)
+        shards = {sha[:2] for sha in shas}
+        self.assertEqual(scandir.call_count, len(shards) + 1)  # plus the top directory, for the flat layout
+
+        # An object written to a directory that is already listed
+        data = next(b"later %d" % i for i in range(10000) if compute_sha1(b"later %d" % i)[:2] in shards)
+        added = store.write(data, "blob")
+        self.assertEqual(store.resolve(added[:7]), added)
+        store.remove_loose(shas[0])
+        self.assertIsNone(store.resolve(shas[0][:7]))
+
+
+def random_bytes(n, seed=0):
+    return random.Random(seed).getrandbits(8 * n).to_bytes(n, "little")
+
+
+class TestChunkedBlobs(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            Repo.init(self.repo_dir)
+        self.repo = Repo(self.repo_dir)
+        write_config(self.repo, {"chunk_threshold": 1024})
+        self.content = random_bytes(1024 * 1024)
+        with open("model.bin", "wb") as f:
+            f.write(self.content)
+
+    def test_chunked_roundtrip(self):
+        """ Large blobs are stored as a manifest of chunks and read back whole. """
+        store = ObjectStore(self.repo)
+        sha1 = store.store_file("model.bin")
+        self.assertEqual(sha1, compute_sha1(self.content))
+        chunks = store.chunks(sha1)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(sum(size for _, size in chunks), len(self.content))
+        self.assertTrue(all(store.type(chunk_sha) == "chunk" for chunk_sha, _ in chunks))
+        self.assertEqual(store.type(sha1), "blob")
+        self.assertLess(os.path.getsize(store.path(sha1)), 1024)
+
+        self.assertEqual(store.size(sha1), len(self.content))
+        self.assertEqual(store.read(sha1), self.content)
+        with store.open(sha1) as f:
+            self.assertEqual(f.read(), self.content)
+        store.restore(sha1, "restored.bin")
+        with open("restored.bin", "rb") as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_small_blobs_are_not_chunked(self):
+        with open("small.txt", "wb") as f:
+            f.write(b"x" * 100)
+        store = ObjectStore(self.repo)
+        sha1 = store.store_file("small.txt")
+        self.assertIsNone(store.chunks(sha1))
+        self.assertFalse(store.is_chunked(sha1))
+
+    def test_is_chunked_is_recorded(self):
+        """ Chunked blobs are told apart by their type record, without opening them. """
+        store = ObjectStore(self.repo)
+        sha1 = store.store_file("model.bin")
+        store = ObjectStore(self.repo)
+        with mock.patch.object(store, "open", side_effect=AssertionError), \
+                mock.patch.object(store, "manifest", side_effect=AssertionError):
+            self.assertTrue(store.is_chunked(sha1))
+            self.assertEqual(store.type(sha1), "blob")
+
+    def test_versions_share_chunks(self):
+        """ An edit in the middle of a large file only adds the chunks around it. """
+        store = ObjectStore(self.repo)
+        old = store.chunks(store.store_file("model.bin"))
+        edited = self.content[:500000] + b"a small edit" + self.content[500000:]
+        with open("model.bin", "wb") as f:
+            f.write(edited)
+        new_sha = store.store_file("model.bin")
+        new = store.chunks(new_sha)
+        self.assertLessEqual(len(set(new) - set(old)), 2)
+        self.assertEqual(store.read(new_sha), edited)
+
+    def test_chunked_blob_in_pack(self):
+        """ A packed manifest still resolves to the blob's content. """
+        from gitmini.classes.Pack import PackWriter
+        store = ObjectStore(self.repo)
+        sha1 = store.store_file("model.bin")
+        writer = PackWriter(store.pack_dir)
+        writer.add(sha1, store.size(sha1), store.manifest(sha1), chunked=True)
+        writer.finish()
+        os.remove(store.loose_path(sha1))
+        store.forget_types([sha1])
+
+        store = ObjectStore(self.repo)
+        self.assertTrue(store.is_chunked(sha1))
+        self.assertEqual(store.size(sha1), len(self.content))
+        self.assertEqual(store.read(sha1), self.content)
+        with store.open(sha1) as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_content_starting_with_manifest_magic_is_compressed(self):
+        store = ObjectStore(self.repo)
+        data = MANIFEST_MAGIC + b"not a manifest"
+        sha1 = store.write(data)
+        self.assertIsNone(store.chunks(sha1))
+        self.assertEqual(store.read(sha1), data)
+
+    def test_chunk_threshold(self):
+        self.assertIsNone(chunk_threshold({}))
+        self.assertIsNone(chunk_threshold({"chunk_threshold": 0}))
+        self.assertIsNone(chunk_threshold({"chunk_threshold": True}))
+        self.assertEqual(chunk_threshold({"chunk_threshold": 4096}), 4096)
+
+
+class TestParsedObjects(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            Repo.init(self.repo_dir)
+        self.repo = Repo(self.repo_dir)
+        self.store = ObjectStore(self.repo)
+
+    def test_read_commit(self):
+        data = ("tree " + "a" * 40 + "\nparent " + "b" * 40 + "\n"
+                "timestamp 2025-07-17 14:28:50 (unix: 1752776930)\n\nfirst line\n\nsecond\n")
+        commit = self.store.read_commit(self.store.write(data.encode(), "commit"))
+        self.assertEqual(commit.tree, "a" * 40)
+        self.assertEqual(commit.parents, ["b" * 40])
+        self.assertEqual(commit.parent, "b" * 40)
+        self.assertEqual(commit.timestamp, "2025-07-17 14:28:50 (unix: 1752776930)")
+        self.assertEqual(commit.message, "first line\n\nsecond")
+
+    def test_root_commit_has_no_parent(self):
+        sha = self.store.write(("tree " + "a" * 40 + "\n\nroot").encode(), "commit")
+        self.assertIsNone(self.store.read_commit(sha).parent)
+
+    def test_read_tree(self):
+        data = ("a" * 40 + " dir/file with spaces.txt\n" + "b" * 40 + " other.txt\n").encode()
+        tree = self.store.read_tree(self.store.write(data, "tree"))
+        self.assertEqual(tree.entries, {"dir/file with spaces.txt": "a" * 40, "other.txt": "b" * 40})
+
+    def test_parsed_objects_are_cached(self):
+        """ A second read of the same tree does not touch the object file. """
+        sha = self.store.write(("a" * 40 + " file.txt\n").encode(), "tree")
+        first = self.store.read_tree(sha)
+        os.remove(self.store.path(sha))
+        self.assertIs(self.store.read_tree(sha), first)
+
+    def test_cache_is_bounded(self):
+        from gitmini.classes.ObjectStore import _LRUCache
+        cache = _LRUCache(10)
+        for i in range(5):
+            cache.put(i, str(i), 3)
+        self.assertLessEqual(cache.weight, 10)
+        self.assertIsNone(cache.get(0))
+        self.assertEqual(cache.get(4), "4")
+
+    def test_write_tree_nests_directories(self):
+        entries = {"a/b/c.txt": "a" * 40, "a/d.txt": "b" * 40, "e.txt": "c" * 40}
+        root = self.store.write_tree(entries)
+        self.assertEqual(self.store.read_tree(root).entries["e.txt"], "c" * 40)
+        subtree = self.store.read_tree(root).entries["a/"]
+        self.assertEqual(self.store.type(subtree), "tree")
+        self.assertEqual(sorted(self.store.read_tree(subtree).entries), ["b/", "d.txt"])
+        self.assertEqual(self.store.flatten_tree(root), entries)
+        self.assertEqual(self.store.write_tree(dict(reversed(list(entries.items())))), root)
+
+    def test_flat_trees_are_still_read(self):
+        """ Trees from before nesting list full paths and flatten to themselves. """
+        sha = self.store.write(("a" * 40 + " dir/file.txt\n").encode(), "tree")
+        self.assertEqual(self.store.flatten_tree(sha), {"dir/file.txt": "a" * 40})
+
+    def test_diff_trees(self):
+        old = self.store.write_tree({"a/x.txt": "1" * 40, "a/y.txt": "2" * 40, "b/z.txt": "3" * 40, "top.txt": "4" * 40})
+        new = self.store.write_tree({"a/x.txt": "1" * 40, "a/y.txt": "5" * 40, "c/w.txt": "6" * 40, "top.txt": "4" * 40})
+        removed, added = self.store.diff_trees(old, new)
+        self.assertEqual(removed, {"a/y.txt": "2" * 40, "b/z.txt": "3" * 40})
+        self.assertEqual(added, {"a/y.txt": "5" * 40, "c/w.txt": "6" * 40})
+        self.assertEqual(self.store.diff_trees(old, old), ({}, {}))
+        self.assertEqual(self.store.diff_trees(None, new)[1], self.store.flatten_tree(new))
+
+    def test_diff_between_flat_and_nested_trees(self):
+        flat = self.store.write(("1" * 40 + " a/x.txt\n" + "2" * 40 + " a/y.txt\n").encode(), "tree")
+        nested = self.store.write_tree({"a/x.txt": "1" * 40, "a/y.txt": "3" * 40})
+        self.assertEqual(self.store.diff_trees(flat, nested), ({"a/y.txt": "2" * 40}, {"a/y.txt": "3" * 40}))
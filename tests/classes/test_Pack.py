@@ -0,0 +1,102 @@
+import os
+import io
+import hashlib
+import contextlib
+
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.Pack import (Pack, PackWriter, create_delta, apply_delta,
+                                  encode_varint, read_varint)
+from tests.test_helpers import GitMiniTestCase
+
+
+def sha_of(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+class TestDelta(GitMiniTestCase):
+
+    def test_varint_roundtrip(self):
+        for n in (0, 1, 127, 128, 300, 2**32, 2**40 + 5):
+            self.assertEqual(read_varint(encode_varint(n), 0), (n, len(encode_varint(n))))
+
+    def test_delta_roundtrip(self):
+        """ A small edit to a large text produces a small delta that applies back exactly. """
+        base = b"".join(b"line %d of a fairly long source file\n" % i for i in range(2000))
+        target = base.replace(b"line 1000 of", b"edited line 1000 of") + b"appended\n"
+        delta = create_delta(base, target)
+        self.assertLess(len(delta), len(target) // 20)
+        self.assertEqual(apply_delta(base, delta), target)
+
+    def test_delta_of_unrelated_data(self):
+        base = os.urandom(5000)
+        target = os.urandom(3000)
+        self.assertEqual(apply_delta(base, create_delta(base, target)), target)
+
+    def test_delta_of_binary_data(self):
+        """ Data without newlines is chunked at fixed sizes and still deltas well. """
+        base = bytes(range(256)) * 100
+        target = base[:10000] + b"xyz" + base[10000:]
+        delta = create_delta(base, target)
+        self.assertEqual(apply_delta(base, delta), target)
+
+    def test_delta_rejects_wrong_base(self):
+        delta = create_delta(b"a" * 100, b"a" * 120)
+        with self.assertRaises(ValueError):
+            apply_delta(b"b" * 99, delta)
+
+
+class TestPack(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            Repo.init(self.repo_dir)
+        self.pack_dir = os.path.join(Repo(self.repo_dir).objects_dir, "pack")
+
+    def test_write_and_read(self):
+        """ Full and delta entries are found by hash and read back. """
+        base = b"".join(b"row %d\n" % i for i in range(500))
+        target = base + b"one more row\n"
+        other = b"unrelated object"
+
+        writer = PackWriter(self.pack_dir)
+        writer.add(sha_of(base), len(base), base)
+        writer.add(sha_of(target), len(target), create_delta(base, target), base=sha_of(base))
+        writer.add(sha_of(other), len(other), other)
+        idx_path = writer.finish()
+
+        pack = Pack(idx_path)
+        self.assertEqual(pack.count, 3)
+        self.assertEqual(pack.read(sha_of(base)), base)
+        self.assertEqual(pack.read(sha_of(target)), target)
+        self.assertEqual(pack.read(sha_of(other)), other)
+        self.assertEqual(pack.size(sha_of(target)), len(target))
+        self.assertIsNone(pack.find("0" * 40))
+        self.assertIsNone(pack.find("not-a-hash"))
+        self.assertEqual(list(pack.shas()), sorted(sha_of(d) for d in (base, target, other)))
+        self.assertEqual([n for n in os.listdir(self.pack_dir) if n.startswith("tmp_")], [])
+
+    def test_lookup_across_many_objects(self):
+        """ The fanout table and binary search find every object. """
+        writer = PackWriter(self.pack_dir)
+        objects = [b"object %d" % i for i in range(1000)]
+        for data in objects:
+            writer.add(sha_of(data), len(data), data)
+        pack = Pack(writer.finish())
+        for data in objects:
+            self.assertEqual(pack.read(sha_of(data)), data)
+
+    def test_find_prefix(self):
+        """ Prefixes of any length find the hashes that start with them, in order. """
+        writer = PackWriter(self.pack_dir)
+        shas = sorted(sha_of(b"object %d" % i) for i in range(1000))
+        for i in range(1000):
+            writer.add(sha_of(b"object %d" % i), 1, b"x")
+        pack = Pack(writer.finish())
+        for sha in shas[::50]:
+            for length in (4, 5, 8, 40):
+                expected = [s for s in shas if s.startswith(sha[:length])]
+                self.assertEqual(pack.find_prefix(sha[:length]), expected)
+        self.assertEqual(pack.find_prefix(shas[0][:2], limit=1), shas[:1])
+        self.assertEqual(pack.find_prefix("ffffffffff"), [])
@@ -0,0 +1,63 @@
+import io
+import os
+import contextlib
+
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.SparseCheckout import SparseCheckout
+from gitmini.classes.LockFile import LockFile, LockError
+from tests.test_helpers import GitMiniTestCase
+
+
+class TestSparseCheckout(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            Repo.init(self.repo_dir)
+        self.repo = Repo(self.repo_dir)
+
+    def _sparse(self, patterns):
+        SparseCheckout(self.repo).write(patterns)
+        return SparseCheckout(self.repo)
+
+    def test_everything_included_without_patterns(self):
+        """ Sparse checkout is off until patterns are written. """
+        sparse = SparseCheckout(self.repo)
+        self.assertFalse(sparse.enabled)
+        self.assertTrue(sparse.includes("any/path.txt"))
+
+    def test_directory_patterns_include_their_contents(self):
+        """ 'dir/' selects the whole subtree; anything unmatched is excluded. """
+        sparse = self._sparse(["/services/billing/", "README.md"])
+        self.assertTrue(sparse.enabled)
+        self.assertTrue(sparse.includes("services/billing/main.py"))
+        self.assertTrue(sparse.includes("services/billing/deep/er/x.py"))
+        self.assertTrue(sparse.includes("README.md"))
+        self.assertTrue(sparse.includes("docs/README.md"))
+        self.assertFalse(sparse.includes("services/search/main.py"))
+        self.assertFalse(sparse.includes("setup.py"))
+
+    def test_exclusions_and_reinclusions(self):
+        """ '!pattern' carves paths out again; the closest match decides. """
+        sparse = self._sparse(["/src/", "!/src/assets/", "/src/assets/logo.svg", "!*.bin"])
+        self.assertTrue(sparse.includes("src/app.py"))
+        self.assertFalse(sparse.includes("src/assets/video.mp4"))
+        self.assertTrue(sparse.includes("src/assets/logo.svg"))
+        self.assertFalse(sparse.includes("src/model.bin"))
+
+    def test_disable_removes_the_file(self):
+        """ Writing no patterns turns sparse checkout off. """
+        self._sparse(["/a/"])
+        sparse = self._sparse([])
+        self.assertFalse(sparse.enabled)
+        self.assertFalse(os.path.exists(sparse.path))
+
+    def test_disable_waits_for_the_lock(self):
+        """ Removing the file takes the same lock as writing it. """
+        sparse = self._sparse(["/a/"])
+        with LockFile(sparse.path):
+            with self.assertRaises(LockError):
+                sparse.write([])
+        self.assertEqual(SparseCheckout(self.repo).patterns, ["/a/"])
+        self.assertFalse(os.path.exists(sparse.path + ".lock"))
@@ -1,5 +1,7 @@
 import os
 from gitmini_core.utils import compute_sha1
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.Index import Index
 from tests.test_helpers import GitMiniTestCase, GITMINI_DIR
 
 
@@ -9,6 +11,13 @@ class TestAdd(GitMiniTestCase):
         super().setUp()
         self.run_gitmini(['init'])
 
+    def staged(self):
+        """ Returns the index as a path → hash dict. """
+        index = Index(Repo(self.repo_dir))
+        entries = dict(index.entries)
+        index.close()
+        return entries
+
     def test_help(self):
         """ Test that 'gitmini add --help'  print usage info. """
         result = self.run_gitmini(['add', '--help'])
@@ -24,12 +33,10 @@ class TestAdd(GitMiniTestCase):
         self.run_gitmini(['add', filename])
 
         expected_hash = compute_sha1(content)
-        blob_path = os.path.join(GITMINI_DIR, 'objects', expected_hash)
+        blob_path = os.path.join(GITMINI_DIR, 'objects', expected_hash[:2], expected_hash[2:])
         self.assertTrue(os.path.exists(blob_path))
 
-        with open(os.path.join(GITMINI_DIR, 'index'), 'r') as f:
-            index_content = f.read()
-        self.assertIn(f'{expected_hash} {filename}', index_content)
+        self.assertEqual(self.staged().get(filename), expected_hash)
 
     def test_add_dot_stages_all_files(self):
         """ Adding '.' stages all files in CWD """
@@ -43,10 +50,7 @@ class TestAdd(GitMiniTestCase):
 
         self.run_gitmini(['add', '.'])
 
-        with open(os.path.join(GITMINI_DIR, 'index'), 'r') as f:
-            lines = f.read().splitlines()
-
-        indexed_paths = [line.split(" ", 1)[1] for line in lines]
+        indexed_paths = list(self.staged())
 
         self.assertIn('a.txt', indexed_paths)
         self.assertIn('b.txt', indexed_paths)
@@ -65,9 +69,7 @@ class TestAdd(GitMiniTestCase):
         self.run_gitmini(['add', '.'])
         os.chdir('..')
 
-        with open(os.path.join(GITMINI_DIR, 'index'), 'r') as f:
-            lines = f.read().splitlines()
-        paths = [line.split(" ", 1)[1] for line in lines]
+        paths = list(self.staged())
 
         self.assertIn(os.path.normpath('nested/file1.txt'), map(os.path.normpath, paths))
         self.assertIn(os.path.normpath('nested/inner/file2.txt'), map(os.path.normpath, paths))
@@ -81,10 +83,7 @@ class TestAdd(GitMiniTestCase):
 
         self.run_gitmini(['add', '.'])
 
-        with open(os.path.join(GITMINI_DIR, 'index'), 'r') as f:
-            index_data = f.read()
-
-        self.assertNotIn('internal/temp.txt', index_data)
+        self.assertFalse(any('temp.txt' in path for path in self.staged()))
 
     def test_gitmini_ignore_excludes_files(self):
         """ Check that .gitmini-ignore works """
@@ -100,8 +99,7 @@ class TestAdd(GitMiniTestCase):
 
         self.run_gitmini(['add', '.'])
 
-        with open(os.path.join(GITMINI_DIR, 'index'), 'r') as f:
-            staged = f.read()
+        staged = self.staged()
 
         self.assertIn('include.txt', staged)
         self.assertNotIn('ignored.txt', staged)
@@ -115,10 +113,7 @@ class TestAdd(GitMiniTestCase):
         self.run_gitmini(['add', 'dup.txt'])
         self.run_gitmini(['add', 'dup.txt'])
 
-        with open(os.path.join(GITMINI_DIR, 'index'), 'r') as f:
-            lines = f.read().splitlines()
-
-        matches = [line for line in lines if 'dup.txt' in line]
+        matches = [path for path in self.staged() if 'dup.txt' in path]
         self.assertEqual(len(matches), 1)
 
     def test_add_nonexistent_file_fails(self):
@@ -127,7 +122,94 @@ class TestAdd(GitMiniTestCase):
         self.assertEqual(result.returncode, 0)
         self.assertIn("did not match any files", result.stderr.lower())
 
-        with open(os.path.join(GITMINI_DIR, 'index'), 'r') as f:
-            index_data = f.read()
-        self.assertNotIn('nope.txt', index_data)
+        self.assertNotIn('nope.txt', self.staged())
+
+
+    def test_readding_unchanged_files_uses_stat_cache(self):
+        """ Stat data is recorded on add, so a second add finds nothing to do. """
+        with open('a.txt', 'w') as f:
+            f.write('A')
+
+        self.run_gitmini(['add', '.'])
+
+        result = self.run_gitmini(['add', '.'])
+        self.assertIn('nothing to add', result.stdout)
+
+    def test_modified_file_is_restaged(self):
+        """ A modified file is picked up even when its size is unchanged. """
+        with open('a.txt', 'w') as f:
+            f.write('A')
+        self.run_gitmini(['add', '.'])
+
+        with open('a.txt', 'w') as f:
+            f.write('B')
+        self.run_gitmini(['add', '.'])
+
+        self.assertEqual(self.staged()['a.txt'], compute_sha1(b'B'))
+
+    def test_parallel_add_stages_all_files(self):
+        """ 'add --jobs' stages the same files as a serial add. """
+        os.makedirs('many', exist_ok=True)
+        for i in range(100):
+            with open(os.path.join('many', f'f{i:03}.txt'), 'w') as f:
+                f.write(f'content {i}')
 
+        result = self.run_gitmini(['add', '--jobs', '4', '.'])
+
+        added = [line for line in result.stdout.splitlines() if line.startswith('added: ')]
+        self.assertEqual(len(added), 100)
+        self.assertEqual(added, sorted(added))  # output follows the sorted walk
+
+        staged = self.staged()
+        for i in range(100):
+            self.assertEqual(staged[os.path.join('many', f'f{i:03}.txt')], compute_sha1(f'content {i}'.encode()))
+
+    def test_ignored_directories_are_skipped(self):
+        """ Files under an ignored directory are never staged. """
+        with open('.gitmini-ignore', 'w') as f:
+            f.write('node_modules/\n')
+        os.makedirs(os.path.join('node_modules', 'pkg'), exist_ok=True)
+        with open(os.path.join('node_modules', 'pkg', 'index.js'), 'w') as f:
+            f.write('skip me')
+        with open('app.js', 'w') as f:
+            f.write('keep me')
+
+        self.run_gitmini(['add', '.'])
+        self.run_gitmini(['add', 'node_modules'])
+
+        staged = self.staged()
+        self.assertIn('app.js', staged)
+        self.assertNotIn(os.path.join('node_modules', 'pkg', 'index.js'), staged)
+
+    def test_locked_index_fails_fast(self):
+        """ 'add' gives up on an index locked by another process; 'status' still works. """
+        with open("file.txt", "w") as f:
+            f.write("content")
+        lock_path = os.path.join(GITMINI_DIR, "index.lock")
+        open(lock_path, "w").close()
+        result = self.run_gitmini(["add", "."])
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("index.lock", result.stderr)
+        self.assertEqual(self.staged(), {})
+        self.assertEqual(self.run_gitmini(["status", "--porcelain"]).returncode, 0)
+
+        os.remove(lock_path)
+        self.assertEqual(self.run_gitmini(["add", "."]).returncode, 0)
+        self.assertFalse(os.path.exists(lock_path))
+
+    def test_concurrent_adds_keep_every_file(self):
+        """ Parallel 'add' runs are serialized by the index lock, so no update is lost. """
+        import subprocess
+        import sys
+        names = [f"file{i}.txt" for i in range(4)]
+        for name in names:
+            with open(name, "w") as f:
+                f.write(name)
+        env = os.environ.copy()
+        env["PYTHONPATH"] = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")) \
+            + os.pathsep + env.get("PYTHONPATH", "")
+        procs = [subprocess.Popen([sys.executable, "-m", "gitmini", "add", name], cwd=self.repo_dir, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for name in names]
+        for proc in procs:
+            self.assertEqual(proc.wait(), 0)
+        self.assertEqual(sorted(self.staged()), names)
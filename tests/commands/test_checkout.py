@@ -4,6 +4,7 @@ Test the 'gitmini checkout' command for switching branches and commits, includin
 
 import os
 import unittest
+from gitmini.classes.ObjectStore import running_as_root
 from tests.test_helpers import GitMiniTestCase, GITMINI_DIR
 
 class TestCheckoutCommand(GitMiniTestCase):
@@ -45,7 +46,318 @@ class TestCheckoutCommand(GitMiniTestCase):
         result = self.run_gitmini(["checkout", commit_hash])
         self.assertIn("detached HEAD", result.stdout)
 
+    @unittest.skipIf(running_as_root(), "root is not stopped by read-only modes, so hardlink is not used")
+    def test_checkout_hardlink(self):
+        """ --link hardlink shares inodes with the objects, read-only, and never writes through them. """
+        from gitmini_core.classes.Repo import Repo
+        from gitmini.classes.ObjectStore import ObjectStore
+        self.run_gitmini(["init"])
+        with open("file.txt", "w") as f:
+            f.write("version 1")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "v1"])
+        self.run_gitmini(["branch", "dev"])
+        with open("file.txt", "w") as f:
+            f.write("version 2")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "v2"])
+        self.run_gitmini(["branch", "feature"])
+
+        result = self.run_gitmini(["checkout", "--link", "hardlink", "dev"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        store = ObjectStore(Repo(self.repo_dir))
+        v1 = store.path(store.write(b"version 1"))
+        self.assertTrue(os.path.samefile("file.txt", v1))
+        self.assertFalse(os.stat("file.txt").st_mode & 0o222)
+
+        result = self.run_gitmini(["checkout", "--link", "hardlink", "feature"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with open("file.txt") as f:
+            self.assertEqual(f.read(), "version 2")
+        with open(v1) as f:
+            self.assertEqual(f.read(), "version 1")
+
+    @unittest.skipUnless(running_as_root(), "needs root")
+    def test_checkout_hardlink_as_root(self):
+        """ As root, --link hardlink does not link files into the store, which root could write through. """
+        from gitmini_core.classes.Repo import Repo
+        from gitmini.classes.ObjectStore import ObjectStore
+        self.run_gitmini(["init"])
+        with open("file.txt", "w") as f:
+            f.write("version 1")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "v1"])
+        self.run_gitmini(["branch", "dev"])
+        with open("file.txt", "w") as f:
+            f.write("version 2")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "v2"])
+
+        result = self.run_gitmini(["checkout", "--link", "hardlink", "dev"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("warning: not hard-linking", result.stderr)
+        store = ObjectStore(Repo(self.repo_dir))
+        v1 = store.path(store.write(b"version 1"))
+        self.assertFalse(os.path.samefile("file.txt", v1))
+        with open("file.txt", "w") as f:
+            f.write("edited")
+        with open(v1) as f:
+            self.assertEqual(f.read(), "version 1")
+
+    def test_checkout_reflink_falls_back_to_copy(self):
+        """ Where the file system cannot clone, --link reflink copies. """
+        self.run_gitmini(["init"])
+        with open("file.txt", "w") as f:
+            f.write("original")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "init commit"])
+        self.run_gitmini(["branch", "dev"])
+        os.remove("file.txt")
+        result = self.run_gitmini(["checkout", "--force", "--link", "reflink", "dev"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with open("file.txt") as f:
+            self.assertEqual(f.read(), "original")
+
+    def test_checkout_only_touches_changed_files(self):
+        """ Files identical in both branches keep their inode and mtime. """
+        self.run_gitmini(["init"])
+        os.makedirs("lib")
+        for name in ("same.txt", "lib/same.txt", "changed.txt", "removed.txt"):
+            with open(name, "w") as f:
+                f.write(name)
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "base"])
+        self.run_gitmini(["branch", "base"])
+
+        with open("changed.txt", "w") as f:
+            f.write("changed on feature")
+        os.remove("removed.txt")
+        with open("lib/added.txt", "w") as f:
+            f.write("added")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "feature"])
+
+        before = {p: os.stat(p) for p in ("same.txt", "lib/same.txt")}
+        result = self.run_gitmini(["checkout", "base"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        for path, st in before.items():
+            after = os.stat(path)
+            self.assertEqual((after.st_ino, after.st_mtime_ns), (st.st_ino, st.st_mtime_ns))
+        with open("changed.txt") as f:
+            self.assertEqual(f.read(), "changed.txt")
+        self.assertTrue(os.path.exists("removed.txt"))
+        self.assertFalse(os.path.exists("lib/added.txt"))
+
+        status = self.run_gitmini(["status", "--porcelain"])
+        self.assertEqual(status.stdout.strip(), "")
+
+    def test_force_checkout_resets_modified_files(self):
+        """ --force also restores files that only differ from the index. """
+        self.run_gitmini(["init"])
+        with open("file.txt", "w") as f:
+            f.write("committed")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "init commit"])
+        self.run_gitmini(["branch", "dev"])
+        with open("file.txt", "w") as f:
+            f.write("local edit")
+        self.run_gitmini(["add", "."])
+
+        result = self.run_gitmini(["checkout", "--force", "dev"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with open("file.txt") as f:
+            self.assertEqual(f.read(), "committed")
+
+    def test_parallel_checkout(self):
+        self.run_gitmini(["init"])
+        with open("base.txt", "w") as f:
+            f.write("base")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "base"])
+        self.run_gitmini(["branch", "base"])
+        for i in range(100):
+            os.makedirs(f"dir{i % 7}", exist_ok=True)
+            with open(f"dir{i % 7}/file{i}.txt", "w") as f:
+                f.write(f"content {i}")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "many"])
+        self.run_gitmini(["branch", "many"])
+
+        self.run_gitmini(["checkout", "base"])
+        self.assertFalse(os.path.exists("dir0"))
+        result = self.run_gitmini(["checkout", "--jobs", "4", "many"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        for i in range(100):
+            with open(f"dir{i % 7}/file{i}.txt") as f:
+                self.assertEqual(f.read(), f"content {i}")
+        self.assertEqual(self.run_gitmini(["status", "--porcelain"]).stdout.strip(), "")
+
+    def test_failed_checkout_leaves_head_and_index(self):
+        """ Files that cannot be written are reported, and HEAD and the index stay as they were. """
+        self.run_gitmini(["init"])
+        with open("base.txt", "w") as f:
+            f.write("base")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "base"])
+        self.run_gitmini(["branch", "base"])
+        os.makedirs("sub")
+        with open("sub/file.txt", "w") as f:
+            f.write("nested")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "nested"])
+        self.run_gitmini(["branch", "nested"])
+        self.run_gitmini(["checkout", "base"])
+
+        with open("sub", "w") as f:
+            f.write("an untracked file in the way")
+        head_file = os.path.join(GITMINI_DIR, "HEAD")
+        with open(head_file) as f:
+            head_before = f.read()
+        with open(os.path.join(GITMINI_DIR, "index"), "rb") as f:
+            index_before = f.read()
+
+        result = self.run_gitmini(["checkout", "nested"])
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("unable to write sub/file.txt", result.stderr)
+        with open(head_file) as f:
+            self.assertEqual(f.read(), head_before)
+        with open(os.path.join(GITMINI_DIR, "index"), "rb") as f:
+            self.assertEqual(f.read(), index_before)
+
     def extract_commit_hash(self, stdout):
         for line in stdout.splitlines():
             if "Commit object written to:" in line:
-                return os.path.basename(line.split(":")[-1].strip())
+                obj_path = line.split(":")[-1].strip()
+                # objects/<sha[:2]>/<sha[2:]>
+                return os.path.basename(os.path.dirname(obj_path)) + os.path.basename(obj_path)
+
+    def test_sparse_checkout_writes_only_selected_paths(self):
+        """ Paths outside the sparse-checkout patterns stay out of the working tree but in commits. """
+        self.run_gitmini(["init"])
+        for path in ("team_a/app.py", "team_b/app.py", "README.md"):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w") as f:
+                f.write(path)
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "base"])
+        self.run_gitmini(["branch", "base"])
+
+        result = self.run_gitmini(["sparse-checkout", "set", "/team_a/"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertTrue(os.path.exists("team_a/app.py"))
+        self.assertFalse(os.path.exists("team_b"))
+        self.assertFalse(os.path.exists("README.md"))
+        self.assertEqual(self.run_gitmini(["status", "--porcelain"]).stdout, "")
+
+        # Changes in the slice commit normally; the rest of the tree is kept
+        with open("team_a/app.py", "w") as f:
+            f.write("changed")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "team a change"])
+        self.run_gitmini(["branch", "changed"])
+
+        result = self.run_gitmini(["checkout", "base"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with open("team_a/app.py") as f:
+            self.assertEqual(f.read(), "team_a/app.py")
+        self.assertFalse(os.path.exists("team_b"))
+
+        result = self.run_gitmini(["sparse-checkout", "disable"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.run_gitmini(["checkout", "changed"])
+        for path, content in (("team_a/app.py", "changed"), ("team_b/app.py", "team_b/app.py"), ("README.md", "README.md")):
+            with open(path) as f:
+                self.assertEqual(f.read(), content)
+
+    def test_unstaged_edit_blocks_checkout_of_that_file(self):
+        """ Unstaged edits to files the checkout would rewrite are refused; others are carried over. """
+        self.run_gitmini(["init"])
+        for name in ("shared.txt", "notes.txt"):
+            with open(name, "w") as f:
+                f.write("v1")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "v1"])
+        self.run_gitmini(["branch", "old"])
+        with open("shared.txt", "w") as f:
+            f.write("v2")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "v2"])
+        self.run_gitmini(["branch", "new"])
+
+        with open("shared.txt", "w") as f:
+            f.write("local edit")
+        result = self.run_gitmini(["checkout", "old"])
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("shared.txt", result.stdout)
+        with open("shared.txt") as f:
+            self.assertEqual(f.read(), "local edit")
+
+        with open("shared.txt", "w") as f:
+            f.write("v2")
+        with open("notes.txt", "w") as f:
+            f.write("local notes")
+        result = self.run_gitmini(["checkout", "old"])
+        self.assertEqual(result.returncode, 0, result.stdout)
+        with open("shared.txt") as f:
+            self.assertEqual(f.read(), "v1")
+        with open("notes.txt") as f:
+            self.assertEqual(f.read(), "local notes")
+        self.assertEqual(self.run_gitmini(["status", "--porcelain"]).stdout, " M notes.txt\n")
+
+    def test_untracked_file_in_the_way_blocks_checkout(self):
+        """ An untracked file at a path the target branch adds is not overwritten. """
+        self.run_gitmini(["init"])
+        with open("a.txt", "w") as f:
+            f.write("a")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "a"])
+        self.run_gitmini(["branch", "small"])
+        with open("b.txt", "w") as f:
+            f.write("b")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "b"])
+        self.run_gitmini(["branch", "big"])
+        self.run_gitmini(["checkout", "small"])
+
+        with open("b.txt", "w") as f:
+            f.write("mine")
+        result = self.run_gitmini(["checkout", "big"])
+        self.assertEqual(result.returncode, 1)
+        with open("b.txt") as f:
+            self.assertEqual(f.read(), "mine")
+
+    def test_checkout_between_directory_and_file(self):
+        """ A tracked directory can be replaced by a file at the same path, and back. """
+        import shutil
+        self.run_gitmini(["init"])
+        os.makedirs("a")
+        with open(os.path.join("a", "b"), "w") as f:
+            f.write("nested")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "directory"])
+        self.run_gitmini(["branch", "nested"])
+        shutil.rmtree("a")
+        with open("a", "w") as f:
+            f.write("flat")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "file"])
+        self.run_gitmini(["branch", "flat"])
+
+        result = self.run_gitmini(["checkout", "nested"])
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        with open(os.path.join("a", "b")) as f:
+            self.assertEqual(f.read(), "nested")
+
+        result = self.run_gitmini(["checkout", "flat"])
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        with open("a") as f:
+            self.assertEqual(f.read(), "flat")
+        self.assertEqual(self.run_gitmini(["status", "--porcelain"]).stdout, "")
+
+        # An untracked file inside the directory still blocks the switch
+        self.run_gitmini(["checkout", "nested"])
+        with open(os.path.join("a", "mine.txt"), "w") as f:
+            f.write("mine")
+        result = self.run_gitmini(["checkout", "flat"])
+        self.assertEqual(result.returncode, 1)
+        self.assertTrue(os.path.isfile(os.path.join("a", "mine.txt")))
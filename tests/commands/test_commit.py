@@ -3,6 +3,7 @@ import unittest
 from tests.test_helpers import GitMiniTestCase, GITMINI_DIR
 from gitmini_core.classes.HEAD import HEAD
 from gitmini_core.classes.Repo import Repo
+from gitmini.classes.ObjectStore import ObjectStore
 
 class TestCommit(GitMiniTestCase):
     """ Ensure committing updates HEAD correctly. """
@@ -20,3 +21,114 @@ class TestCommit(GitMiniTestCase):
         head_val = head.get_commit()
         self.assertIsNotNone(head_val)
         self.assertEqual(len(head_val), 40)
+
+    def test_commit_with_compression(self):
+        """ With compression on, objects are stored compressed and still readable. """
+        self.run_gitmini(["init"])
+        self.run_gitmini(["config", "compression", "6"])
+        with open("file.txt", "w") as f:
+            f.write("compress me " * 100)
+
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "compressed"])
+
+        repo = Repo(self.repo_dir)
+        store = ObjectStore(repo)
+        commit_hash = HEAD(repo).get_commit()
+        self.assertTrue(store.is_compressed(commit_hash))
+        self.assertIn(b"compressed", store.read(commit_hash))
+
+        log = self.run_gitmini(["log"])
+        self.assertIn(commit_hash, log.stdout)
+        self.assertIn("compressed", log.stdout)
+
+    def test_commit_writes_one_tree_per_directory(self):
+        """ A change in one directory reuses the trees of the others. """
+        self.run_gitmini(["init"])
+        os.makedirs("src/lib")
+        os.makedirs("docs")
+        for path in ("src/lib/a.txt", "src/main.txt", "docs/readme.txt", "top.txt"):
+            with open(path, "w") as f:
+                f.write(path)
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "first"])
+
+        repo = Repo(self.repo_dir)
+        store = ObjectStore(repo)
+        first_tree = store.read_commit(HEAD(repo).get_commit()).tree
+        self.assertEqual(sorted(store.read_tree(first_tree).entries), ["docs/", "src/", "top.txt"])
+
+        with open("src/lib/a.txt", "w") as f:
+            f.write("changed")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "second"])
+
+        store = ObjectStore(repo)
+        second_tree = store.read_commit(HEAD(repo).get_commit()).tree
+        first, second = store.read_tree(first_tree).entries, store.read_tree(second_tree).entries
+        self.assertEqual(first["docs/"], second["docs/"])
+        self.assertNotEqual(first["src/"], second["src/"])
+        self.assertEqual(store.flatten_tree(second_tree)["src/lib/a.txt"], store.write(b"changed"))
+
+    def test_commit_updates_commit_graph(self):
+        """ Each commit is added to the commit-graph with its parent. """
+        from gitmini.classes.CommitGraph import CommitGraph
+        self.run_gitmini(["init"])
+        hashes = []
+        for i in range(3):
+            with open("file.txt", "w") as f:
+                f.write(str(i))
+            self.run_gitmini(["add", "."])
+            self.run_gitmini(["commit", "-m", str(i)])
+            hashes.append(HEAD(Repo(self.repo_dir)).get_commit())
+
+        repo = Repo(self.repo_dir)
+        graph = CommitGraph(repo, ObjectStore(repo))
+        self.assertEqual(graph.get(hashes[2]).parent, hashes[1])
+        self.assertEqual(graph.get(hashes[2]).generation, 3)
+        self.assertIn(hashes[0], graph)
+
+    def test_nothing_to_commit_on_flat_parent_tree(self):
+        """ An index matching a legacy flat parent tree has nothing to commit. """
+        from gitmini_core.classes.Commit import Commit
+        from gitmini.classes.Refs import Refs
+        self.run_gitmini(["init"])
+        os.makedirs("src")
+        for path in ("src/a.txt", "top.txt"):
+            with open(path, "w") as f:
+                f.write(path)
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "first"])
+
+        repo = Repo(self.repo_dir)
+        store = ObjectStore(repo)
+        parent = HEAD(repo).get_commit()
+        files = store.flatten_tree(store.read_commit(parent).tree)
+        flat_tree = store.write("".join(f"{sha} {path}\n" for path, sha in sorted(files.items())).encode(), "tree")
+        commit_hash = Commit(repo, flat_tree, parent, "flat").write()
+        store.normalize(commit_hash, "commit")
+        Refs(repo).update_head(commit_hash)
+
+        result = self.run_gitmini(["commit", "-m", "again"])
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("nothing to commit", result.stdout)
+        self.assertEqual(HEAD(Repo(self.repo_dir)).get_commit(), commit_hash)
+
+    def test_commit_succeeds_while_commit_graph_is_locked(self):
+        """ A busy commit-graph is skipped; the commit and the index are still written. """
+        from gitmini.classes.CommitGraph import CommitGraph
+        from gitmini.classes.LockFile import LockFile
+        self.run_gitmini(["init"])
+        with open("file.txt", "w") as f:
+            f.write("test")
+        self.run_gitmini(["add", "."])
+
+        repo = Repo(self.repo_dir)
+        chain_path = CommitGraph(repo, ObjectStore(repo)).chain_path
+        os.makedirs(os.path.dirname(chain_path), exist_ok=True)
+        with LockFile(chain_path):
+            result = self.run_gitmini(["commit", "-m", "first"])
+        self.assertEqual(result.returncode, 0)
+        self.assertNotIn("fatal", result.stderr)
+        self.assertIsNotNone(HEAD(Repo(self.repo_dir)).get_commit())
+        self.assertIn("nothing to commit", self.run_gitmini(["status"]).stdout)
@@ -0,0 +1,44 @@
+import os
+import json
+from tests.test_helpers import GitMiniTestCase, GITMINI_DIR
+
+
+class TestConfig(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.run_gitmini(['init'])
+
+    def test_set_and_get_value(self):
+        """ 'gitmini config <key> <value>' stores typed values in config.json. """
+        self.run_gitmini(['config', 'fsmonitor', 'true'])
+        self.run_gitmini(['config', 'level', '6'])
+
+        with open(os.path.join(GITMINI_DIR, 'config.json')) as f:
+            config = json.load(f)
+        self.assertIs(config['fsmonitor'], True)
+        self.assertEqual(config['level'], 6)
+
+        result = self.run_gitmini(['config', 'fsmonitor'])
+        self.assertEqual(result.stdout.strip(), 'true')
+
+    def test_missing_key_fails(self):
+        """ Reading an unset key exits non-zero. """
+        result = self.run_gitmini(['config', 'nope'])
+        self.assertNotEqual(result.returncode, 0)
+
+    def test_concurrent_sets_keep_every_key(self):
+        """ Parallel 'config' runs each re-read the file under its lock, so no setting is lost. """
+        import subprocess
+        import sys
+        keys = [f"key{i}" for i in range(4)]
+        env = os.environ.copy()
+        env["PYTHONPATH"] = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")) \
+            + os.pathsep + env.get("PYTHONPATH", "")
+        procs = [subprocess.Popen([sys.executable, "-m", "gitmini", "config", key, "1"], cwd=self.repo_dir, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for key in keys]
+        for proc in procs:
+            self.assertEqual(proc.wait(), 0)
+        with open(os.path.join(GITMINI_DIR, 'config.json')) as f:
+            config = json.load(f)
+        self.assertTrue(all(config.get(key) == 1 for key in keys))
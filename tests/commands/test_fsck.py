@@ -0,0 +1,75 @@
+import os
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.ObjectStore import ObjectStore
+from tests.test_helpers import GitMiniTestCase
+
+
+class TestFsck(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.run_gitmini(['init'])
+        os.makedirs('src')
+        with open('src/main.txt', 'w') as f:
+            f.write('main')
+        with open('readme.txt', 'w') as f:
+            f.write('readme')
+        self.run_gitmini(['add', '.'])
+        self.run_gitmini(['commit', '-m', 'first'])
+        self.store = ObjectStore(Repo(self.repo_dir))
+
+    def test_clean_repository(self):
+        result = self.run_gitmini(['fsck'])
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.assertEqual(result.stdout, '')
+
+    def test_corrupt_object(self):
+        path = self.store.path(self.store.write(b'readme'))
+        with open(path, 'wb') as f:
+            f.write(b'bit rot')
+        result = self.run_gitmini(['fsck'])
+        self.assertEqual(result.returncode, 1)
+        self.assertIn(f'corrupt object {self.store.write(b"readme")}', result.stdout)
+
+    def test_missing_object(self):
+        blob = self.store.write(b'main')
+        os.remove(self.store.path(blob))
+        result = self.run_gitmini(['fsck'])
+        self.assertEqual(result.returncode, 1)
+        self.assertIn(f'missing blob {blob}', result.stdout)
+
+    def test_dangling_object(self):
+        """ Objects no ref reaches are reported but are not an error. """
+        with open('draft.txt', 'w') as f:
+            f.write('never committed')
+        self.run_gitmini(['add', '.'])
+        result = self.run_gitmini(['fsck'])
+        self.assertEqual(result.returncode, 0, result.stdout)
+        self.assertIn(f'dangling blob {self.store.write(b"never committed")}', result.stdout)
+
+    def test_parallel_verification(self):
+        for i in range(300):
+            with open(f'file{i}.txt', 'w') as f:
+                f.write(f'content {i}')
+        self.run_gitmini(['add', '.'])
+        self.run_gitmini(['commit', '-m', 'many'])
+        bad = self.store.write(b'content 150')
+        with open(self.store.path(bad), 'wb') as f:
+            f.write(b'content 151')
+
+        result = self.run_gitmini(['fsck', '--jobs', '4'])
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.stdout.splitlines(), [f'corrupt object {bad}: content hashes to {self.store.write(b"content 151")}'])
+
+    def test_packs_are_verified(self):
+        self.run_gitmini(['repack'])
+        self.assertEqual(self.run_gitmini(['fsck']).returncode, 0)
+        pack_path = ObjectStore(Repo(self.repo_dir)).packs[0].pack_path
+        with open(pack_path, 'r+b') as f:
+            f.seek(20)
+            byte = f.read(1)
+            f.seek(20)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        result = self.run_gitmini(['fsck'])
+        self.assertEqual(result.returncode, 1)
+        self.assertIn('pack checksum mismatch', result.stdout)
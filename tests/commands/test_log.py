@@ -27,3 +27,25 @@ class TestLogCommand(GitMiniTestCase):
         result = self.run_gitmini(["log"])
         self.assertIn("first", result.stdout)
         self.assertIn("second", result.stdout)
+
+    def test_log_oneline_and_short_hash_checkout(self):
+        """ 'log --oneline' prints abbreviated hashes that checkout accepts. """
+        self.run_gitmini(["init"])
+        with open("file.txt", "w") as out:
+            out.write("one")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "first\n\nbody"])
+        with open("file.txt", "w") as out:
+            out.write("two")
+        self.run_gitmini(["add", "."])
+        self.run_gitmini(["commit", "-m", "second"])
+
+        lines = self.run_gitmini(["log", "--oneline"]).stdout.splitlines()
+        self.assertEqual([line.split(" ", 1)[1] for line in lines], ["second", "first"])
+        short = lines[1].split(" ")[0]
+        self.assertEqual(len(short), 7)
+
+        result = self.run_gitmini(["checkout", short])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with open("file.txt") as f:
+            self.assertEqual(f.read(), "one")
@@ -1,3 +1,4 @@
+import io
 import os
 import json
 import unittest
@@ -56,6 +57,14 @@ class TestPushCommand(GitMiniTestCase):
         with open(os.path.join(objects_dir, tree_hash), 'w') as f:
             f.write("\n".join(lines))
 
+    def _capture_archive(self, mock_post):
+        """ Records the uploaded archive, which push deletes once it is sent. """
+        sent = {}
+        def post(url, files, timeout):
+            sent['archive'] = io.BytesIO(files['objects'][1].read())
+            return mock.DEFAULT
+        mock_post.side_effect = post
+        return sent
 
     @mock.patch('gitmini.commands.push.httpx.post')
     def test_successful_push_with_explicit_branch(self, mock_post):
@@ -100,6 +109,101 @@ class TestPushCommand(GitMiniTestCase):
         self.assertEqual(branches['dev'], 'localcommit999')
 
 
+    @mock.patch('gitmini.commands.push.httpx.post')
+    def test_blob_starting_with_tree_is_not_walked(self, mock_post):
+        """ Tree entries are classified by recorded type, not by their first line. """
+        from gitmini_core.classes.Repo import Repo
+        from gitmini.classes.ObjectStore import ObjectStore
+        self._write_config({'username': 'testuser', 'api_key': 'rawkey', 'repo': 'my-repo'})
+        self._write_remote_branches({'main': ''})
+        os.makedirs(os.path.join(GITMINI_DIR, 'objects'), exist_ok=True)
+        store = ObjectStore(Repo(self.repo_dir))
+        blob = store.write(b"tree house plans\n", "blob")
+        tree = store.write(f"{blob} plans.txt\n".encode(), "tree")
+        self._write_commit_object('localcommit456', tree_hash=tree)
+        with open(os.path.join(self.heads_dir, 'main'), 'w') as f:
+            f.write('localcommit456')
+
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {'status': 'ok', 'message': 'Push successful', 'most_recent_remote_branch_commit': 'localcommit456'}
+        sent = self._capture_archive(mock_post)
+        class Args: branch = 'main:main'
+        handle_push(Args())
+
+        import tarfile
+        with tarfile.open(fileobj=sent['archive']) as tar:
+            self.assertEqual(sorted(tar.getnames()), sorted(['localcommit456', tree, blob]))
+            self.assertEqual(tar.extractfile(blob).read(), b"tree house plans\n")
+        self.assertEqual([name for name in os.listdir(GITMINI_DIR) if name.startswith('new_objects')], [])
+
+    @mock.patch('gitmini.commands.push.httpx.post')
+    def test_chunked_blob_sends_only_new_chunks(self, mock_post):
+        """ A chunked blob is sent as its manifest plus the chunks the remote tip lacks. """
+        import random
+        from gitmini_core.classes.Repo import Repo
+        from gitmini.classes.ObjectStore import ObjectStore
+        self._write_config({'username': 'testuser', 'api_key': 'rawkey', 'repo': 'my-repo', 'chunk_threshold': 1024})
+        self._write_remote_branches({'main': 'remotecommit123'})
+        os.makedirs(os.path.join(GITMINI_DIR, 'objects'), exist_ok=True)
+        store = ObjectStore(Repo(self.repo_dir))
+
+        content = random.Random(0).getrandbits(8 * 1024 * 1024).to_bytes(1024 * 1024, "little")
+        with open('model.bin', 'wb') as f:
+            f.write(content)
+        old_blob = store.store_file('model.bin')
+        old_tree = store.write(f"{old_blob} model.bin\n".encode(), "tree")
+        self._write_commit_object('remotecommit123', tree_hash=old_tree)
+
+        with open('model.bin', 'wb') as f:
+            f.write(content[:500000] + b"a small edit" + content[500000:])
+        new_blob = store.store_file('model.bin')
+        new_tree = store.write(f"{new_blob} model.bin\n".encode(), "tree")
+        self._write_commit_object('localcommit456', tree_hash=new_tree, parent_hash='remotecommit123')
+        with open(os.path.join(self.heads_dir, 'main'), 'w') as f:
+            f.write('localcommit456')
+
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {'status': 'ok', 'message': 'Push successful', 'most_recent_remote_branch_commit': 'localcommit456'}
+        sent = self._capture_archive(mock_post)
+        class Args: branch = 'main:main'
+        handle_push(Args())
+
+        import tarfile
+        new_chunks = {sha for sha, _ in store.chunks(new_blob)} - {sha for sha, _ in store.chunks(old_blob)}
+        with tarfile.open(fileobj=sent['archive']) as tar:
+            self.assertEqual(sorted(tar.getnames()), sorted(['localcommit456', new_tree, new_blob] + list(new_chunks)))
+            self.assertEqual(tar.extractfile(new_blob).read(), store.manifest(new_blob))
+
+    @mock.patch('gitmini.commands.push.httpx.post')
+    def test_subtrees_unchanged_since_remote_are_skipped(self, mock_post):
+        """ Subtrees and blobs the remote tip already has are not sent again. """
+        from gitmini_core.classes.Repo import Repo
+        from gitmini.classes.ObjectStore import ObjectStore
+        self._write_config({'username': 'testuser', 'api_key': 'rawkey', 'repo': 'my-repo'})
+        self._write_remote_branches({'main': 'remotecommit123'})
+        os.makedirs(os.path.join(GITMINI_DIR, 'objects'), exist_ok=True)
+        store = ObjectStore(Repo(self.repo_dir))
+        docs = store.write(b"docs", "blob")
+        old_src = store.write(b"old", "blob")
+        new_src = store.write(b"new", "blob")
+        old_tree = store.write_tree({'docs/readme.txt': docs, 'src/main.txt': old_src})
+        new_tree = store.write_tree({'docs/readme.txt': docs, 'src/main.txt': new_src})
+        self._write_commit_object('remotecommit123', tree_hash=old_tree)
+        self._write_commit_object('localcommit456', tree_hash=new_tree, parent_hash='remotecommit123')
+        with open(os.path.join(self.heads_dir, 'main'), 'w') as f:
+            f.write('localcommit456')
+
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {'status': 'ok', 'message': 'Push successful', 'most_recent_remote_branch_commit': 'localcommit456'}
+        sent = self._capture_archive(mock_post)
+        class Args: branch = 'main:main'
+        handle_push(Args())
+
+        import tarfile
+        new_src_tree = store.read_tree(new_tree).entries['src/']
+        with tarfile.open(fileobj=sent['archive']) as tar:
+            self.assertEqual(sorted(tar.getnames()), sorted(['localcommit456', new_tree, new_src_tree, new_src]))
+
     @mock.patch('gitmini.commands.push.httpx.post')
     def test_missing_config_json(self, mock_post):
         """ Missing config.json causes fatal error. """
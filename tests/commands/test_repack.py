@@ -0,0 +1,76 @@
+import os
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.ObjectStore import ObjectStore
+from tests.test_helpers import GitMiniTestCase
+
+
+class TestRepack(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.run_gitmini(['init'])
+        self.base = "".join(f"line {i} of a file that changes a little each commit\n" for i in range(500))
+        for version in range(5):
+            with open('big.txt', 'w') as f:
+                f.write(self.base + f"version {version}\n")
+            self.run_gitmini(['add', '.'])
+            self.run_gitmini(['commit', '-m', f'version {version}'])
+
+    def test_repack_consolidates_loose_objects(self):
+        """ After repacking there are no loose objects left and versions are deltas. """
+        result = self.run_gitmini(['repack'])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('packed 15 objects', result.stdout)
+        self.assertIn('(4 deltas)', result.stdout)
+
+        store = ObjectStore(Repo(self.repo_dir))
+        self.assertEqual(list(store.loose_objects()), [])
+        self.assertEqual(len(store.packs), 1)
+        pack_size = os.path.getsize(store.packs[0].pack_path)
+        self.assertLess(pack_size, len(self.base) * 2)
+
+    def test_history_is_readable_from_pack(self):
+        """ log and checkout resolve packed objects. """
+        self.run_gitmini(['repack'])
+
+        log = self.run_gitmini(['log'])
+        for version in range(5):
+            self.assertIn(f'version {version}', log.stdout)
+
+        self.run_gitmini(['branch', 'dev'])
+        os.remove('big.txt')
+        result = self.run_gitmini(['checkout', '--force', 'dev'])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with open('big.txt') as f:
+            self.assertEqual(f.read(), self.base + "version 4\n")
+
+    def test_repack_twice(self):
+        """ Repacking again replaces the old pack. """
+        self.run_gitmini(['repack'])
+        with open('new.txt', 'w') as f:
+            f.write('new')
+        self.run_gitmini(['add', '.'])
+        self.run_gitmini(['commit', '-m', 'new'])
+        self.run_gitmini(['repack'])
+
+        store = ObjectStore(Repo(self.repo_dir))
+        self.assertEqual(len(store.packs), 1)
+        self.assertEqual(list(store.loose_objects()), [])
+
+    def test_chunked_blobs_survive_repack(self):
+        """ Chunked blobs are packed as manifests and checked out whole. """
+        self.run_gitmini(['config', 'chunk_threshold', '1024'])
+        content = os.urandom(600 * 1024)
+        with open('model.bin', 'wb') as f:
+            f.write(content)
+        self.run_gitmini(['add', '.'])
+        self.run_gitmini(['commit', '-m', 'model'])
+        result = self.run_gitmini(['repack'])
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+        self.run_gitmini(['branch', 'dev'])
+        os.remove('model.bin')
+        result = self.run_gitmini(['checkout', '--force', 'dev'])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with open('model.bin', 'rb') as f:
+            self.assertEqual(f.read(), content)
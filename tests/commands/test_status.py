@@ -0,0 +1,57 @@
+import os
+from gitmini_core.classes.Repo import Repo
+from gitmini.classes.Index import Index
+from tests.test_helpers import GitMiniTestCase
+
+
+class TestStatus(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.run_gitmini(['init'])
+        with open('committed.txt', 'w') as f:
+            f.write('committed')
+        with open('gone.txt', 'w') as f:
+            f.write('will be deleted')
+        self.run_gitmini(['add', '.'])
+        self.run_gitmini(['commit', '-m', 'base'])
+
+    def test_clean_tree(self):
+        """ A freshly committed tree has nothing to report. """
+        result = self.run_gitmini(['status'])
+        self.assertIn('nothing to commit, working tree clean', result.stdout)
+        self.assertEqual(self.run_gitmini(['status', '--porcelain']).stdout, '')
+
+    def test_porcelain_reports_all_states(self):
+        """ Staged, unstaged, deleted and untracked files are all reported. """
+        with open('staged.txt', 'w') as f:
+            f.write('new')
+        self.run_gitmini(['add', 'staged.txt'])
+        with open('committed.txt', 'w') as f:
+            f.write('edited, longer than before')
+        os.remove('gone.txt')
+        with open('untracked.txt', 'w') as f:
+            f.write('?')
+
+        lines = self.run_gitmini(['status', '--porcelain']).stdout.splitlines()
+        self.assertIn('A  staged.txt', lines)
+        self.assertIn(' M committed.txt', lines)
+        self.assertIn(' D gone.txt', lines)
+        self.assertIn('?? untracked.txt', lines)
+
+    def test_status_does_not_modify_index(self):
+        """ Unlike add, status leaves staged entries alone (only stat data is refreshed). """
+        before = Index(Repo(self.repo_dir)).entries
+        with open('committed.txt', 'w') as f:
+            f.write('edited')
+        self.run_gitmini(['status'])
+        self.assertEqual(Index(Repo(self.repo_dir)).entries, before)
+
+    def test_long_format(self):
+        """ Human-readable output groups changes by section. """
+        with open('committed.txt', 'w') as f:
+            f.write('edited, longer than before')
+        result = self.run_gitmini(['status'])
+        self.assertIn('On branch main', result.stdout)
+        self.assertIn('Changes not staged for commit:', result.stdout)
+        self.assertIn('modified:', result.stdout)
@@ -2,7 +2,13 @@ import os
 from tests.test_helpers import GitMiniTestCase, GITMINI_DIR
 import io
 import sys
-from gitmini_core.utils import find_gitmini_root
+import errno
+import unittest
+from unittest import mock
+import random
+from gitmini_core.utils import find_gitmini_root, compute_sha1
+from gitmini import utils
+from gitmini.utils import hash_file, copy_file, iter_cdc_chunks
 
 
 class TestFindGitminiRoot(GitMiniTestCase):
@@ -26,3 +32,82 @@ class TestFindGitminiRoot(GitMiniTestCase):
         finally:
             sys.stderr = stderr_backup
 
+
+class TestStreamingHelpers(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Force several chunks per file
+        self._chunk_size = utils.CHUNK_SIZE
+        utils.CHUNK_SIZE = 7
+        self.content = b"streamed in many small chunks" * 10
+        with open("big.bin", "wb") as f:
+            f.write(self.content)
+
+    def tearDown(self):
+        utils.CHUNK_SIZE = self._chunk_size
+        super().tearDown()
+
+    def test_hash_file_matches_compute_sha1(self):
+        """ Streaming hash is byte-compatible with hashing the whole content. """
+        self.assertEqual(hash_file("big.bin"), compute_sha1(self.content))
+
+    def test_copy_file(self):
+        """ copy_file reproduces the source exactly. """
+        copy_file("big.bin", "copy.bin")
+        with open("copy.bin", "rb") as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_copy_file_in_pieces(self):
+        """ Kernel copies larger than KERNEL_COPY_MAX are split into several calls. """
+        with mock.patch.object(utils, "KERNEL_COPY_MAX", 16):
+            copy_file("big.bin", "copy.bin")
+        with open("copy.bin", "rb") as f:
+            self.assertEqual(f.read(), self.content)
+
+    @unittest.skipUnless(hasattr(os, "copy_file_range"), "needs copy_file_range")
+    def test_copy_file_falls_back_to_sendfile(self):
+        unsupported = OSError(errno.EXDEV, "cross-device copy")
+        with mock.patch("os.copy_file_range", side_effect=unsupported):
+            copy_file("big.bin", "copy.bin")
+        with open("copy.bin", "rb") as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_copy_file_falls_back_to_streaming(self):
+        unsupported = OSError(errno.ENOSYS, "not supported")
+        with mock.patch("os.copy_file_range", side_effect=unsupported, create=True), \
+                mock.patch("os.sendfile", side_effect=unsupported, create=True):
+            copy_file("big.bin", "copy.bin")
+        with open("copy.bin", "rb") as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_copy_file_overwrites_longer_file(self):
+        with open("copy.bin", "wb") as f:
+            f.write(b"x" * (len(self.content) * 2))
+        copy_file("big.bin", "copy.bin")
+        with open("copy.bin", "rb") as f:
+            self.assertEqual(f.read(), self.content)
+
+
+class TestContentDefinedChunking(GitMiniTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.content = random.Random(0).getrandbits(8 * 2 * 1024 * 1024).to_bytes(2 * 1024 * 1024, "little")
+
+    def test_chunks_reassemble(self):
+        chunks = list(iter_cdc_chunks(io.BytesIO(self.content)))
+        self.assertEqual(b"".join(chunks), self.content)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(utils.CDC_MIN_SIZE <= len(c) <= utils.CDC_MAX_SIZE for c in chunks[:-1]))
+
+    def test_insertion_only_changes_nearby_chunks(self):
+        """ Boundaries follow content, so chunks after an insertion are unchanged. """
+        before = list(iter_cdc_chunks(io.BytesIO(self.content)))
+        edited = self.content[:100000] + b"inserted" + self.content[100000:]
+        after = list(iter_cdc_chunks(io.BytesIO(edited)))
+        self.assertLessEqual(len(set(after) - set(before)), 2)
+
+    def test_small_and_empty_input(self):
+        self.assertEqual(list(iter_cdc_chunks(io.BytesIO(b""))), [])
+        self.assertEqual(list(iter_cdc_chunks(io.BytesIO(b"tiny"))), [b"tiny"])